@@ -0,0 +1,41 @@
+import os
+import subprocess
+
+# The bot's config refuses to load without these, none of them are used.
+# Imported before anything from utils so the defaults are in place.
+os.environ.setdefault("API_BASE_URL", "http://stub.invalid")
+os.environ.setdefault("API_BASE_URL_PROD", "http://stub.invalid")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-benchmark-secret-benchmark")
+os.environ.setdefault("DISCORD_BOT_TOKEN", "benchmark")
+os.environ.setdefault("ROOM_HUB_ENABLED", "false")
+# Measure the commands, not the rate limits, unless asked to
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+import httpx
+
+import utils.api
+from benchmarks.stub_api import StubApi
+
+from typing import Optional
+
+
+def install_stub(stub: StubApi, debounce_ms: Optional[float] = None) -> None:
+    """Route the bot's API client to the stub"""
+    utils.api._client = httpx.AsyncClient(
+        base_url=os.environ["API_BASE_URL"], transport=stub.transport()
+    )
+    if debounce_ms is not None:
+        utils.api._mutations.debounce = debounce_ms / 1000
+
+
+def git_commit() -> Optional[str]:
+    """The commit being benchmarked, recorded alongside the results"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
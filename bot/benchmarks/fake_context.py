@@ -0,0 +1,92 @@
+import itertools
+import types
+
+from typing import Any, List, Optional
+
+
+class FakeMessage:
+    """Records the edits made to a message the bot sent"""
+
+    def __init__(self, channel: "FakeChannel", content: Optional[str] = None):
+        self.channel = channel
+        self.content = content
+        self.edits = 0
+
+    async def edit(self, content: Optional[str] = None, **kwargs) -> "FakeMessage":
+        self.content = content
+        self.edits += 1
+        return self
+
+
+_channel_ids = itertools.count(1)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.id = next(_channel_ids)
+        self.sent: List[FakeMessage] = []
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        message = FakeMessage(self, content)
+        self.sent.append(message)
+        return message
+
+
+class _Typing:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeContext:
+    """Just enough of commands.Context for the Jukebox commands to run"""
+
+    def __init__(
+        self,
+        command: Any,
+        user_id: int = 1,
+        attachments: Optional[List[Any]] = None,
+        prefix: str = "!",
+    ):
+        self.command = command
+        self.prefix = prefix
+        self.author = types.SimpleNamespace(id=user_id, name=f"user{user_id}")
+        self.message = types.SimpleNamespace(
+            attachments=attachments or [],
+            to_reference=lambda fail_if_not_exists=True: None,
+        )
+        self.channel = FakeChannel()
+        self.command_failed = False
+
+    @property
+    def replies(self) -> List[FakeMessage]:
+        return self.channel.sent
+
+    def typing(self) -> _Typing:
+        return _Typing()
+
+    async def reply(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        return await self.channel.send(content, **kwargs)
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> FakeMessage:
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeAttachment:
+    """A text file attached to a command message"""
+
+    def __init__(self, text: str, filename: str = "tracks.txt"):
+        self.data = text.encode()
+        self.filename = filename
+        self.content_type = "text/plain; charset=utf-8"
+        self.size = len(self.data)
+
+    async def read(self) -> bytes:
+        return self.data
+
+
+class FakeBot:
+    async def fetch_user(self, user_id: int) -> Any:
+        return types.SimpleNamespace(id=user_id, name=f"user{user_id}")
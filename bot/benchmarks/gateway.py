@@ -0,0 +1,206 @@
+"""Compare what the full and lean gateway modes cache from synthetic gateway events
+
+Run from the bot directory:
+
+    pipenv run python -m benchmarks.gateway --guilds 20 --members 5000
+
+Each mode runs in its own process so their resident memory can be compared.
+Discord only sends members and presences for the intents requested, and
+chunking is what the full mode waits for at startup, so events are generated
+accordingly and the number of guilds that would be chunked is reported.
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.environment import git_commit
+
+import discord
+
+from utils.gateway import gateway_options
+
+from typing import Any, Dict
+
+_TIMESTAMP = "2024-01-01T00:00:00+00:00"
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id}",
+        "discriminator": "0",
+        "global_name": None,
+        "avatar": None,
+    }
+
+
+def _member(user_id: int) -> Dict[str, Any]:
+    return {
+        "user": _user(user_id),
+        "roles": [],
+        "joined_at": _TIMESTAMP,
+        "deaf": False,
+        "mute": False,
+    }
+
+
+def _guild(guild_id: int, members: int, intents: discord.Intents) -> Dict[str, Any]:
+    user_ids = range(guild_id * 10**6, guild_id * 10**6 + members)
+    return {
+        "id": str(guild_id),
+        "name": f"guild{guild_id}",
+        "member_count": members,
+        "large": members > 250,
+        "channels": [
+            {
+                "id": str(guild_id * 10),
+                "type": 0,
+                "name": "music",
+                "position": 0,
+                "permission_overwrites": [],
+            }
+        ],
+        "roles": [],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        # Stands in for the member chunks the full mode requests at startup
+        "members": [_member(i) for i in user_ids] if intents.members else [],
+        "presences": [
+            {
+                "user": {"id": str(i)},
+                "status": "online",
+                "activities": [],
+                "client_status": {},
+            }
+            for i in user_ids
+        ]
+        if intents.presences
+        else [],
+    }
+
+
+def _message(message_id: int, guild_id: int) -> Dict[str, Any]:
+    author_id = guild_id * 10**6 + message_id % 100
+    return {
+        "id": str(message_id),
+        "channel_id": str(guild_id * 10),
+        "guild_id": str(guild_id),
+        "author": _user(author_id),
+        "member": {"roles": [], "joined_at": _TIMESTAMP, "deaf": False, "mute": False},
+        "content": "!status",
+        "timestamp": _TIMESTAMP,
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(lean: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    options = gateway_options(lean, args.message_cache_size)
+    client = discord.Client(**options)
+    state = client._connection
+    rss_before = _peak_rss_mib()
+
+    started_at = time.perf_counter()
+    chunked = 0
+    for guild_id in range(1, args.guilds + 1):
+        guild = state._add_guild_from_data(
+            _guild(guild_id, args.members, options["intents"])
+        )
+        chunked += state._guild_needs_chunking(guild)
+    guilds_s = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    for message_id in range(args.messages):
+        state.parse_message_create(_message(message_id, message_id % args.guilds + 1))
+    messages_s = time.perf_counter() - started_at
+
+    return {
+        "mode": "lean" if lean else "full",
+        "intents": options["intents"].value,
+        "guild_create_ms": guilds_s * 1000,
+        "message_create_ms": messages_s * 1000,
+        "guilds_chunked_at_startup": chunked,
+        "cached_members": sum(len(guild.members) for guild in state.guilds),
+        "cached_users": len(state._users),
+        "cached_messages": len(state._messages) if state._messages is not None else 0,
+        "peak_rss_mib": _peak_rss_mib(),
+        "peak_rss_growth_mib": _peak_rss_mib() - rss_before,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=5000, help="per guild")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument(
+        "--message-cache-size",
+        type=int,
+        default=100,
+        help="MESSAGE_CACHE_SIZE of the lean mode",
+    )
+    parser.add_argument("--mode", choices=("full", "lean"), help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="write the JSON results here, not stdout")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode == "lean", args)))
+        return
+
+    results = {}
+    for mode in ("full", "lean"):
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.gateway", *sys.argv[1:], "--mode", mode],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results[mode] = json.loads(child.stdout.splitlines()[-1])
+        print(
+            f"{mode:<5} {results[mode]['guild_create_ms']:9.1f} ms guilds "
+            f"{results[mode]['cached_members']:8d} members "
+            f"{results[mode]['cached_messages']:6d} messages "
+            f"{results[mode]['peak_rss_mib']:7.1f} MiB peak RSS",
+            file=sys.stderr,
+        )
+
+    output = json.dumps(
+        {
+            "meta": {
+                "commit": git_commit(),
+                "python": sys.version.split()[0],
+                "discord": discord.__version__,
+                "guilds": args.guilds,
+                "members": args.members,
+                "messages": args.messages,
+            },
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Simulate many users issuing commands at once against an in-memory stub of the API
+
+Run from the bot directory:
+
+    pipenv run python -m benchmarks.load --users 500 --rooms 50 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import sys
+import time
+
+from benchmarks.environment import git_commit, install_stub
+
+import utils.api
+import utils.metrics as metrics
+from benchmarks.fake_context import FakeBot, FakeContext
+from benchmarks.stub_api import StubApi
+from cogs.jukebox import Jukebox
+
+from typing import Any, Dict, List, Tuple
+
+DEFAULT_MIX = "status=4,queue=3,play=1,skip=2"
+
+# Arguments the commands of the mix are invoked with
+_ARGUMENTS: Dict[str, Tuple[Tuple[Any, ...], Dict[str, Any]]] = {
+    "play": ((), {"url_or_query": "load query"}),
+    "seek": ((30,), {}),
+    "track": ((0,), {}),
+}
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _percentile(values: List[float], q: float) -> float:
+    # Nearest rank, values must be sorted
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": _percentile(values, 0.50) * 1000,
+        "p90_ms": _percentile(values, 0.90) * 1000,
+        "p99_ms": _percentile(values, 0.99) * 1000,
+        "max_ms": (values[-1] if values else 0.0) * 1000,
+    }
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.stub = StubApi(
+            queue_size=args.queue_size, latency=args.latency / 1000, rooms=args.rooms
+        )
+        install_stub(self.stub, args.debounce)
+        self.cog = Jukebox(FakeBot())
+        self.commands = {command.name: command for command in self.cog.get_commands()}
+        self.mix = _parse_mix(args.mix)
+        unknown = set(self.mix) - set(self.commands)
+        if unknown:
+            raise SystemExit(f"Unknown commands in the mix: {', '.join(sorted(unknown))}")
+
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.mix}
+        self.errors: Dict[str, int] = {name: 0 for name in self.mix}
+        self.loop_lags: List[float] = []
+        self._deadline = 0.0
+
+    async def invoke(self, name: str, user_id: int) -> None:
+        command = self.commands[name]
+        args, kwargs = _ARGUMENTS.get(name, ((), {}))
+        ctx = FakeContext(command, user_id=user_id)
+        started_at = time.perf_counter()
+        try:
+            await self.cog.cog_before_invoke(ctx)
+            await command.callback(self.cog, ctx, *args, **kwargs)
+        except Exception:
+            self.errors[name] += 1
+        self.latencies[name].append(time.perf_counter() - started_at)
+
+    async def think(self, seconds: float) -> bool:
+        """Wait before the next command, returning whether the test still runs"""
+        left = self._deadline - time.perf_counter()
+        await asyncio.sleep(max(0.0, min(seconds, left)))
+        return seconds < left
+
+    async def user(self, user_id: int, rng: random.Random) -> None:
+        names = list(self.mix)
+        weights = list(self.mix.values())
+        # Spread the first commands out instead of starting everyone at once
+        running = await self.think(rng.uniform(0, self.args.think_time))
+        while running:
+            # Commands still running at the deadline are waited for and measured
+            await self.invoke(rng.choices(names, weights)[0], user_id)
+            running = await self.think(rng.expovariate(1 / self.args.think_time))
+
+    async def monitor_loop_lag(self, interval: float = 0.05) -> None:
+        loop = asyncio.get_running_loop()
+        while time.perf_counter() < self._deadline:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lags.append(max(0.0, loop.time() - expected))
+
+    async def run(self) -> Dict[str, Any]:
+        rss_before = _peak_rss_mib()
+        rng = random.Random(self.args.seed)
+        started_at = time.perf_counter()
+        self._deadline = started_at + self.args.duration
+        users = [
+            asyncio.create_task(self.user(user_id, random.Random(rng.random())))
+            for user_id in range(1, self.args.users + 1)
+        ]
+        monitor = asyncio.create_task(self.monitor_loop_lag())
+        await asyncio.gather(*users, monitor)
+        elapsed = time.perf_counter() - started_at
+        await utils.api.close_client()
+
+        completed = sum(len(values) for values in self.latencies.values())
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "users": self.args.users,
+                "rooms": self.args.rooms,
+                "duration_s": self.args.duration,
+                "think_time_s": self.args.think_time,
+                "mix": self.mix,
+                "queue_size": self.args.queue_size,
+                "latency_ms": self.args.latency,
+                "debounce_ms": utils.api._mutations.debounce * 1000,
+                "seed": self.args.seed,
+            },
+            "elapsed_s": elapsed,
+            "commands": completed,
+            "throughput_per_s": completed / elapsed,
+            "errors": sum(self.errors.values()),
+            "api_calls": len(self.stub.calls),
+            "api_calls_per_command": len(self.stub.calls) / max(completed, 1),
+            "latency": _latency_summary(
+                [value for values in self.latencies.values() for value in values]
+            ),
+            "latency_by_command": {
+                name: {**_latency_summary(values), "errors": self.errors[name]}
+                for name, values in self.latencies.items()
+            },
+            "loop_lag": _latency_summary(self.loop_lags),
+            "peak_rss_mib": _peak_rss_mib(),
+            "peak_rss_before_mib": rss_before,
+            "bot_stats": metrics.registry.stats(),
+        }
+
+
+def _print_summary(report: Dict[str, Any]) -> None:
+    latency = report["latency"]
+    lag = report["loop_lag"]
+    print(
+        f"{report['commands']} commands in {report['elapsed_s']:.1f} s, "
+        f"{report['throughput_per_s']:.1f}/s, {report['errors']} errors, "
+        f"{report['api_calls_per_command']:.2f} API calls per command",
+        file=sys.stderr,
+    )
+    print(
+        f"latency p50 {latency['p50_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms, "
+        f"loop lag p99 {lag['p99_ms']:.1f} ms max {lag['max_ms']:.1f} ms, "
+        f"peak RSS {report['peak_rss_mib']:.1f} MiB",
+        file=sys.stderr,
+    )
+    for name, summary in report["latency_by_command"].items():
+        print(
+            f"  {name:<10} {summary['count']:7d} "
+            f"p50 {summary['p50_ms']:8.1f} ms p99 {summary['p99_ms']:8.1f} ms",
+            file=sys.stderr,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="in seconds")
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=5,
+        help="mean seconds a user waits between commands",
+    )
+    parser.add_argument(
+        "--mix",
+        default=DEFAULT_MIX,
+        help=f"weighted commands to issue, defaults to {DEFAULT_MIX}",
+    )
+    parser.add_argument("--queue-size", type=int, default=200)
+    parser.add_argument(
+        "--latency", type=float, default=20, help="API latency per request in ms"
+    )
+    parser.add_argument(
+        "--debounce", type=float, help="override MUTATION_DEBOUNCE, in ms"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON results here, not stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(LoadTest(args).run())
+    _print_summary(report)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark every Jukebox command against an in-memory stub of the API
+
+Run from the bot directory:
+
+    pipenv run python -m benchmarks.run --queue-size 10000 --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.environment import git_commit, install_stub
+
+import utils.api
+from benchmarks.fake_context import FakeAttachment, FakeBot, FakeContext
+from benchmarks.stub_api import StubApi
+from cogs.jukebox import Jukebox
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Scenario(NamedTuple):
+    name: str
+    command: str
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = {}
+    attachment: Optional[str] = None
+
+
+_BULK = "\n".join(f"benchmark query {i}" for i in range(10))
+
+# Every command except profile and memsnap, which would measure themselves
+SCENARIOS = [
+    Scenario("status", "status"),
+    Scenario("queue", "queue"),
+    Scenario("queue_page_50", "queue", (50,)),
+    Scenario("track", "track"),
+    Scenario("track_offset_5", "track", (5,)),
+    Scenario("pause", "pause"),
+    Scenario("resume", "resume"),
+    Scenario("loop", "loop"),
+    Scenario("shuffle", "shuffle"),
+    Scenario("seek", "seek", (30,)),
+    Scenario("skip", "skip"),
+    Scenario("move", "move", ("5", "1")),
+    Scenario("move_range", "move", ("5", "7-9", "1")),
+    Scenario("play", "play", kwargs={"url_or_query": "benchmark query"}),
+    Scenario("play_bulk", "play", kwargs={"url_or_query": _BULK}),
+    Scenario("play_attachment", "play", attachment=_BULK),
+    Scenario("delete", "delete", ("5",)),
+    Scenario("delete_range", "delete", ("5-20",)),
+    Scenario("clear", "clear"),
+    Scenario("userinfo", "userinfo"),
+    Scenario("ban", "ban", (2,)),
+    Scenario("unban", "unban", (2,)),
+    Scenario("stats", "stats"),
+]
+
+
+class Runner:
+    def __init__(self, stub: StubApi, warm: bool):
+        self.stub = stub
+        self.warm = warm
+        self.cog = Jukebox(FakeBot())
+        self.commands = {command.name: command for command in self.cog.get_commands()}
+
+    async def invoke(self, scenario: Scenario) -> FakeContext:
+        if not self.warm:
+            self.stub.reset()
+            utils.api.clear_caches()
+        else:
+            self.stub.calls.clear()
+        command = self.commands[scenario.command]
+        attachments = (
+            [FakeAttachment(scenario.attachment)] if scenario.attachment else []
+        )
+        ctx = FakeContext(command, attachments=attachments)
+        await self.cog.cog_before_invoke(ctx)
+        await command.callback(self.cog, ctx, *scenario.args, **scenario.kwargs)
+        return ctx
+
+    async def measure(self, scenario: Scenario, repeat: int) -> Dict[str, Any]:
+        # One unmeasured run so imports and first-use setup don't count
+        await self.invoke(scenario)
+
+        wall_times: List[float] = []
+        api_calls: List[int] = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            ctx = await self.invoke(scenario)
+            wall_times.append(time.perf_counter() - started_at)
+            api_calls.append(len(self.stub.calls))
+
+        # Allocations are traced in a separate run, tracing slows everything down
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await self.invoke(scenario)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "wall_ms": {
+                "min": min(wall_times) * 1000,
+                "median": statistics.median(wall_times) * 1000,
+                "mean": statistics.fmean(wall_times) * 1000,
+                "max": max(wall_times) * 1000,
+            },
+            "api_calls": statistics.fmean(api_calls),
+            "api_calls_by_endpoint": _count(self.stub.calls),
+            "alloc_peak_kib": (peak - before) / 1024,
+            "alloc_retained_kib": (after - before) / 1024,
+            "replies": len(ctx.replies),
+        }
+
+
+def _count(calls: List[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for call in calls:
+        counts[call] = counts.get(call, 0) + 1
+    return counts
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stub = StubApi(
+        queue_size=args.queue_size,
+        latency=args.latency / 1000,
+        title_length=args.title_length,
+    )
+    install_stub(stub, args.debounce)
+
+    runner = Runner(stub, args.warm)
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not args.only or scenario.name in args.only
+    ]
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = await runner.measure(scenario, args.repeat)
+        wall = results[scenario.name]["wall_ms"]
+        print(
+            f"{scenario.name:<18} {wall['median']:9.2f} ms "
+            f"{results[scenario.name]['api_calls']:6.1f} calls "
+            f"{results[scenario.name]['alloc_peak_kib']:10.1f} KiB peak",
+            file=sys.stderr,
+        )
+    await utils.api.close_client()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "queue_size": args.queue_size,
+            "latency_ms": args.latency,
+            "title_length": args.title_length,
+            "repeat": args.repeat,
+            "warm": args.warm,
+            "debounce_ms": utils.api._mutations.debounce * 1000,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="API latency per request in ms"
+    )
+    parser.add_argument("--title-length", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="keep the bot's caches and the room between runs",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        help="override MUTATION_DEBOUNCE, in ms",
+    )
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    parser.add_argument("--output", help="write the JSON results here, not stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import asyncio
+import json
+import random
+import time
+
+import httpx
+import jwt
+
+from typing import Dict, List, Optional
+
+
+def _track_id(i: int) -> str:
+    return f"{i:016x}"
+
+
+class StubRoom:
+    """State of a single room, with the API's queue semantics"""
+
+    def __init__(self, room_code: str, queue_size: int):
+        self.room_code = room_code
+        self.queue_size = queue_size
+        self.reset()
+
+    def reset(self) -> None:
+        self._next_id = self.queue_size + 1
+        self.room_info = {
+            "room_code": self.room_code,
+            "is_paused": False,
+            "is_looping": False,
+            "is_shuffled": False,
+            "playing_since": int(time.time() * 1000),
+            "current_item": {},
+        }
+        self.items = [
+            {
+                "id": i + 1,
+                "track_id": _track_id(i),
+                "index": i,
+                "shuffled_index": None,
+                "is_deleted": False,
+            }
+            for i in range(self.queue_size)
+        ]
+        self._set_current(0 if self.items else None)
+
+    def play_order(self) -> List[dict]:
+        if self.room_info["is_shuffled"]:
+            return sorted(self.items, key=lambda item: item["shuffled_index"])
+        return sorted(self.items, key=lambda item: item["index"])
+
+    def _reindex(self, order: List[dict]) -> None:
+        key = "shuffled_index" if self.room_info["is_shuffled"] else "index"
+        for i, item in enumerate(order):
+            item[key] = i
+
+    def _set_current(self, rank: Optional[int]) -> None:
+        order = self.play_order()
+        if rank is None or not order:
+            self.room_info["current_item"] = {
+                "index": None,
+                "shuffle_index": None,
+                "id": None,
+                "track_id": None,
+            }
+            return
+        item = order[rank]
+        self.room_info["current_item"] = {
+            "index": item["index"],
+            "shuffle_index": item["shuffled_index"],
+            "id": item["id"],
+            "track_id": item["track_id"],
+        }
+
+    def _current_rank(self) -> Optional[int]:
+        current_id = self.room_info["current_item"]["id"]
+        for rank, item in enumerate(self.play_order()):
+            if item["id"] == current_id:
+                return rank
+        return None
+
+    def response(self, **extra) -> dict:
+        return {"room_info": self.room_info, "queue_items": self.items, **extra}
+
+    def mutate(self, action: str, body: Dict) -> httpx.Response:
+        extra = {}
+        if action == "pause":
+            self.room_info["is_paused"] = body["value"]
+        elif action == "loop":
+            self.room_info["is_looping"] = body["value"]
+        elif action == "shuffle":
+            rank = self._current_rank()
+            self.room_info["is_shuffled"] = body["value"]
+            order = sorted(self.items, key=lambda item: item["index"])
+            if body["value"]:
+                random.Random(0).shuffle(order)
+            else:
+                for item in order:
+                    item["shuffled_index"] = None
+            self._reindex(order)
+            self._set_current(0 if rank is not None else None)
+        elif action == "seek":
+            self.room_info["playing_since"] = int(time.time() * 1000)
+        elif action == "skip":
+            if body["value"] >= len(self.items):
+                return httpx.Response(400, json={"title": "Index out of range"})
+            self._set_current(body["value"])
+        elif action == "move":
+            rank = self._current_rank()
+            order = self.play_order()
+            if max(body["from"], body["to"]) >= len(order):
+                return httpx.Response(400, json={"title": "Index out of range"})
+            current = order[rank] if rank is not None else None
+            order.insert(body["to"], order.pop(body["from"]))
+            self._reindex(order)
+            if current is not None:
+                self._set_current(order.index(current))
+        elif action == "move/batch":
+            for move in body["moves"]:
+                resp = self.mutate("move", move)
+                if resp.status_code != 200:
+                    return resp
+        elif action == "add":
+            rank = self._current_rank()
+            order = self.play_order()
+            item = {
+                "id": self._next_id,
+                "track_id": _track_id(self._next_id),
+                "index": len(self.items),
+                "shuffled_index": 0 if self.room_info["is_shuffled"] else None,
+                "is_deleted": False,
+            }
+            self._next_id += 1
+            order.insert(0 if rank is None else rank + 1, item)
+            self.items.append(item)
+            self._reindex(order)
+            self._set_current(0 if rank is None else rank)
+            extra["added_items"] = [item]
+        elif action == "delete":
+            order = self.play_order()
+            current_id = self.room_info["current_item"]["id"]
+            if body["value"] == current_id:
+                return httpx.Response(400, json={"title": "Cannot delete current"})
+            remaining = [item for item in order if item["id"] != body["value"]]
+            if len(remaining) == len(order):
+                return httpx.Response(400, json={"title": "Item not found"})
+            self.items = remaining
+            self._reindex(remaining)
+            self._set_current(self._current_rank())
+        elif action == "delete/batch":
+            failed = []
+            for item_id in dict.fromkeys(body["values"]):
+                resp = self.mutate("delete", {"value": item_id})
+                if resp.status_code != 200:
+                    failed.append({"item_id": item_id, "error": resp.json()["title"]})
+            extra["failed_items"] = failed
+        elif action == "clear":
+            current_id = self.room_info["current_item"]["id"]
+            self.items = [item for item in self.items if item["id"] == current_id]
+            self._reindex(self.items)
+            self._set_current(0 if self.items else None)
+        else:
+            return httpx.Response(404, json={"title": "Not Found"})
+        return httpx.Response(200, json=self.response(**extra))
+
+
+class StubApi:
+    """In-memory stand-in for the .NET API, served through an httpx.MockTransport
+
+    Mirrors the endpoints and JSON shapes the bot uses closely enough for
+    the commands to run end to end, with a configurable latency per request
+    and payload sizes. Discord users are spread over the rooms by their ID.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 100,
+        latency: float = 0.0,
+        title_length: int = 40,
+        rooms: int = 1,
+        users: int = 10,
+    ):
+        self.queue_size = queue_size
+        self.latency = latency
+        self.title_length = title_length
+        self.users = users
+        self.rooms = {
+            self.room_code_of(i): StubRoom(self.room_code_of(i), queue_size)
+            for i in range(rooms)
+        }
+        self.calls: List[str] = []
+
+    @staticmethod
+    def room_code_of(user_id: int) -> str:
+        return f"R{user_id:05d}"
+
+    def reset(self) -> None:
+        """Restore the initial rooms and forget the recorded calls"""
+        self.calls.clear()
+        for room in self.rooms.values():
+            room.reset()
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self._handle)
+
+    def _room_of(self, request: httpx.Request) -> StubRoom:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        claims = jwt.decode(token, options={"verify_signature": False})
+        return self.rooms[claims["room_code"]]
+
+    def _track(self, track_id: str) -> dict:
+        return {
+            "id": track_id,
+            "webpage_url": f"https://www.youtube.com/watch?v={track_id}",
+            "title": f"Track {track_id} ".ljust(self.title_length, "x"),
+            "uploader": "Benchmark",
+        }
+
+    # Request handling
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.calls.append(f"{request.method} {path}")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        body = json.loads(request.content) if request.content else {}
+        parts = path.strip("/").split("/")
+
+        if parts[:2] == ["api", "user"]:
+            return self._handle_user(request, parts)
+        if parts[:2] == ["api", "track"]:
+            if request.method == "POST":
+                tracks = [self._track(h) for h in body["webpage_url_hashes"]]
+                return httpx.Response(200, json=tracks)
+            return httpx.Response(200, json=self._track(parts[2]))
+        if path == "/api/queue/items":
+            order = self._room_of(request).play_order()
+            offset = int(request.url.params.get("offset", 0))
+            limit = int(request.url.params.get("limit", len(order)))
+            return httpx.Response(
+                200,
+                json=order[offset : offset + limit],
+                headers={"X-Total-Count": str(len(order))},
+            )
+        if path == "/api/room":
+            return httpx.Response(200, json=self._room_of(request).response())
+        if path == "/api/room/info":
+            return httpx.Response(200, json=self._room_of(request).room_info)
+        if parts[:2] == ["api", "room"] and request.method == "POST":
+            return self._room_of(request).mutate("/".join(parts[2:]), body)
+        return httpx.Response(404, json={"title": "Not Found"})
+
+    def _handle_user(self, request: httpx.Request, parts: List[str]) -> httpx.Response:
+        if len(parts) == 2:
+            now = int(time.time() * 1000)
+            users = [
+                {
+                    "user_id": str(i),
+                    "username": f"user{i}",
+                    "connection_id": None,
+                    "is_embedded": i % 2 == 0,
+                    "associated_room_code": self._room_code_of_user(i),
+                    "created_at": now,
+                    "updated_at": now,
+                    "banned_until": None,
+                    "banned_reason": None,
+                }
+                for i in range(self.users)
+            ]
+            params = request.url.params
+            if "embedded" in params:
+                wanted = params["embedded"] == "true"
+                users = [user for user in users if user["is_embedded"] == wanted]
+            offset = int(params.get("offset", 0))
+            limit = int(params.get("limit", len(users)))
+            return httpx.Response(
+                200,
+                json=users[offset : offset + limit],
+                headers={"X-Total-Count": str(len(users))},
+            )
+        if request.method == "POST":
+            # Ban and unban
+            return httpx.Response(200)
+        user_id = int(parts[2])
+        return httpx.Response(
+            200, json={"associated_room_code": self._room_code_of_user(user_id)}
+        )
+
+    def _room_code_of_user(self, user_id: int) -> str:
+        return self.room_code_of(user_id % len(self.rooms))
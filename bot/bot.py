@@ -1,4 +1,10 @@
+import asyncio
+import math
 import os
+import time
+
+# Startup time is reported once the gateway is ready
+_started_at = time.perf_counter()
 
 if os.getenv("ENV") != "production":
     import dotenv
@@ -9,13 +15,61 @@ import discord
 from discord.ext import commands
 import os
 from utils.logger import logger
+import utils.api
+from utils.admission import AdmissionError
 from utils.api import ApiError
+import utils.metrics as metrics
+from utils.config import (
+    LEAN_GATEWAY,
+    MESSAGE_CACHE_SIZE,
+    METRICS_HOST,
+    METRICS_PORT,
+    SHARD_COUNT,
+    SHARD_IDS,
+)
+from utils.gateway import gateway_options
+from utils.now_playing import now_playing
+from utils.outbox import outbox
+from utils.room_hub import hub
 from utils.safe_reply import safe_reply
 
-bot = commands.Bot(
-    intents=discord.Intents.all(),
+
+# Workers started by cluster.py each run a share of the shards
+BotBase = commands.AutoShardedBot if SHARD_COUNT else commands.Bot
+shard_options = (
+    {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS or None} if SHARD_COUNT else {}
+)
+
+
+class JukeboxBot(BotBase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_runner = None
+        self._ready_after: float | None = None
+
+    async def start(self, *args, **kwargs):
+        if METRICS_PORT:
+            self._metrics_runner = await metrics.start_server(
+                METRICS_HOST, METRICS_PORT
+            )
+        await super().start(*args, **kwargs)
+
+    async def close(self):
+        await super().close()
+        await now_playing.close()
+        await outbox.close()
+        await hub.close()
+        await utils.api.close_client()
+        await asyncio.to_thread(utils.api.shared_cache.close)
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+
+
+bot = JukeboxBot(
     command_prefix=commands.when_mentioned_or("!"),
     auto_sync_commands=False,  # Syncing won't work with activities enabled
+    **gateway_options(LEAN_GATEWAY, MESSAGE_CACHE_SIZE),
+    **shard_options,
 )
 
 cogs_list = ["jukebox"]
@@ -24,9 +78,46 @@ for cog in cogs_list:
     bot.load_extension(f"cogs.{cog}")
 
 
+@bot.before_invoke
+async def before_invoke(ctx: commands.Context):
+    metrics.command_started()
+
+
+@bot.after_invoke
+async def after_invoke(ctx: commands.Context):
+    command = ctx.command.qualified_name
+    duration = metrics.command_finished(command, ctx.command_failed)
+    if duration is None:
+        return
+    room = utils.api.cached_room_code(ctx.author.id)
+    logger.info(
+        f"{command} by {ctx.author.id} in room {room} "
+        f"{'failed' if ctx.command_failed else 'finished'} in {duration * 1000:.0f} ms",
+        extra={
+            "command": command,
+            "user": str(ctx.author.id),
+            "room": room,
+            "duration": round(duration, 4),
+        },
+    )
+
+
 @bot.event
 async def on_ready():
     logger.info(f"Logged in as {bot.user}")
+    # on_ready fires again after reconnects, only the first one is startup
+    if bot._ready_after is None:
+        bot._ready_after = time.perf_counter() - _started_at
+        process = metrics.process_stats()
+        logger.info(
+            f"Ready after {bot._ready_after:.2f}s in "
+            f"{'lean' if LEAN_GATEWAY else 'full'} gateway mode, "
+            f"shards {SHARD_IDS or 'all'} of {SHARD_COUNT or 1}, "
+            f"{len(bot.guilds)} guilds, {len(bot.users)} users cached, "
+            f"peak RSS {process['peak_rss_bytes'] / 2**20:.1f} MiB"
+        )
+        # The pool outlives gateway reconnects, so it is only warmed once
+        await utils.api.start_client()
 
 
 @bot.event
@@ -35,7 +126,20 @@ async def on_command_error(ctx: commands.Context, error):
     original = getattr(error, "original", None)
     if isinstance(error, commands.CommandNotFound):
         return
-    if isinstance(original, ApiError):
+    if isinstance(error, AdmissionError):
+        if error.scope == "user":
+            description = "You are sending commands too fast."
+        elif error.scope == "room":
+            description = "Your room is sending too many commands."
+        else:
+            description = "The jukebox is busy right now."
+        embed = discord.Embed(
+            title="⏳ Slow Down",
+            description=f"{description} Try again in {math.ceil(error.retry_after)}s.",
+            color=discord.Color.orange(),
+        )
+        await safe_reply(ctx, embeds=[embed])
+    elif isinstance(original, ApiError):
         embed = discord.Embed(
             title=f"❌ {original.title}",
             description=original.detail or "An error occurred.",
@@ -0,0 +1,197 @@
+"""Run the bot as a cluster of worker processes sharing the shards between them
+
+Run from the bot directory:
+
+    pipenv run python3 cluster.py --workers 4
+
+Each worker is a bot.py process running an AutoShardedBot for its share of
+the shards, with its own event loop and API connection pool. Track metadata
+and room codes are shared between the workers through a SQLite file. Workers
+that exit are restarted with a backoff until the cluster is stopped.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+
+import httpx
+
+from utils.config import DISCORD_BOT_TOKEN, LOG_FILE, METRICS_PORT
+from utils.logger import logger
+
+from typing import Dict, List, Optional
+
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+# A worker that ran this many seconds before exiting is restarted right away
+STABLE_AFTER = 60
+# Seconds workers get to close their connections before they are killed
+STOP_TIMEOUT = 30
+
+
+def recommended_shards(token: str) -> int:
+    """The number of shards Discord recommends for the bot"""
+    resp = httpx.get(
+        GATEWAY_URL, headers={"Authorization": f"Bot {token}"}, timeout=10
+    )
+    resp.raise_for_status()
+    return resp.json()["shards"]
+
+
+def assign_shards(shard_count: int, workers: int) -> List[List[int]]:
+    """Spread the shards over the workers as evenly as possible"""
+    return [list(range(i, shard_count, workers)) for i in range(workers)]
+
+
+def _worker_log_file(worker_id: int) -> str:
+    # Rotating one file from several processes would lose lines
+    root, ext = os.path.splitext(LOG_FILE)
+    return f"{root}.worker-{worker_id}{ext or '.log'}"
+
+
+class Worker:
+    def __init__(self, worker_id: int, shard_ids: List[int], env: Dict[str, str]):
+        self.worker_id = worker_id
+        self.shard_ids = shard_ids
+        self.env = env
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+    async def start(self) -> None:
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "bot.py", env=self.env
+        )
+        logger.info(
+            f"Started worker {self.worker_id} (pid {self.process.pid}) "
+            f"with shards {self.shard_ids}"
+        )
+
+    def terminate(self) -> None:
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+
+
+class Supervisor:
+    """Starts the workers and restarts the ones that exit"""
+
+    def __init__(
+        self,
+        shard_count: int,
+        workers: int,
+        shared_cache_path: str,
+        max_backoff: float,
+    ):
+        self.shard_count = shard_count
+        self.max_backoff = max_backoff
+        self.workers: List[Worker] = []
+        self._stopping = asyncio.Event()
+        for worker_id, shard_ids in enumerate(assign_shards(shard_count, workers)):
+            env = {
+                **os.environ,
+                "SHARD_COUNT": str(shard_count),
+                "SHARD_IDS": ",".join(map(str, shard_ids)),
+                "SHARED_CACHE_PATH": shared_cache_path,
+                "LOG_FILE": _worker_log_file(worker_id),
+            }
+            if METRICS_PORT:
+                # Each worker serves its own metrics on the next port
+                env["METRICS_PORT"] = str(METRICS_PORT + worker_id)
+            self.workers.append(Worker(worker_id, shard_ids, env))
+
+    def stop(self) -> None:
+        if not self._stopping.is_set():
+            logger.info("Stopping the cluster")
+            self._stopping.set()
+            for worker in self.workers:
+                worker.terminate()
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._supervise(worker) for worker in self.workers))
+
+    async def _supervise(self, worker: Worker) -> None:
+        backoff = 1.0
+        while not self._stopping.is_set():
+            started_at = time.monotonic()
+            await worker.start()
+            returncode = await self._wait(worker)
+            if self._stopping.is_set():
+                return
+            if time.monotonic() - started_at > STABLE_AFTER:
+                backoff = 1.0
+            worker.restarts += 1
+            logger.warning(
+                f"Worker {worker.worker_id} exited with {returncode}, "
+                f"restarting in {backoff:.0f}s"
+            )
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _wait(self, worker: Worker) -> int:
+        wait = asyncio.create_task(worker.process.wait())
+        stopping = asyncio.create_task(self._stopping.wait())
+        await asyncio.wait([wait, stopping], return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if not wait.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(wait), timeout=STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Killing worker {worker.worker_id}")
+                worker.process.kill()
+        return await wait
+
+
+async def run_cluster(
+    shard_count: int, workers: int, shared_cache_path: str, max_backoff: float
+) -> None:
+    supervisor = Supervisor(shard_count, workers, shared_cache_path, max_backoff)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, supervisor.stop)
+    await supervisor.run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="worker processes"
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=0,
+        help="total shards, by default as many as Discord recommends",
+    )
+    parser.add_argument(
+        "--shared-cache",
+        default=os.getenv("SHARED_CACHE_PATH") or "shared_cache.sqlite3",
+        help="SQLite file the workers share their caches through",
+    )
+    parser.add_argument(
+        "--max-backoff",
+        type=float,
+        default=60,
+        help="longest wait in seconds before restarting a worker that keeps exiting",
+    )
+    args = parser.parse_args()
+
+    shard_count = args.shards or recommended_shards(DISCORD_BOT_TOKEN)
+    # A worker without shards would have nothing to do
+    workers = max(1, min(args.workers, shard_count))
+    logger.info(f"Running {shard_count} shard(s) in {workers} worker(s)")
+    asyncio.run(
+        run_cluster(
+            shard_count,
+            workers,
+            os.path.abspath(args.shared_cache),
+            args.max_backoff,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,204 @@
+import asyncio
+import time
 import discord
 from discord.ext import commands
 from datetime import datetime, timedelta
 
 import utils.api
-from utils.config import API_BASE_URL_PROD
+import utils.metrics as metrics
+import utils.profiling as profiling
+from utils.admission import AdmissionError, admission
+from utils.config import (
+    API_ADD_DEADLINE,
+    API_BASE_URL_PROD,
+    API_COMMAND_DEADLINE,
+    NOW_PLAYING_MAX_BOARDS,
+    PLAY_BULK_CONCURRENCY,
+    PLAY_BULK_MAX,
+    PROFILE_MAX_SECONDS,
+    USERINFO_PAGE_SIZE,
+)
+from utils.now_playing import now_playing
+from utils.progress import ProgressMessage
+from utils.queue_plan import plan_block_move
+from utils.resilience import set_deadline
+from utils.room_hub import hub
 from utils.safe_reply import safe_reply
-
-from typing import Optional
+from utils.views import USER_FILTERS, QueueView, UserPagesView
+
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_PLAYLIST = (
+    "https://music.youtube.com/playlist?list=PLxqk0Y1WNUGpZVR40HTLncFl22lJzNcau"
+)
+# Attached lists larger than this are ignored
+MAX_ATTACHMENT_SIZE = 64 * 1024
+# Upper bound for the positions a single move or delete may name
+MAX_POSITIONS = 10_000
+
+
+def _truncate(text: str, length: int = 50) -> str:
+    return text if len(text) <= length else text[: length - 3] + "..."
+
+
+def _parse_play_entries(text: str) -> List[str]:
+    """Split text into URLs and search queries, one per line
+
+    Lines made up of URLs only may hold several of them.
+    """
+    entries = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        words = line.split()
+        if all(word.startswith(("http://", "https://")) for word in words):
+            entries.extend(words)
+        else:
+            entries.append(line)
+    return entries
+
+
+def _parse_positions(args: Sequence[str]) -> Optional[List[int]]:
+    """Queue positions from arguments like `3`, `10-40` or `3,5`, None if invalid"""
+    positions = []
+    for arg in args:
+        for part in arg.split(","):
+            if not part:
+                continue
+            start, dash, end = part.partition("-")
+            if not start.isdigit() or (dash and not end.isdigit()):
+                return None
+            if dash:
+                if int(end) < int(start):
+                    return None
+                positions.extend(range(int(start), int(end) + 1))
+            else:
+                positions.append(int(start))
+            if len(positions) > MAX_POSITIONS:
+                return None
+    return positions
+
+
+def _format_latencies(summary: dict, limit: int = 10) -> str:
+    """The most frequent label combinations of a histogram summary, one per line"""
+    if not summary:
+        return "No data yet"
+    lines = []
+    by_count = sorted(summary.items(), key=lambda entry: entry[1][0], reverse=True)
+    for labels, (count, mean, p95) in by_count[:limit]:
+        if p95 is None or p95 == float("inf"):
+            p95_text = "> 60 s"
+        else:
+            p95_text = f"≤ {p95 * 1000:g} ms"
+        lines.append(
+            f"`{' '.join(labels)}` {count}× avg {mean * 1000:.0f} ms, p95 {p95_text}"
+        )
+    return "\n".join(lines)[:1024]
 
 
 class Jukebox(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-    @commands.command(description="Show info about the current user")
+    def cog_unload(self):
+        asyncio.create_task(now_playing.close())
+        asyncio.create_task(hub.close())
+
+    async def cog_before_invoke(self, ctx: commands.Context):
+        # Bounds every API call the command makes, retries included
+        set_deadline(ctx.command.extras.get("api_deadline", API_COMMAND_DEADLINE))
+        # Commands that make no API calls are not rate limited
+        if not admission.enabled or not ctx.command.extras.get("admission", True):
+            return
+        command = ctx.command.qualified_name
+        started_at = time.perf_counter()
+        try:
+            await admission.admit(
+                str(ctx.author.id), utils.api.cached_room_code(ctx.author.id)
+            )
+        except AdmissionError as e:
+            metrics.admission_finished(
+                command, time.perf_counter() - started_at, e.scope
+            )
+            raise
+        # Command latency is measured from here on, the wait is recorded apart
+        metrics.admission_finished(command, time.perf_counter() - started_at)
+
+    async def _get_token(self, ctx: commands.Context) -> str:
+        """Get the user's token and keep their room subscribed on the hub"""
+        token = await utils.api.get_token_from_context(ctx)
+        hub.watch(token)
+        return token
+
+    @commands.command(
+        description="Browse the users, optionally only embedded, in-room or banned ones"
+    )
     @commands.is_owner()
-    async def userinfo(self, ctx: commands.Context):
-        """Show info about the user who invoked the command"""
+    async def userinfo(self, ctx: commands.Context, *filters: str):
+        """Browse the users page by page"""
+        names = [name.lower().replace("-", "_") for name in filters]
+        unknown = [name for name in names if name not in USER_FILTERS]
+        if unknown:
+            await safe_reply(
+                ctx,
+                f"❌ Unknown filter {unknown[0]}, use "
+                f"{', '.join(name.replace('_', '-') for name in USER_FILTERS)}.",
+            )
+            return
         async with ctx.typing():
-            users = await utils.api.get_all_users()
-            if len(users) == 0:
+            view = UserPagesView(
+                ctx.author.id,
+                {name: name in names for name in USER_FILTERS},
+                USERINFO_PAGE_SIZE,
+            )
+            embed = await view.render()
+            if not view.total and not names:
                 await safe_reply(ctx, "❌ No users found in the database!")
                 return
-            embed = discord.Embed(
-                title="Users",
-                color=discord.Color.orange(),
-            )
+            view.message = await safe_reply(ctx, embeds=[embed], view=view)
 
-            for user in users:
-                print(f"User: {user}")
-                created_at = int(user["created_at"] // 1000)
-                updated_at = int(user["updated_at"] // 1000)
-                embed.add_field(
-                    name=user["username"],
-                    value=
-                    f"User ID: {user['user_id']}\n"
-                    f"Connection ID: {user['connection_id'] or 'None'}\n"
-                    f"Is Embedded: {'Yes' if user['is_embedded'] else 'No'}\n"
-                    f"Associated Room Code: {user["associated_room_code"] or 'None'}\n"
-                    f"Created At: <t:{created_at}:F>\n"
-                    f"Updated At: <t:{updated_at}:F>",
-                    inline=False,
+    @commands.command(
+        description="Show latency and cache statistics", extras={"admission": False}
+    )
+    @commands.is_owner()
+    async def stats(self, ctx: commands.Context):
+        """Show API and command latencies and the counters of the bot's caches"""
+        embed = discord.Embed(title="📊 Stats", color=discord.Color.orange())
+        embed.add_field(
+            name="API Requests",
+            value=_format_latencies(metrics.api_request_duration.summary()),
+            inline=False,
+        )
+        embed.add_field(
+            name="Commands",
+            value=_format_latencies(metrics.command_duration.summary()),
+            inline=False,
+        )
+        embed.add_field(
+            name="Rate Limit Waits",
+            value=_format_latencies(metrics.admission_wait.summary()),
+            inline=False,
+        )
+        embed.add_field(
+            name="In Flight",
+            value=f"{metrics.api_requests_in_flight.value} API request(s)",
+            inline=False,
+        )
+        for name, stats in metrics.registry.stats().items():
+            embed.add_field(
+                name=name,
+                value="\n".join(
+                    f"{stat}: {value:.2f}"
+                    if isinstance(value, float)
+                    else f"{stat}: {value}"
+                    for stat, value in stats.items()
                 )
-            embed.set_footer(text=f"Total users: {len(users)}")
-            await safe_reply(ctx, embeds=[embed])
-    
+                or "-",
+                inline=True,
+            )
+        await safe_reply(ctx, embeds=[embed])
+
     @commands.command(description="Ban a user from the room")
     @commands.is_owner()
     async def ban(self, ctx: commands.Context, user_id: int, reason: Optional[str] = None, until: Optional[int] = None):
@@ -69,28 +223,74 @@ class Jukebox(commands.Cog):
             unbanned_user = await self.bot.fetch_user(user_id)
             await safe_reply(ctx, f"✅ Unbanned user {unbanned_user.name} (ID: {user_id})")
 
+    @commands.command(
+        description="Profile the bot's CPU usage for a while",
+        extras={"admission": False},
+    )
+    @commands.is_owner()
+    async def profile(self, ctx: commands.Context, seconds: int = 30):
+        """Capture a cProfile of the event loop and show the most expensive functions"""
+        if not 1 <= seconds <= PROFILE_MAX_SECONDS:
+            await safe_reply(
+                ctx, f"❌ Seconds must be between 1 and {PROFILE_MAX_SECONDS}!"
+            )
+            return
+
+        await safe_reply(ctx, f"⏱️ Profiling for {seconds} seconds...")
+        try:
+            path, summary = await profiling.profile_cpu(seconds)
+        except profiling.ProfilingError as e:
+            await safe_reply(ctx, f"❌ {e}")
+            return
+        await safe_reply(
+            ctx,
+            f"✅ Saved to `{path}`\n```\n{_truncate(summary, 1900)}\n```",
+            files=[discord.File(path)],
+        )
+
+    @commands.command(
+        description="Snapshot memory allocations, or stop tracing them",
+        extras={"admission": False},
+    )
+    @commands.is_owner()
+    async def memsnap(self, ctx: commands.Context, action: Optional[str] = None):
+        """Take a tracemalloc snapshot and diff it against the previous one"""
+        if action == "stop":
+            stopped = profiling.stop_memory_tracing()
+            await safe_reply(
+                ctx,
+                "✅ Stopped tracing allocations"
+                if stopped
+                else "❌ Allocations are not being traced!",
+            )
+            return
+
+        path, sites, is_diff = await profiling.memory_snapshot()
+        title = (
+            "Growth since the previous snapshot"
+            if is_diff
+            else f"Baseline, tracing until `{ctx.prefix}memsnap stop`"
+        )
+        listing = _truncate("\n".join(sites) or "No allocations traced", 1800)
+        await safe_reply(ctx, f"✅ Saved to `{path}`\n{title}:\n```\n{listing}\n```")
+
     @commands.command(description="Get current room status and queue")
     async def status(self, ctx: commands.Context):
         """Get current room information and queue"""
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            room_data = await utils.api.get_room(token)
-
-            room_info = room_data["room_info"]
-            queue_items = room_data["queue_items"]
+            token = await self._get_token(ctx)
+            room = await utils.api.get_room_snapshot(token, max_age=0)
 
             embed = discord.Embed(
-                title=f"🎵 Room: {room_info['room_code'] if len(room_info['room_code']) == 6 else 'Embedded'}",
+                title=f"🎵 Room: {room.room_code if len(room.room_code) == 6 else 'Embedded'}",
                 color=discord.Color.blue(),
             )
 
             # Room status
-            queue_text = f"Total tracks: {len(queue_items)}"
-            status_text = "⏸️ Paused" if room_info["is_paused"] else "▶️ Playing"
-            loop_text = "🔁 Loop: On" if room_info["is_looping"] else "🔁 Loop: Off"
-            shuffle_text = (
-                "🔀 Shuffle: On" if room_info["is_shuffled"] else "🔀 Shuffle: Off"
-            )
+            queue_text = f"Total tracks: {len(room)}"
+            status_text = "⏸️ Paused" if room.is_paused else "▶️ Playing"
+            loop_text = "🔁 Loop: On" if room.is_looping else "🔁 Loop: Off"
+            shuffle_text = "🔀 Shuffle: On" if room.is_shuffled else "🔀 Shuffle: Off"
 
             embed.add_field(
                 name="Status",
@@ -99,7 +299,7 @@ class Jukebox(commands.Cog):
             )
 
             # Current track
-            current_track_id = room_info["current_track"]["id"]
+            current_track_id = room.current_track_id
             if type(current_track_id) == str:
                 current_track = await utils.api.get_track(token, current_track_id)
                 if current_track and "title" in current_track:
@@ -114,35 +314,70 @@ class Jukebox(commands.Cog):
 
             await safe_reply(ctx, embeds=[embed])
 
+    @commands.command(
+        aliases=["np"],
+        description="Keep a message in this channel updated with what is playing",
+    )
+    async def nowplaying(self, ctx: commands.Context, action: Optional[str] = None):
+        """Post a now-playing message that follows the room, `nowplaying stop` removes it"""
+        if action == "stop":
+            message = now_playing.stop(ctx.channel.id)
+            if message is None:
+                await safe_reply(ctx, "❌ No now playing message in this channel!")
+                return
+            await _unpin_and_delete(message)
+            await safe_reply(ctx, "✅ Stopped updating the now playing message!")
+            return
+
+        is_new = ctx.channel.id not in now_playing
+        if is_new and len(now_playing) >= NOW_PLAYING_MAX_BOARDS:
+            await safe_reply(
+                ctx,
+                "❌ Too many now playing messages, stop one in another channel first!",
+            )
+            return
+
+        async with ctx.typing():
+            token = await self._get_token(ctx)
+            message = await safe_reply(ctx, "🎵 Loading now playing...", merge=False)
+            replaced = now_playing.start(ctx.channel.id, message, token)
+            if replaced is not None:
+                await _unpin_and_delete(replaced)
+            try:
+                await message.pin(reason="Now playing")
+            except discord.HTTPException:
+                # Pinning needs Manage Messages, the message updates regardless
+                pass
+
     @commands.command(description="Pause or unpause playback")
     async def pause(self, ctx: commands.Context):
         """Toggle pause state"""
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            await utils.api.pause_toggle(token, True)
+            token = await self._get_token(ctx)
+            paused = await utils.api.set_paused(token, True)
 
-            status = "⏸️ Paused"
+            status = "⏸️ Paused" if paused else "▶️ Resumed"
             await safe_reply(ctx, f"{status} playback!")
 
     @commands.command(description="Resume playback")
     async def resume(self, ctx: commands.Context):
         """Resume playback"""
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            await utils.api.pause_toggle(token, False)
+            token = await self._get_token(ctx)
+            paused = await utils.api.set_paused(token, False)
 
-            status = "▶️ Resumed"
+            status = "⏸️ Paused" if paused else "▶️ Resumed"
             await safe_reply(ctx, f"{status} playback!")
 
     @commands.command(description="Toggle loop mode")
     async def loop(self, ctx: commands.Context):
         """Toggle loop state"""
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            room_data = await utils.api.get_room(token)
+            token = await self._get_token(ctx)
+            room = await utils.api.get_room_snapshot(token)
 
             # Get current loop state and toggle it
-            current_loop_state = room_data["room_info"]["is_looping"]
+            current_loop_state = room.is_looping
             new_loop_state = not current_loop_state
 
             await utils.api.loop_toggle(token, new_loop_state)
@@ -154,11 +389,11 @@ class Jukebox(commands.Cog):
     async def shuffle(self, ctx: commands.Context):
         """Toggle shuffle state"""
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            room_data = await utils.api.get_room(token)
+            token = await self._get_token(ctx)
+            room = await utils.api.get_room_snapshot(token)
 
             # Get current shuffle state and toggle it
-            current_shuffle_state = room_data["room_info"]["is_shuffled"]
+            current_shuffle_state = room.is_shuffled
             new_shuffle_state = not current_shuffle_state
 
             await utils.api.shuffle_toggle(token, new_shuffle_state)
@@ -174,8 +409,8 @@ class Jukebox(commands.Cog):
             return
 
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            await utils.api.seek(token, seconds)
+            token = await self._get_token(ctx)
+            seconds = await utils.api.seek_to(token, seconds)
 
             minutes, secs = divmod(seconds, 60)
             await safe_reply(ctx, f"⏩ Seeked to {minutes}:{secs:02d}!")
@@ -191,17 +426,25 @@ class Jukebox(commands.Cog):
             return
 
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            room_data = await utils.api.get_room(token)
+            token = await self._get_token(ctx)
+            # Skips by other users at the same time are merged into this one
+            amount, target_index = await utils.api.skip_by(token, amount)
 
-            current_index = room_data["room_info"]["current_track"]["index"]
-            target_index = current_index + amount
+            if target_index is None:
+                await safe_reply(
+                    ctx, "❌ Could not find the current track in the queue!"
+                )
+                return
 
             if target_index < 0:
                 await safe_reply(ctx, "❌ Cannot skip to a negative index!")
                 return
 
-            await utils.api.skip(token, target_index)
+            if amount == 0:
+                await safe_reply(
+                    ctx, f"⏭️ Skips cancelled out, staying at index {target_index}!"
+                )
+                return
 
             direction = "forward" if amount > 0 else "backward"
             await safe_reply(
@@ -209,40 +452,137 @@ class Jukebox(commands.Cog):
                 f"⏭️ Skipped {direction} by {abs(amount)} track(s) to index {target_index}!",
             )
 
-    @commands.command(description="Move a track from one position to another")
-    async def move(self, ctx: commands.Context, from_index: int, to_index: int):
-        """Move track from one position to another"""
-        if from_index < 0 or to_index < 0:
-            await safe_reply(ctx, "❌ Indices must be non-negative!")
+    @commands.command(description="Move tracks to another position")
+    async def move(self, ctx: commands.Context, *positions: str):
+        """Move tracks to a position, e.g. `move 3 5-7 0` moves #3 and #5 to #7 to the top"""
+        indices = _parse_positions(positions)
+        if indices is None or len(indices) < 2:
+            await safe_reply(
+                ctx, "❌ Give the tracks to move and the position to move them to!"
+            )
             return
+        *from_indices, to_index = indices
+        from_indices = list(dict.fromkeys(from_indices))
 
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            await utils.api.move_track(token, from_index, to_index)
+            token = await self._get_token(ctx)
+            room = await utils.api.get_room_snapshot(token, max_age=0)
+            if max(from_indices + [to_index]) >= len(room):
+                await safe_reply(
+                    ctx, f"❌ Positions must be between 0 and {len(room) - 1}!"
+                )
+                return
 
-            await safe_reply(
-                ctx, f"🔄 Moved track from #{from_index} to #{to_index}!"
+            # Planned against one snapshot, every move accounts for the ones before it
+            order = room.item_ids()
+            moves = plan_block_move(
+                order, [order[index] for index in from_indices], to_index
             )
+            await utils.api.apply_moves(token, moves)
+
+            if len(from_indices) == 1:
+                await safe_reply(
+                    ctx, f"🔄 Moved track from #{from_indices[0]} to #{to_index}!"
+                )
+            else:
+                await safe_reply(
+                    ctx,
+                    f"🔄 Moved {len(from_indices)} tracks to #{to_index} "
+                    f"with {len(moves)} move(s)!",
+                )
 
-    @commands.command(description="Add a track to the queue")
+    @commands.command(
+        description="Add a track to the queue",
+        extras={"api_deadline": API_ADD_DEADLINE},
+    )
     async def play(
         self,
         ctx: commands.Context,
         *,
-        url_or_query: str = "https://music.youtube.com/playlist?list=PLxqk0Y1WNUGpZVR40HTLncFl22lJzNcau",
+        url_or_query: Optional[str] = None,
     ):
-        """Add track to queue"""
+        """Add tracks to queue, one per line or from an attached text file"""
+        entries = await self._play_entries(ctx, url_or_query)
+        if not entries:
+            entries = [DEFAULT_PLAYLIST]
+        if len(entries) > PLAY_BULK_MAX:
+            await safe_reply(
+                ctx, f"❌ Cannot add more than {PLAY_BULK_MAX} entries at once!"
+            )
+            return
+        if len(entries) > 1:
+            await self._play_bulk(ctx, entries)
+            return
+
         # Send a "typing" indicator since this might take a while
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            await utils.api.add_track(token, url_or_query)
-
-            # Truncate long URLs for display
-            display_text = url_or_query
-            if len(display_text) > 50:
-                display_text = display_text[:47] + "..."
-
-            await safe_reply(ctx, f"✅ Added to queue: {display_text}")
+            token = await self._get_token(ctx)
+            await utils.api.add_track(token, entries[0])
+
+            await safe_reply(ctx, f"✅ Added to queue: {_truncate(entries[0])}")
+
+    async def _play_entries(
+        self, ctx: commands.Context, url_or_query: Optional[str]
+    ) -> List[str]:
+        """URLs and queries from the message and its attached text files"""
+        entries = _parse_play_entries(url_or_query or "")
+        for attachment in ctx.message.attachments:
+            is_text = (attachment.content_type or "").startswith("text/")
+            if not is_text and not attachment.filename.endswith(".txt"):
+                continue
+            if attachment.size > MAX_ATTACHMENT_SIZE:
+                continue
+            text = (await attachment.read()).decode("utf-8", errors="replace")
+            entries.extend(_parse_play_entries(text))
+        return entries
+
+    async def _play_bulk(self, ctx: commands.Context, entries: List[str]):
+        """Add several entries concurrently, keeping them in the given order"""
+        token = await self._get_token(ctx)
+        progress = ProgressMessage(
+            await safe_reply(
+                ctx, f"⏳ Adding {len(entries)} entries to the queue...", merge=False
+            )
+        )
+        semaphore = asyncio.Semaphore(PLAY_BULK_CONCURRENCY)
+        added: List[List[int]] = [[] for _ in entries]
+        errors: Dict[int, str] = {}
+        finished = 0
+
+        async def add(i: int, entry: str):
+            nonlocal finished
+            async with semaphore:
+                # Each entry gets the time a single play command would
+                set_deadline(API_ADD_DEADLINE)
+                try:
+                    room = await utils.api.add_track(token, entry)
+                    added[i] = [item["id"] for item in room.get("added_items", [])]
+                except utils.api.ApiError as e:
+                    errors[i] = e.detail or e.title
+            finished += 1
+            progress.update(f"⏳ Adding to the queue... {finished}/{len(entries)}")
+
+        await asyncio.gather(*(add(i, entry) for i, entry in enumerate(entries)))
+
+        # Every add inserts after the current track, so they land in the
+        # order they finished in and have to be put back in the given order
+        order_error = None
+        try:
+            set_deadline(API_ADD_DEADLINE)
+            await utils.api.arrange_items(
+                token, [item_id for item_ids in added for item_id in item_ids]
+            )
+        except utils.api.ApiError as e:
+            order_error = e.detail or e.title
+
+        summary = f"✅ Added {len(entries) - len(errors)}/{len(entries)} to the queue"
+        for i, error in sorted(errors.items()):
+            summary += f"\n❌ {_truncate(entries[i])}: {error}"
+        if order_error:
+            summary += f"\n⚠️ Could not keep the given order: {order_error}"
+        if len(summary) > 2000:
+            summary = summary[:1997] + "..."
+        await progress.finish(summary)
 
     @commands.command(description="Remove a track from the queue by ID")
     async def remove(self, ctx: commands.Context, track_id: int):
@@ -252,81 +592,89 @@ class Jukebox(commands.Cog):
             return
 
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
+            token = await self._get_token(ctx)
             await utils.api.remove_track(token, track_id)
 
             await safe_reply(ctx, f"🗑️ Removed track with ID {track_id}!")
 
-    @commands.command(description="Delete a track from the queue by item ID")
-    async def delete(self, ctx: commands.Context, item_id: int):
-        """Delete track by item ID"""
-        if item_id < 0:
-            await safe_reply(ctx, "❌ Item ID must be non-negative!")
+    @commands.command(
+        description="Delete tracks from the queue by position, or by item ID with `id:`"
+    )
+    async def delete(self, ctx: commands.Context, *positions: str):
+        """Delete tracks by queue position, e.g. `delete 3 5 10-40`, or by item ID, e.g. `delete id:1234`"""
+        # Positions replaced item IDs as the plain argument, IDs need a prefix
+        id_args = [arg[3:] for arg in positions if arg.lower().startswith("id:")]
+        indices = _parse_positions(
+            [arg for arg in positions if not arg.lower().startswith("id:")]
+        )
+        given_ids = _parse_positions(id_args)
+        if indices is None or given_ids is None or not (indices or given_ids):
+            await safe_reply(
+                ctx,
+                "❌ Give the positions of the tracks to delete, "
+                "or their item IDs like `id:1234`!",
+            )
             return
 
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            await utils.api.delete_track(token, item_id)
-
-            await safe_reply(ctx, f"🗑️ Deleted track with item ID {item_id}!")
+            token = await self._get_token(ctx)
+            room = await utils.api.get_room_snapshot(token, max_age=0)
+
+            # Resolved to item IDs up front, so deletions don't shift the rest
+            item_ids = {}
+            skipped = []
+            for index in dict.fromkeys(indices):
+                pos = room.position_at_rank(index)
+                if pos is None:
+                    skipped.append(f"#{index} is out of range")
+                elif index == room.current_rank:
+                    skipped.append(f"#{index} is the current track")
+                else:
+                    item_ids[room.item(pos)["id"]] = f"#{index}"
+            current_pos = (
+                room.position_at_rank(room.current_rank)
+                if room.current_rank is not None
+                else None
+            )
+            for item_id in dict.fromkeys(given_ids):
+                pos = room.position_by_id(item_id)
+                if pos is None:
+                    skipped.append(f"ID {item_id} is not in the queue")
+                elif pos == current_pos:
+                    skipped.append(f"ID {item_id} is the current track")
+                else:
+                    item_ids.setdefault(item_id, f"ID {item_id}")
+
+            errors = await utils.api.delete_items(token, list(item_ids))
+            for item_id, error in errors.items():
+                skipped.append(f"{item_ids[item_id]}: {error.detail or error.title}")
+
+            reply = f"🗑️ Deleted {len(item_ids) - len(errors)} track(s)!"
+            for reason in skipped[:10]:
+                reply += f"\n❌ {reason}"
+            if len(skipped) > 10:
+                reply += f"\n❌ ...and {len(skipped) - 10} more"
+            await safe_reply(ctx, reply)
 
     @commands.command(description="Show the current queue")
     async def queue(self, ctx: commands.Context, page: int = 1):
-        """Show current queue with pagination"""
+        """Show the current queue, with buttons to page through it"""
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            room_data = await utils.api.get_room(token)
-
-            queue_items = room_data["queue_items"]
-            room_info = room_data["room_info"]
+            token = await self._get_token(ctx)
+            view = QueueView(token, ctx.author.id, page - 1)
+            embed = await view.render()
 
-            if not queue_items:
+            if embed is None:
                 await safe_reply(ctx, "📭 Queue is empty!")
                 return
 
-            # Pagination
-            items_per_page = 10
-            total_pages = (len(queue_items) + items_per_page - 1) // items_per_page
-
-            if page < 1 or page > total_pages:
+            if page < 1 or page > view.page_count:
                 await safe_reply(
-                    ctx, f"❌ Page must be between 1 and {total_pages}!"
+                    ctx, f"❌ Page must be between 1 and {view.page_count}!"
                 )
                 return
 
-            start_idx = (page - 1) * items_per_page
-            end_idx = min(start_idx + items_per_page, len(queue_items))
-            page_items = queue_items[start_idx:end_idx]
-
-            embed = discord.Embed(
-                title=f"🎵 Queue - Page {page}/{total_pages}",
-                description=f"Total tracks: {len(queue_items)}",
-                color=discord.Color.green(),
-            )
-
-            current_index = room_info["current_track"]["index"]
-
-            queue_text = ""
-            for item in page_items:
-                index = (
-                    item["shuffled_index"]
-                    if room_info["is_shuffled"]
-                    and item["shuffled_index"] is not None
-                    else item["index"]
-                )
-                marker = "▶️" if index == current_index else "🎵"
-                queue_text += (
-                    f"{marker} **#{index}** - ID: {item['track_id'][:15]}...\n"
-                )
-
-            embed.add_field(name="Tracks", value=queue_text, inline=False)
-
-            if total_pages > 1:
-                embed.set_footer(
-                    text=f"Use {ctx.prefix}queue <page> to see other pages"
-                )
-
-            await safe_reply(ctx, embeds=[embed])
+            view.message = await safe_reply(ctx, embeds=[embed], view=view)
 
     @commands.command(
         description="Show info about a track at an offset from the current track"
@@ -334,68 +682,34 @@ class Jukebox(commands.Cog):
     async def track(self, ctx: commands.Context, offset: int = 0):
         """Show info about a track at an offset from the current track index, respecting shuffle state"""
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
-            room_data = await utils.api.get_room(token)
-            queue_items = room_data["queue_items"]
-            room_info = room_data["room_info"]
-            is_shuffled = room_info.get("is_shuffled", False)
-            current_index = room_info["current_track"]["index"]
-            if is_shuffled:
-                current_item = next(
-                    (
-                        item
-                        for item in queue_items
-                        if item.get("shuffled_index") == current_index
-                    ),
-                    None,
-                )
+            token = await self._get_token(ctx)
+            room = utils.api.cached_room_snapshot(token)
+            if room is not None:
+                current_rank, total = room.current_rank, len(room)
             else:
-                current_item = next(
-                    (
-                        item
-                        for item in queue_items
-                        if item["index"] == current_index
-                    ),
-                    None,
-                )
-            if not current_item:
+                room_info = await utils.api.get_room_info(token)
+                current_rank, total = utils.api.current_rank(room_info), None
+            if current_rank is None:
                 await safe_reply(
                     ctx, f"❌ Could not find the current track in the queue!"
                 )
                 return
-            if is_shuffled:
-                target_shuffled_index = current_item["shuffled_index"] + offset
-                if target_shuffled_index < 0 or target_shuffled_index >= len(
-                    queue_items
-                ):
-                    await safe_reply(
-                        ctx,
-                        f"❌ Track index {target_shuffled_index} is out of range!",
-                    )
-                    return
-                track_item = next(
-                    (
-                        item
-                        for item in queue_items
-                        if item.get("shuffled_index") == target_shuffled_index
-                    ),
-                    None,
+            target_index = current_rank + offset
+            if target_index < 0 or (total is not None and target_index >= total):
+                await safe_reply(
+                    ctx, f"❌ Track index {target_index} is out of range!"
                 )
+                return
+            if room is not None:
+                track_id = room.track_id(room.position_at_rank(target_index))
             else:
-                target_index = current_item["index"] + offset
-                if target_index < 0 or target_index >= len(queue_items):
+                page = await utils.api.get_queue_page(token, target_index, 1)
+                if not page.items:
                     await safe_reply(
                         ctx, f"❌ Track index {target_index} is out of range!"
                     )
                     return
-                track_item = next(
-                    (item for item in queue_items if item["index"] == target_index),
-                    None,
-                )
-            if not track_item:
-                await safe_reply(ctx, f"❌ No track found at the requested index!")
-                return
-            track_id = track_item["track_id"]
+                track_id = page.items[0]["track_id"]
             track = await utils.api.get_track(token, track_id)
             if not track or "title" not in track:
                 await safe_reply(ctx, f"❌ Could not fetch track info!")
@@ -415,10 +729,20 @@ class Jukebox(commands.Cog):
     async def clear(self, ctx: commands.Context):
         """Clear the current queue"""
         async with ctx.typing():
-            token = await utils.api.get_token_from_context(ctx)
+            token = await self._get_token(ctx)
             await utils.api.clear_queue(token)
             await safe_reply(ctx, "🧹 Cleared the queue!")
 
 
+async def _unpin_and_delete(message: discord.Message) -> None:
+    try:
+        await message.delete()
+    except discord.HTTPException:
+        try:
+            await message.unpin()
+        except discord.HTTPException:
+            pass
+
+
 def setup(bot: discord.Bot):
     bot.add_cog(Jukebox(bot))
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The bot's config refuses to load without these, none of them are used.
+# Set before anything from utils is imported.
+os.environ.setdefault("API_BASE_URL", "http://api.invalid")
+os.environ.setdefault("API_BASE_URL_PROD", "http://api.invalid")
+os.environ.setdefault("JWT_SECRET", "test-secret-test-secret-test-secret-test")
+os.environ.setdefault("DISCORD_BOT_TOKEN", "test")
+os.environ.setdefault("ROOM_HUB_ENABLED", "false")
+# Keep test runs from logging into the bot directory
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "bot-tests.log"))
+
+# Tests import the bot's modules the way bot.py does, from the bot directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _room(
+    room_code="AAAAAA",
+    track_ids=("a", "b", "c"),
+    shuffled=None,
+    current=0,
+    is_shuffled=False,
+):
+    """A RoomResponse with one queue item per track, item IDs counting from 1"""
+    items = [
+        {
+            "id": i + 1,
+            "track_id": track_id,
+            "index": i,
+            "shuffled_index": None if shuffled is None else shuffled[i],
+            "is_deleted": False,
+        }
+        for i, track_id in enumerate(track_ids)
+    ]
+    current_item = {"index": None, "shuffle_index": None, "id": None, "track_id": None}
+    if current is not None and items:
+        item = items[current]
+        current_item = {
+            "index": item["index"],
+            "shuffle_index": item["shuffled_index"],
+            "id": item["id"],
+            "track_id": item["track_id"],
+        }
+    return {
+        "room_info": {
+            "room_code": room_code,
+            "is_paused": False,
+            "is_looping": False,
+            "is_shuffled": is_shuffled,
+            "current_item": current_item,
+            "playing_since": None,
+        },
+        "queue_items": items,
+    }
+
+
+@pytest.fixture
+def make_room():
+    return _room
@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import pytest
+
+import utils.metrics as metrics
+from utils.admission import AdmissionControl, AdmissionError
+from utils.resilience import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.monotonic()]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_bucket_allows_a_burst_then_refills_evenly(clock):
+    bucket = TokenBucket(capacity=2, period=10)
+    for _ in range(2):
+        assert bucket.delay() == 0
+        bucket.take()
+    assert bucket.delay() == pytest.approx(5)
+
+    clock[0] += 5
+    assert bucket.delay() == 0
+    assert bucket.until_full() == pytest.approx(5)
+
+
+def test_bucket_never_holds_more_than_its_capacity(clock):
+    bucket = TokenBucket(capacity=2, period=10)
+    clock[0] += 100
+    for _ in range(2):
+        bucket.take()
+    assert bucket.delay() > 0
+
+
+def test_blocked_bucket_waits_out_the_block(clock):
+    bucket = TokenBucket(capacity=5, period=5)
+    bucket.block(3)
+    assert bucket.delay() == pytest.approx(3)
+
+    clock[0] += 3
+    # Emptied as well, so it refills from nothing
+    assert bucket.delay() == 0
+    assert bucket.until_full() == pytest.approx(2)
+
+
+def _control(**limits):
+    return AdmissionControl(
+        enabled=True,
+        user_limit=limits.get("user", (10, 10)),
+        room_limit=limits.get("room", (10, 10)),
+        global_limit=limits.get("global", (100, 100)),
+        max_wait=limits.get("max_wait", 0.05),
+        max_in_flight=2,
+        tracked_keys=16,
+    )
+
+
+def test_commands_over_the_user_limit_are_rejected():
+    control = _control(user=(0.1, 2))
+
+    async def main():
+        await control.admit("1", "AAAAAA")
+        await control.admit("1", "AAAAAA")
+        with pytest.raises(AdmissionError) as e:
+            await control.admit("1", "AAAAAA")
+        # Other users still have tokens
+        await control.admit("2", "AAAAAA")
+        return e.value
+
+    error = asyncio.run(main())
+    assert error.scope == "user"
+    assert error.retry_after > 0
+    assert control.stats()["admitted"] == 3
+    assert control.stats()["rejected_user"] == 1
+
+
+def test_room_limit_is_shared_by_its_users():
+    control = _control(room=(0.1, 2))
+
+    async def main():
+        await control.admit("1", "AAAAAA")
+        await control.admit("2", "AAAAAA")
+        with pytest.raises(AdmissionError) as e:
+            await control.admit("3", "AAAAAA")
+        # Without a known room only the user and global limits apply
+        await control.admit("3", None)
+        await control.admit("3", "BBBBBB")
+        return e.value
+
+    assert asyncio.run(main()).scope == "room"
+
+
+def test_short_waits_are_waited_out():
+    # A token every 10ms, well within max_wait
+    control = _control(user=(100, 1), max_wait=1)
+
+    async def main():
+        await control.admit("1", None)
+        await control.admit("1", None)
+
+    asyncio.run(main())
+    assert control.stats()["waited"] == 1
+    assert control.stats()["waiting"] == 0
+
+
+def test_disabled_control_admits_everything():
+    control = AdmissionControl(enabled=False, user_limit=(0.1, 1))
+
+    async def main():
+        for _ in range(5):
+            await control.admit("1", "AAAAAA")
+
+    asyncio.run(main())
+    assert control.stats()["rejected_user"] == 0
+
+
+def test_api_slots_are_capped():
+    control = _control()
+
+    async def main():
+        assert await control.acquire_slot(1)
+        assert await control.acquire_slot(1)
+        assert not await control.acquire_slot(0.01)
+        control.release_slot()
+        assert await control.acquire_slot(0.01)
+
+    asyncio.run(main())
+    assert control.stats()["api_in_flight"] == 2
+    assert control.stats()["api_slot_timeouts"] == 1
+
+
+def test_waits_and_rejections_are_recorded():
+    rejected = metrics.admission_rejected.values().get(("play", "room"), 0)
+    waits = metrics.admission_wait.summary().get(("rejected",), (0,))[0]
+
+    metrics.admission_finished("play", 0.2)
+    metrics.admission_finished("play", 0.5, "room")
+
+    assert metrics.admission_rejected.values()[("play", "room")] == rejected + 1
+    assert metrics.admission_wait.summary()[("rejected",)][0] == waits + 1
+    assert 'command="play",scope="room"' in metrics.registry.expose()
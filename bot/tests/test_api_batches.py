@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import utils.api
+
+
+@pytest.fixture
+def api(make_room, monkeypatch):
+    """Answers the batch endpoints with a room, and records the requests"""
+    requests = []
+    failed_items = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200, json={**make_room(), "failed_items": failed_items})
+
+    monkeypatch.setattr(
+        utils.api,
+        "_client",
+        httpx.AsyncClient(
+            base_url="http://api.invalid", transport=httpx.MockTransport(handle)
+        ),
+    )
+    utils.api.room_state.clear()
+    yield requests, failed_items
+    utils.api.room_state.clear()
+
+
+def test_moves_are_sent_in_one_request(api):
+    requests, _ = api
+    asyncio.run(utils.api.apply_moves("token", [(3, 0), (4, 1)]))
+
+    [(path, body)] = requests
+    assert path == "/api/room/move/batch"
+    assert body["moves"] == [{"from": 3, "to": 0}, {"from": 4, "to": 1}]
+    assert utils.api.room_state.get("AAAAAA") is not None
+
+
+def test_deletes_are_sent_in_one_request(api):
+    requests, failed_items = api
+    failed_items.append({"item_id": 7, "error": "Item not found."})
+
+    errors = asyncio.run(utils.api.delete_items("token", [1, 7]))
+
+    [(path, body)] = requests
+    assert path == "/api/room/delete/batch"
+    assert body["values"] == [1, 7]
+    assert list(errors) == [7]
+    assert errors[7].status_code == 400
+    assert errors[7].detail == "Item not found."
+
+
+def test_nothing_is_sent_for_empty_batches(api):
+    requests, _ = api
+    asyncio.run(utils.api.apply_moves("token", []))
+    assert asyncio.run(utils.api.delete_items("token", [])) == {}
+    assert requests == []
@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import utils.api
+from utils.api import ApiError
+
+
+class FakeApi:
+    """Answers user lookups with a room that can change, and counts them"""
+
+    def __init__(self):
+        self.room_codes = {"1": "AAAAAA"}
+        self.lookups = 0
+        self.responses = {}
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path in self.responses:
+            return self.responses[path]
+        if path.startswith("/api/user/"):
+            self.lookups += 1
+            user_id = path.rsplit("/", 1)[1]
+            return httpx.Response(
+                200, json={"associated_room_code": self.room_codes.get(user_id)}
+            )
+        return httpx.Response(404, json={"title": "Not Found"})
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeApi()
+    utils.api.clear_caches()
+    monkeypatch.setattr(
+        utils.api,
+        "_client",
+        httpx.AsyncClient(
+            base_url="http://api.invalid", transport=httpx.MockTransport(fake.handle)
+        ),
+    )
+    yield fake
+    utils.api.clear_caches()
+
+
+def _ctx(user_id: int) -> SimpleNamespace:
+    return SimpleNamespace(author=SimpleNamespace(id=user_id))
+
+
+def test_token_is_reused_while_the_room_is_unchanged(api):
+    async def main():
+        first = await utils.api.get_token_from_context(_ctx(1))
+        second = await utils.api.get_token_from_context(_ctx(1))
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert api.lookups == 1
+    assert utils.api.token_room_code(first) == "AAAAAA"
+
+
+def test_room_code_is_looked_up_again_after_its_ttl(api, monkeypatch):
+    # Every cached room code is already expired
+    monkeypatch.setattr(utils.api._room_codes, "ttl", 0)
+
+    async def main():
+        first = await utils.api.get_token_from_context(_ctx(1))
+        api.room_codes["1"] = "BBBBBB"
+        second = await utils.api.get_token_from_context(_ctx(1))
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert api.lookups == 2
+    assert utils.api.token_room_code(first) == "AAAAAA"
+    assert utils.api.token_room_code(second) == "BBBBBB"
+
+
+def test_missing_track_does_not_evict_the_user(api):
+    async def main():
+        token = await utils.api.get_token_from_context(_ctx(1))
+        with pytest.raises(ApiError):
+            await utils.api.get_track(token, "missing")
+
+    asyncio.run(main())
+    assert utils.api.cached_room_code(1) == "AAAAAA"
+
+
+@pytest.mark.parametrize(
+    "path, status",
+    [("/api/room", 401), ("/api/room", 403), ("/api/room", 404)],
+)
+def test_rejected_room_read_evicts_the_user(api, path, status):
+    api.responses[path] = httpx.Response(status, json={"title": "Rejected"})
+
+    async def main():
+        token = await utils.api.get_token_from_context(_ctx(1))
+        with pytest.raises(ApiError):
+            await utils.api.get_room(token)
+
+    asyncio.run(main())
+    assert utils.api.cached_room_code(1) is None
+
+
+def test_invalidate_token_forgets_the_room_code(api):
+    asyncio.run(utils.api.get_token_from_context(_ctx(1)))
+    utils.api.invalidate_token(1)
+    assert utils.api.cached_room_code(1) is None
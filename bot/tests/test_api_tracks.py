@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import utils.api
+
+
+def _track(webpage_url_hash):
+    return {
+        "id": webpage_url_hash,
+        "webpage_url": f"https://example.invalid/{webpage_url_hash}",
+        "title": f"Track {webpage_url_hash}",
+        "uploader": "Uploader",
+    }
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Answers track batches with the known tracks, and records the hashes asked for"""
+    known = {"a", "b", "c", "d"}
+    requests = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        hashes = json.loads(request.content)["webpage_url_hashes"]
+        requests.append(hashes)
+        # Lets concurrent lookups of the same tracks find this one in flight
+        await asyncio.sleep(0.01)
+        tracks = [_track(h) for h in hashes if h in known]
+        if not tracks:
+            return httpx.Response(404, json={"title": "Not Found"})
+        return httpx.Response(200, json=tracks)
+
+    monkeypatch.setattr(
+        utils.api,
+        "_client",
+        httpx.AsyncClient(
+            base_url="http://api.invalid", transport=httpx.MockTransport(handle)
+        ),
+    )
+    utils.api.clear_caches()
+    yield requests
+    utils.api.clear_caches()
+
+
+def _titles(tracks):
+    return [track["title"] for track in tracks]
+
+
+def test_duplicate_hashes_are_fetched_once(api):
+    tracks = asyncio.run(utils.api.get_tracks("token", ["a", "b", "a", "a"]))
+
+    assert api == [["a", "b"]]
+    # Every occurrence is answered, in the order asked for
+    assert _titles(tracks) == ["Track a", "Track b", "Track a", "Track a"]
+
+
+def test_only_uncached_tracks_are_fetched(api):
+    asyncio.run(utils.api.get_tracks("token", ["a", "b"]))
+    tracks = asyncio.run(utils.api.get_tracks("token", ["c", "a", "d", "b"]))
+
+    assert api == [["a", "b"], ["c", "d"]]
+    assert _titles(tracks) == ["Track c", "Track a", "Track d", "Track b"]
+
+
+def test_cached_batches_make_no_request(api):
+    asyncio.run(utils.api.get_tracks("token", ["a", "b"]))
+    tracks = asyncio.run(utils.api.get_tracks("token", ["b", "a"]))
+
+    assert len(api) == 1
+    assert _titles(tracks) == ["Track b", "Track a"]
+
+
+def test_tracks_missing_from_the_response_are_skipped(api):
+    tracks = asyncio.run(utils.api.get_tracks("token", ["a", "gone", "b"]))
+
+    assert _titles(tracks) == ["Track a", "Track b"]
+    # Unknown tracks are not cached, they are asked for again
+    asyncio.run(utils.api.get_tracks("token", ["a", "gone"]))
+    assert api == [["a", "gone", "b"], ["gone"]]
+
+
+def test_a_batch_of_unknown_tracks_is_empty(api):
+    assert asyncio.run(utils.api.get_tracks("token", ["gone", "lost"])) == []
+
+
+def test_concurrent_lookups_share_the_request(api):
+    async def main():
+        return await asyncio.gather(
+            utils.api.get_tracks("token", ["a", "b"]),
+            utils.api.get_tracks("token", ["b", "c"]),
+        )
+
+    first, second = asyncio.run(main())
+
+    assert api == [["a", "b"], ["c"]]
+    assert _titles(first) == ["Track a", "Track b"]
+    assert _titles(second) == ["Track b", "Track c"]
@@ -0,0 +1,101 @@
+import asyncio
+import contextlib
+
+import pytest
+
+import cogs.jukebox
+import utils.api
+from cogs.jukebox import MAX_POSITIONS, Jukebox, _parse_positions
+from utils.room_snapshot import RoomSnapshot
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        (["3"], [3]),
+        (["10-12"], [10, 11, 12]),
+        (["3,5"], [3, 5]),
+        (["1-2,7", "9"], [1, 2, 7, 9]),
+        (["4,"], [4]),
+    ],
+)
+def test_parses_positions_ranges_and_lists(args, expected):
+    assert _parse_positions(args) == expected
+
+
+@pytest.mark.parametrize("args", [["a"], ["5-3"], ["-3"], ["3-"], ["1.5"]])
+def test_rejects_invalid_positions(args):
+    assert _parse_positions(args) is None
+
+
+def test_rejects_too_many_positions():
+    assert _parse_positions([f"0-{MAX_POSITIONS}"]) is None
+
+
+@pytest.fixture
+def delete(make_room, monkeypatch):
+    """Runs `delete` against a room of five tracks, returning the deleted IDs and reply"""
+    room = RoomSnapshot(make_room(track_ids=("a", "b", "c", "d", "e"), current=1))
+    deleted = []
+    replies = []
+
+    async def get_token(self, ctx):
+        return "token"
+
+    async def get_room_snapshot(token, max_age=None):
+        return room
+
+    async def delete_items(token, item_ids):
+        deleted.extend(item_ids)
+        return {}
+
+    async def safe_reply(ctx, content):
+        replies.append(content)
+
+    monkeypatch.setattr(Jukebox, "_get_token", get_token)
+    monkeypatch.setattr(utils.api, "get_room_snapshot", get_room_snapshot)
+    monkeypatch.setattr(utils.api, "delete_items", delete_items)
+    monkeypatch.setattr(cogs.jukebox, "safe_reply", safe_reply)
+
+    class Context:
+        def typing(self):
+            return contextlib.nullcontext()
+
+    def run(*args):
+        deleted.clear()
+        replies.clear()
+        asyncio.run(Jukebox.delete.callback(Jukebox(None), Context(), *args))
+        return deleted, replies[-1]
+
+    return run
+
+
+
+def test_deletes_by_position(delete):
+    deleted, reply = delete("0", "3-4")
+    assert deleted == [1, 4, 5]
+    assert reply == "🗑️ Deleted 3 track(s)!"
+
+
+def test_deletes_by_item_id(delete):
+    deleted, reply = delete("id:3", "ID:4,5", "0")
+    assert deleted == [1, 3, 4, 5]
+    assert reply == "🗑️ Deleted 4 track(s)!"
+
+
+def test_skips_the_current_track_and_unknown_ids(delete):
+    deleted, reply = delete("1", "id:2", "id:99", "9")
+    assert deleted == []
+    assert reply.splitlines()[1:] == [
+        "❌ #1 is the current track",
+        "❌ #9 is out of range",
+        "❌ ID 2 is the current track",
+        "❌ ID 99 is not in the queue",
+    ]
+
+
+@pytest.mark.parametrize("args", [(), ("id:",), ("id:x",), ("x",)])
+def test_delete_needs_positions_or_ids(delete, args):
+    deleted, reply = delete(*args)
+    assert deleted == []
+    assert "`id:1234`" in reply
@@ -0,0 +1,106 @@
+import json
+import logging
+import sys
+import threading
+from datetime import timedelta
+
+import utils.logger
+from utils.logger import JsonFormatter, logger
+
+
+class SlowHandler(logging.Handler):
+    """Keeps the records it is given, slowly enough for some to still be queued"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.writer = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        threading.Event().wait(0.005)
+        self.writer = threading.current_thread()
+        self.records.append(record)
+
+
+def _record(message="Command done", *args, exc_info=None, **extra):
+    return logging.getLogger("bot.test").makeRecord(
+        "bot.test", logging.INFO, __file__, 1, message, args, exc_info, extra=extra
+    )
+
+
+def test_json_lines_carry_the_structured_fields():
+    line = JsonFormatter().format(
+        _record(
+            "Ran %s",
+            "play",
+            command="play",
+            user=1234,
+            room="AAAAAA",
+            duration=timedelta(seconds=1.5),
+        )
+    )
+
+    entry = json.loads(line)
+    assert entry["message"] == "Ran play"
+    assert entry["logger"] == "bot.test"
+    assert entry["level"] == "INFO"
+    assert entry["command"] == "play"
+    assert entry["user"] == 1234
+    assert entry["room"] == "AAAAAA"
+    # Values JSON can't hold are written as text
+    assert entry["duration"] == "0:00:01.500000"
+    assert "time" in entry
+    assert "\n" not in line
+
+
+def test_json_lines_leave_out_missing_fields_and_keep_exceptions():
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        record = _record(exc_info=sys.exc_info(), room=None)
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert not {"command", "user", "room", "duration"} & entry.keys()
+    assert entry["exception"].endswith("ValueError: broken")
+
+
+def test_records_are_written_off_the_calling_thread_and_flushed_on_stop(
+    monkeypatch,
+):
+    listener = utils.logger._listener
+    handler = SlowHandler()
+    monkeypatch.setattr(listener, "handlers", (handler,))
+    try:
+        for i in range(50):
+            logger.info("Record %d", i)
+        # Not all written yet, the handler is slower than the logging
+        assert len(handler.records) < 50
+        listener.stop()
+        assert [record.getMessage() for record in handler.records] == [
+            f"Record {i}" for i in range(50)
+        ]
+        assert handler.writer is not threading.current_thread()
+    finally:
+        monkeypatch.undo()
+        listener.start()
+
+
+def test_queued_records_keep_exceptions_and_merged_arguments(monkeypatch):
+    listener = utils.logger._listener
+    handler = SlowHandler()
+    monkeypatch.setattr(listener, "handlers", (handler,))
+    arguments = ["before"]
+    try:
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            logger.exception("Failed with %s", arguments)
+        arguments[0] = "after"
+        listener.stop()
+    finally:
+        monkeypatch.undo()
+        listener.start()
+
+    [record] = handler.records
+    assert record.getMessage() == "Failed with ['before']"
+    assert record.exc_info[0] is ValueError
@@ -0,0 +1,137 @@
+import asyncio
+
+import utils.api
+from utils.mutations import MutationScheduler
+
+
+def _add(batch, value):
+    return (batch or 0) + value
+
+
+def _last(batch, value):
+    return value
+
+
+def test_burst_is_applied_once_with_the_merged_value():
+    applied = []
+
+    async def apply(value):
+        applied.append(value)
+        return value
+
+    async def main():
+        scheduler = MutationScheduler(debounce=0.01)
+        results = await asyncio.gather(
+            *(scheduler.submit("room", 1, _add, apply) for _ in range(3))
+        )
+        return scheduler, results
+
+    scheduler, results = asyncio.run(main())
+    assert applied == [3]
+    assert results == [3, 3, 3]
+    assert scheduler.stats() == {"pending": 0, "submitted": 3, "applied": 1}
+
+
+def test_keys_are_batched_separately():
+    applied = []
+
+    async def apply(value):
+        applied.append(value)
+
+    async def main():
+        scheduler = MutationScheduler(debounce=0.01)
+        await asyncio.gather(
+            scheduler.submit("a", 1, _add, apply),
+            scheduler.submit("b", 2, _add, apply),
+        )
+
+    asyncio.run(main())
+    assert sorted(applied) == [1, 2]
+
+
+def test_batches_of_a_key_are_applied_in_order():
+    events = []
+
+    async def apply(value):
+        events.append(("start", value))
+        await asyncio.sleep(0.03)
+        events.append(("end", value))
+
+    async def main():
+        scheduler = MutationScheduler(debounce=0.01)
+        first = asyncio.create_task(scheduler.submit("room", 1, _add, apply))
+        # Starts a new batch once the first one is being applied
+        await asyncio.sleep(0.02)
+        second = asyncio.create_task(scheduler.submit("room", 10, _add, apply))
+        await asyncio.gather(first, second)
+
+    asyncio.run(main())
+    assert events == [("start", 1), ("end", 1), ("start", 10), ("end", 10)]
+
+
+def test_errors_reach_every_submitter():
+    async def apply(value):
+        raise RuntimeError("failed")
+
+    async def main():
+        scheduler = MutationScheduler(debounce=0.01)
+        return await asyncio.gather(
+            scheduler.submit("room", 1, _add, apply),
+            scheduler.submit("room", 1, _add, apply),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_values_that_cannot_join_start_the_next_batch():
+    events = []
+
+    async def apply(value):
+        events.append(("start", value))
+        await asyncio.sleep(0.02)
+        events.append(("end", value))
+        return value
+
+    def same(batch, value):
+        return batch == value
+
+    async def main():
+        scheduler = MutationScheduler(debounce=0.01)
+        results = await asyncio.gather(
+            *(
+                scheduler.submit("room", value, _last, apply, joins=same)
+                for value in (True, True, False, False)
+            )
+        )
+        return scheduler, results
+
+    scheduler, results = asyncio.run(main())
+    assert events == [
+        ("start", True),
+        ("end", True),
+        ("start", False),
+        ("end", False),
+    ]
+    assert results == [True, True, False, False]
+    assert scheduler.stats() == {"pending": 0, "submitted": 4, "applied": 2}
+
+
+def test_pause_and_resume_each_get_their_own_request(monkeypatch):
+    sent = []
+
+    async def pause_toggle(token, paused):
+        sent.append(paused)
+
+    monkeypatch.setattr(utils.api, "pause_toggle", pause_toggle)
+
+    async def main():
+        return await asyncio.gather(
+            utils.api.set_paused("token", True),
+            utils.api.set_paused("token", False),
+            utils.api.set_paused("token", False),
+        )
+
+    assert asyncio.run(main()) == [True, False, False]
+    assert sent == [True, False]
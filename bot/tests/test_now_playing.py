@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import jwt
+import pytest
+
+import utils.api
+import utils.now_playing
+from utils.config import JWT_SECRET
+from utils.now_playing import NowPlayingBoard
+
+
+class FakeMessage:
+    def __init__(self, id):
+        self.id = id
+
+
+def _token(room_code):
+    return jwt.encode(
+        {"user_id": "1", "room_code": room_code}, JWT_SECRET, algorithm="HS256"
+    )
+
+
+@pytest.fixture
+def edits(monkeypatch):
+    """The edits sent through the outbox, as (message id, embed) pairs"""
+    sent = []
+
+    async def edit(message, priority, **kwargs):
+        sent.append((message.id, kwargs["embed"]))
+
+    async def get_track(token, track_id):
+        return {"id": track_id, "title": f"Track {track_id}"}
+
+    monkeypatch.setattr(utils.now_playing.outbox, "edit", edit)
+    monkeypatch.setattr(utils.now_playing.hub, "watch", lambda token: None)
+    monkeypatch.setattr(utils.api, "get_track", get_track)
+    utils.api.room_state.clear()
+    yield sent
+    utils.api.room_state.clear()
+
+
+async def _until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def _status(embed):
+    return embed.fields[0].value
+
+
+def test_a_burst_of_changes_costs_one_edit(make_room, edits):
+    async def main():
+        board = NowPlayingBoard(interval=0.2, refresh=60)
+        try:
+            utils.api.room_state.update(make_room(), live=True)
+            board.start(1, FakeMessage(10), _token("AAAAAA"))
+            await _until(lambda: len(edits) == 1)
+
+            for current in (1, 2, 0, 2):
+                room = make_room(current=current)
+                room["room_info"]["is_paused"] = current == 2
+                utils.api.room_state.update(room, live=True)
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.4)
+            return board.stats()
+        finally:
+            await board.close()
+            utils.api.room_state.remove_listener(board._room_changed)
+
+    stats = asyncio.run(main())
+    assert len(edits) == 2
+    assert edits[0][1].title == "🎵 Track a"
+    message_id, embed = edits[1]
+    assert message_id == 10
+    assert embed.title == "🎵 Track c"
+    assert _status(embed).startswith("⏸️ Paused")
+    assert stats["changes"] == 4
+    assert stats["edits"] == 2
+
+
+def test_unchanged_rooms_are_not_edited(make_room, edits):
+    async def main():
+        board = NowPlayingBoard(interval=0.05, refresh=60)
+        try:
+            utils.api.room_state.update(make_room(), live=True)
+            board.start(1, FakeMessage(10), _token("AAAAAA"))
+            await _until(lambda: len(edits) == 1)
+            utils.api.room_state.update(make_room(), live=True)
+            await _until(lambda: board.unchanged == 1)
+        finally:
+            await board.close()
+            utils.api.room_state.remove_listener(board._room_changed)
+
+    asyncio.run(main())
+    assert len(edits) == 1
+
+
+def test_one_scheduler_serves_every_channel(make_room, edits):
+    async def main():
+        board = NowPlayingBoard(interval=0.05, refresh=60)
+        try:
+            utils.api.room_state.update(make_room("AAAAAA"), live=True)
+            utils.api.room_state.update(
+                make_room("BBBBBB", track_ids=("x", "y")), live=True
+            )
+            board.start(1, FakeMessage(10), _token("AAAAAA"))
+            scheduler = board._task
+            board.start(2, FakeMessage(20), _token("BBBBBB"))
+            assert board._task is scheduler
+            await _until(lambda: len(edits) == 2)
+
+            utils.api.room_state.update(
+                make_room("BBBBBB", track_ids=("x", "y"), current=1), live=True
+            )
+            await _until(lambda: len(edits) == 3)
+            await asyncio.sleep(0.1)
+
+            schedulers = [
+                task
+                for task in asyncio.all_tasks()
+                if task.get_coro().__qualname__ == "NowPlayingBoard._run"
+            ]
+            assert schedulers == [scheduler]
+            return board.stats()
+        finally:
+            await board.close()
+            utils.api.room_state.remove_listener(board._room_changed)
+
+    stats = asyncio.run(main())
+    assert sorted(message_id for message_id, _ in edits[:2]) == [10, 20]
+    assert edits[2][0] == 20
+    assert edits[2][1].title == "🎵 Track y"
+    assert len(edits) == 3
+    assert stats["boards"] == 2
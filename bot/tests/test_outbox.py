@@ -0,0 +1,171 @@
+import asyncio
+from types import SimpleNamespace
+
+import utils.outbox
+from utils.outbox import Outbox, Priority
+from utils.progress import ProgressMessage
+
+
+class FakeChannel:
+    """Records what is sent to it, each send returning a new message"""
+
+    def __init__(self, channel_id=1):
+        self.id = channel_id
+        self.sent = []
+        self.edits = []
+
+    async def send(self, **kwargs):
+        self.sent.append(kwargs)
+        return SimpleNamespace(id=len(self.sent), channel=self, **kwargs)
+
+
+class FakeMessage:
+    """Records its edits in the channel, in the order they are made"""
+
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    async def edit(self, **kwargs):
+        self.channel.edits.append((self.id, kwargs))
+        return self
+
+
+def _reference(message_id, channel_id=1):
+    return SimpleNamespace(channel_id=channel_id, message_id=message_id)
+
+
+def run(*sends):
+    """Queue the sends before the channel's worker gets to run, and wait for them"""
+
+    async def main():
+        outbox = Outbox()
+        try:
+            results = await asyncio.gather(*(send(outbox) for send in sends))
+        finally:
+            await outbox.close()
+        return outbox, results
+
+    return asyncio.run(main())
+
+
+def test_replies_to_the_same_message_are_merged():
+    channel = FakeChannel()
+    outbox, results = run(
+        lambda outbox: outbox.send(channel, content="one", reference=_reference(10)),
+        lambda outbox: outbox.send(channel, content="two", reference=_reference(10)),
+        lambda outbox: outbox.send(channel, content="three", reference=_reference(10)),
+    )
+
+    assert [kwargs["content"] for kwargs in channel.sent] == ["one\ntwo\nthree"]
+    assert results[0] is results[1] is results[2]
+    assert outbox.stats()["merged"] == 2
+
+
+def test_replies_to_different_messages_stay_separate():
+    channel = FakeChannel()
+    run(
+        lambda outbox: outbox.send(channel, content="one", reference=_reference(10)),
+        lambda outbox: outbox.send(channel, content="two", reference=_reference(11)),
+        lambda outbox: outbox.send(channel, content="three"),
+    )
+
+    assert [kwargs["content"] for kwargs in channel.sent] == ["one", "two", "three"]
+
+
+def test_messages_that_opt_out_are_not_merged():
+    channel = FakeChannel()
+    _, results = run(
+        lambda outbox: outbox.send(channel, content="one"),
+        lambda outbox: outbox.send(channel, content="placeholder", merge=False),
+        lambda outbox: outbox.send(channel, content="three"),
+    )
+
+    assert [kwargs["content"] for kwargs in channel.sent] == [
+        "one",
+        "placeholder",
+        "three",
+    ]
+    assert results[1].content == "placeholder"
+
+
+def test_only_short_text_replies_are_merged():
+    channel = FakeChannel()
+    run(
+        lambda outbox: outbox.send(channel, content="one"),
+        lambda outbox: outbox.send(channel, content="x" * 1000),
+        lambda outbox: outbox.send(channel, content="embed", embed=object()),
+        lambda outbox: outbox.send(channel, content="mention", mention_author=True),
+    )
+
+    assert len(channel.sent) == 4
+
+
+def test_interactive_replies_go_before_background_sends():
+    channel = FakeChannel()
+    run(
+        lambda outbox: outbox.send(channel, Priority.BACKGROUND, content="progress"),
+        lambda outbox: outbox.send(channel, content="reply", merge=False),
+    )
+
+    assert [kwargs["content"] for kwargs in channel.sent] == ["reply", "progress"]
+
+
+def test_channels_are_merged_separately():
+    first, second = FakeChannel(1), FakeChannel(2)
+    run(
+        lambda outbox: outbox.send(first, content="one"),
+        lambda outbox: outbox.send(second, content="two"),
+    )
+
+    assert [kwargs["content"] for kwargs in first.sent] == ["one"]
+    assert [kwargs["content"] for kwargs in second.sent] == ["two"]
+
+
+def test_later_edit_replaces_the_queued_edit_of_a_message():
+    channel = FakeChannel()
+    message = FakeMessage(channel, 10)
+    outbox, results = run(
+        lambda outbox: outbox.edit(message, content="progress 9/10"),
+        lambda outbox: outbox.edit(message, content="progress 10/10", view="view"),
+        lambda outbox: outbox.edit(message, Priority.INTERACTIVE, content="done"),
+    )
+
+    assert channel.edits == [(10, {"content": "done", "view": "view"})]
+    assert results == [message] * 3
+    assert outbox.stats()["superseded"] == 2
+
+
+def test_edits_of_other_messages_are_kept():
+    channel = FakeChannel()
+    first, second = FakeMessage(channel, 10), FakeMessage(channel, 11)
+    run(
+        lambda outbox: outbox.edit(first, content="one"),
+        lambda outbox: outbox.edit(second, content="two"),
+    )
+
+    assert channel.edits == [(10, {"content": "one"}), (11, {"content": "two"})]
+
+
+def test_progress_summary_is_not_overwritten_by_a_queued_edit(monkeypatch):
+    # Edits are paced at one per 20ms once the burst is used up
+    monkeypatch.setattr(utils.outbox, "OUTBOX_CHANNEL_BURST", 1)
+    monkeypatch.setattr(utils.outbox, "OUTBOX_CHANNEL_PERIOD", 0.02)
+    channel = FakeChannel()
+    message = FakeMessage(channel, 10)
+
+    async def main():
+        await utils.outbox.outbox.edit(FakeMessage(channel, 11), content="other")
+        progress = ProgressMessage(message, interval=0)
+        progress.update("progress 10/10")
+        # The progress edit is now waiting in the outbox for the edit bucket
+        await asyncio.sleep(0.005)
+        await progress.finish("FINAL SUMMARY")
+        await asyncio.sleep(0.05)
+        await utils.outbox.outbox.close()
+
+    asyncio.run(main())
+    assert [content["content"] for _, content in channel.edits] == [
+        "other",
+        "FINAL SUMMARY",
+    ]
@@ -0,0 +1,85 @@
+import itertools
+
+import pytest
+
+from utils.queue_plan import plan_block_move, plan_order
+
+
+def apply(order, moves):
+    """Play the moves on a copy of order the way the server does"""
+    order = list(order)
+    for source, target in moves:
+        order.insert(target, order.pop(source))
+    return order
+
+
+def in_relative_order(order, wanted):
+    return [item_id for item_id in order if item_id in set(wanted)] == wanted
+
+
+def test_ordered_items_need_no_moves():
+    assert plan_order([1, 2, 3, 4], [1, 3, 4]) == []
+
+
+def test_one_misplaced_item_takes_one_move():
+    order = [1, 2, 3, 4, 5]
+    moves = plan_order(order, [1, 2, 5, 3, 4])
+    assert len(moves) == 1
+    assert apply(order, moves) == [1, 2, 5, 3, 4]
+
+
+def test_reversed_items_keep_the_longest_run():
+    order = [1, 2, 3, 4]
+    wanted = [4, 3, 2, 1]
+    moves = plan_order(order, wanted)
+    assert len(moves) == 3
+    assert apply(order, moves) == wanted
+
+
+def test_only_the_wanted_items_are_reordered():
+    # Items 10 and 11 were already in the queue around the added ones
+    order = [10, 3, 1, 11, 2]
+    wanted = [1, 2, 3]
+    moves = plan_order(order, wanted)
+    result = apply(order, moves)
+    assert in_relative_order(result, wanted)
+    assert len(moves) == 1
+    assert in_relative_order(result, [10, 11])
+
+
+def test_unknown_items_are_ignored():
+    assert plan_order([1, 2], [2, 99, 1]) == [(1, 0)]
+
+
+@pytest.mark.parametrize("wanted", list(itertools.permutations([1, 2, 3, 4, 5])))
+def test_every_permutation_is_reached_with_the_fewest_moves(wanted):
+    wanted = list(wanted)
+    order = [0, 1, 2, 3, 4, 5, 6]
+    moves = plan_order(order, wanted)
+    assert in_relative_order(apply(order, moves), wanted)
+    # Every item outside the longest increasing run takes exactly one move
+    longest = max(
+        length
+        for length in range(1, 6)
+        for subset in itertools.combinations(wanted, length)
+        if list(subset) == sorted(subset)
+    )
+    assert len(moves) == len(wanted) - longest
+
+
+@pytest.mark.parametrize(
+    "item_ids, to, expected",
+    [
+        ([4, 5], 0, [4, 5, 1, 2, 3, 6]),
+        ([1, 2], 2, [3, 4, 1, 2, 5, 6]),
+        ([2, 6, 4], 1, [1, 2, 6, 4, 3, 5]),
+        ([1], 99, [2, 3, 4, 5, 6, 1]),
+    ],
+)
+def test_block_move_places_the_items_together(item_ids, to, expected):
+    order = [1, 2, 3, 4, 5, 6]
+    assert apply(order, plan_block_move(order, item_ids, to)) == expected
+
+
+def test_block_move_already_in_place_needs_no_moves():
+    assert plan_block_move([1, 2, 3, 4], [2, 3], 1) == []
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import utils.api
+from utils.resilience import CircuitBreaker, backoff_delay, remaining, set_deadline
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.monotonic()]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_backoff_is_capped_and_jittered():
+    for attempt in range(1, 10):
+        assert 0 <= backoff_delay(attempt, 0.1, 1.0) <= min(1.0, 0.1 * 2 ** (attempt - 1))
+
+
+def test_deadline_is_local_to_the_context():
+    async def with_deadline():
+        set_deadline(5)
+        return remaining()
+
+    left = asyncio.run(with_deadline())
+    assert 0 < left <= 5
+    assert remaining() is None
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.stats()["trips"] == 1
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_breaker_lets_one_probe_through_after_the_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+
+    clock[0] += 10
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_opens_the_breaker_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.stats()["trips"] == 1
+
+
+def test_lost_probe_does_not_block_forever(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()
+
+    # The probe was cancelled and never reported back
+    clock[0] += 10
+    assert breaker.allow()
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    """Statuses the API answers with in turn, and the requests it got"""
+    statuses = []
+    requests = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(statuses.pop(0) if statuses else 200, json={})
+
+    monkeypatch.setattr(
+        utils.api,
+        "_client",
+        httpx.AsyncClient(
+            base_url="http://api.invalid", transport=httpx.MockTransport(handle)
+        ),
+    )
+    monkeypatch.setattr(utils.api, "_breaker", CircuitBreaker(100, 10))
+    monkeypatch.setattr(utils.api, "backoff_delay", lambda *args: 0)
+    return statuses, requests
+
+
+def test_reads_are_retried_after_transient_errors(responses):
+    statuses, requests = responses
+    statuses.extend([503, 502])
+
+    resp = asyncio.run(utils.api._request("GET", "/api/room", "token"))
+    assert resp.status_code == 200
+    assert len(requests) == 3
+
+
+def test_mutations_are_not_retried_once_sent(responses):
+    statuses, requests = responses
+    statuses.append(503)
+
+    resp = asyncio.run(utils.api._request("POST", "/api/room/skip", "token"))
+    assert resp.status_code == 503
+    assert len(requests) == 1
+
+
+def test_open_breaker_fails_fast(responses):
+    _, requests = responses
+    for _ in range(100):
+        utils.api._breaker.record_failure()
+
+    with pytest.raises(utils.api.ApiError) as e:
+        asyncio.run(utils.api._request("GET", "/api/room", "token"))
+    assert e.value.status_code == 503
+    assert requests == []
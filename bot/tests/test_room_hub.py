@@ -0,0 +1,408 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import aiohttp
+import jwt
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import utils.api
+import utils.room_hub
+from utils.config import JWT_SECRET
+from utils.room_hub import (
+    MESSAGE_CLOSE,
+    MESSAGE_INVOCATION,
+    RECORD_SEPARATOR,
+    RoomHub,
+    RoomModel,
+    RoomSubscription,
+)
+
+
+def _token(user_id="1", room_code="AAAAAA"):
+    return jwt.encode(
+        {"user_id": user_id, "room_code": room_code}, JWT_SECRET, algorithm="HS256"
+    )
+
+
+def _frame(message: dict) -> str:
+    return json.dumps(message) + RECORD_SEPARATOR
+
+
+class StandInHub:
+    """Serves negotiate and the RoomHub websocket the way the API does
+
+    Answers the handshake, says Connected and replies to RoomInfo with the
+    room it holds. Tests push events to the connected bots and drop them.
+    """
+
+    def __init__(self, room):
+        self.room = room
+        self.rejected = False
+        self.negotiations = 0
+        self.room_info_requests = 0
+        self.sockets = []
+        self.app = web.Application()
+        self.app.router.add_post("/api/hubs/room/negotiate", self.negotiate)
+        self.app.router.add_get("/api/hubs/room", self.connect)
+
+    async def negotiate(self, request: web.Request) -> web.Response:
+        self.negotiations += 1
+        if self.rejected:
+            return web.Response(status=401)
+        return web.json_response(
+            {"connectionToken": f"connection-{self.negotiations}"}
+        )
+
+    async def connect(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        handshake = await ws.receive_str()
+        assert json.loads(handshake.rstrip(RECORD_SEPARATOR))["protocol"] == "json"
+        await ws.send_str(_frame({}))
+        self.sockets.append(ws)
+        await self._invoke(ws, "Connected")
+        async for msg in ws:
+            for frame in msg.data.split(RECORD_SEPARATOR):
+                if not frame:
+                    continue
+                message = json.loads(frame)
+                if message.get("target") == "RoomInfo":
+                    self.room_info_requests += 1
+                    await self._invoke(
+                        ws,
+                        "RoomInfo",
+                        self.room["room_info"],
+                        self.room["queue_items"],
+                    )
+        self.sockets.remove(ws)
+        return ws
+
+    async def _invoke(self, ws, target, *arguments):
+        await ws.send_str(
+            _frame(
+                {"type": MESSAGE_INVOCATION, "target": target, "arguments": arguments}
+            )
+        )
+
+    async def push(self, target: str, event: dict) -> None:
+        for ws in list(self.sockets):
+            await self._invoke(ws, target, event)
+
+    async def close_with(self, error: str) -> None:
+        for ws in list(self.sockets):
+            await ws.send_str(_frame({"type": MESSAGE_CLOSE, "error": error}))
+
+    async def drop(self) -> None:
+        for ws in list(self.sockets):
+            await ws.close()
+
+
+async def _until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    # Reconnect right away instead of after a random backoff
+    monkeypatch.setattr(
+        utils.room_hub, "random", SimpleNamespace(uniform=lambda low, high: 0)
+    )
+    utils.api.room_state.clear()
+    utils.api.clear_caches()
+    yield
+    utils.api.room_state.clear()
+    utils.api.clear_caches()
+
+
+def run_with_hub(make_room, test):
+    """Run test(stand_in, subscribe) against a stand-in hub on a local port"""
+
+    async def main():
+        stand_in = StandInHub(make_room())
+        server = TestServer(stand_in.app)
+        await server.start_server()
+        subscriptions = []
+        async with aiohttp.ClientSession() as session:
+
+            def subscribe(token=None):
+                subscription = RoomSubscription(
+                    session, str(server.make_url("")), token or _token()
+                )
+                subscription.start()
+                subscriptions.append(subscription)
+                return subscription
+
+            try:
+                await test(stand_in, subscribe)
+            finally:
+                await asyncio.gather(*(s.stop() for s in subscriptions))
+                await server.close()
+
+    asyncio.run(main())
+
+
+def test_subscription_mirrors_the_room_and_its_events(make_room):
+    async def test(stand_in, subscribe):
+        subscription = subscribe()
+        await _until(lambda: subscription.live)
+        assert utils.api.room_state.is_live("AAAAAA")
+        assert len(utils.api.room_state.get("AAAAAA")["queue_items"]) == 3
+
+        await stand_in.push(
+            "PauseToggled", {"is_paused": True, "playing_since": None}
+        )
+        await _until(
+            lambda: utils.api.room_state.get("AAAAAA")["room_info"]["is_paused"]
+        )
+
+        await stand_in.push(
+            "TrackSkipped",
+            {
+                "current_item_index": 2,
+                "current_item_shuffle_index": None,
+                "current_item_id": 3,
+                "current_item_track_id": "c",
+            },
+        )
+        await _until(
+            lambda: utils.api.room_state.get("AAAAAA")["room_info"]["current_item"][
+                "id"
+            ]
+            == 3
+        )
+
+        await stand_in.push(
+            "QueueAdded",
+            {
+                "added_items": [
+                    {
+                        "id": 4,
+                        "track_id": "d",
+                        "index": 3,
+                        "shuffled_index": None,
+                        "is_deleted": False,
+                    }
+                ],
+                "current_item_index": 2,
+                "current_item_shuffle_index": None,
+                "current_item_id": 3,
+                "current_item_track_id": "c",
+            },
+        )
+        await _until(
+            lambda: len(utils.api.room_state.get("AAAAAA")["queue_items"]) == 4
+        )
+        assert stand_in.room_info_requests == 1
+
+    run_with_hub(make_room, test)
+
+
+def test_subscription_resyncs_after_the_socket_drops(make_room):
+    async def test(stand_in, subscribe):
+        subscription = subscribe()
+        await _until(lambda: subscription.live)
+
+        # Changes made while the bot was disconnected are only in the next RoomInfo
+        stand_in.room = make_room(track_ids=("x", "y"))
+        await stand_in.drop()
+        await _until(lambda: stand_in.negotiations == 2 and subscription.live)
+
+        room = utils.api.room_state.get("AAAAAA")
+        assert [item["track_id"] for item in room["queue_items"]] == ["x", "y"]
+        assert stand_in.room_info_requests == 2
+
+    run_with_hub(make_room, test)
+
+
+def test_subscription_resyncs_after_an_event_it_cannot_apply(make_room):
+    async def test(stand_in, subscribe):
+        subscription = subscribe()
+        await _until(lambda: subscription.live)
+
+        stand_in.room = make_room(track_ids=("a", "c"))
+        # Deleting an item the bot never saw means it missed an event
+        await stand_in.push(
+            "QueueDeleted",
+            {
+                "deleted_item_id": 99,
+                "current_item_index": 0,
+                "current_item_shuffle_index": None,
+                "current_item_id": 1,
+                "current_item_track_id": "a",
+            },
+        )
+        await _until(lambda: stand_in.room_info_requests == 2 and subscription.live)
+        room = utils.api.room_state.get("AAAAAA")
+        assert [item["track_id"] for item in room["queue_items"]] == ["a", "c"]
+        # The same connection was kept
+        assert stand_in.negotiations == 1
+
+    run_with_hub(make_room, test)
+
+
+def test_rejected_token_stops_the_subscription_and_is_forgotten(make_room):
+    async def test(stand_in, subscribe):
+        stand_in.rejected = True
+        utils.api._room_codes.set("1", "AAAAAA")
+        subscription = subscribe()
+        await _until(subscription.done)
+
+        assert stand_in.negotiations == 1
+        assert utils.api.cached_room_code(1) is None
+
+    run_with_hub(make_room, test)
+
+
+def test_unauthorized_close_stops_the_subscription(make_room):
+    async def test(stand_in, subscribe):
+        utils.api._room_codes.set("1", "AAAAAA")
+        subscription = subscribe()
+        await _until(lambda: subscription.live)
+
+        await stand_in.close_with("Connection closed with an error. Unauthorized")
+        await _until(subscription.done)
+        assert not utils.api.room_state.is_live("AAAAAA")
+        assert utils.api.cached_room_code(1) is None
+
+    run_with_hub(make_room, test)
+
+
+def test_idle_subscription_is_not_reconnected(make_room, monkeypatch):
+    monkeypatch.setattr(utils.room_hub, "ROOM_HUB_IDLE_TIMEOUT", 0)
+
+    async def test(stand_in, subscribe):
+        subscription = subscribe()
+        # Closed after its first message, and not opened again
+        await _until(subscription.done)
+        assert stand_in.negotiations == 1
+        assert not stand_in.sockets
+
+    run_with_hub(make_room, test)
+
+
+def test_hub_reuses_the_subscription_of_a_room(make_room, monkeypatch):
+    monkeypatch.setattr(utils.room_hub, "ROOM_HUB_ENABLED", True)
+
+    async def main():
+        stand_in = StandInHub(make_room())
+        server = TestServer(stand_in.app)
+        await server.start_server()
+        hub = RoomHub(str(server.make_url("")))
+        try:
+            hub.watch(_token("1"))
+            hub.watch(_token("2"))
+            hub.watch(_token("3", room_code=None))
+            await _until(lambda: hub.is_live("AAAAAA"))
+            assert stand_in.negotiations == 1
+        finally:
+            await hub.close()
+            await server.close()
+
+    asyncio.run(main())
+
+
+def _model(make_room, **kwargs):
+    model = RoomModel()
+    room = make_room(**kwargs)
+    model.apply("RoomInfo", [room["room_info"], room["queue_items"]])
+    return model
+
+
+def _order(model):
+    return [item["id"] for item in model._play_order()]
+
+
+def _current(item_id, index, shuffle_index=None, track_id="t"):
+    return {
+        "current_item_id": item_id,
+        "current_item_index": index,
+        "current_item_shuffle_index": shuffle_index,
+        "current_item_track_id": track_id,
+    }
+
+
+def test_model_ignores_events_until_synced():
+    model = RoomModel()
+    assert model.apply("PauseToggled", [{"is_paused": True}])
+    assert not model.synced
+
+
+def test_model_pause_loop_and_seek(make_room):
+    model = _model(make_room)
+    assert model.apply("PauseToggled", [{"is_paused": True, "playing_since": None}])
+    assert model.apply("LoopToggled", [{"is_looping": True}])
+    assert model.apply("TrackSeeked", [{"playing_since": 1234}])
+
+    room_info = model.to_room()["room_info"]
+    assert room_info["is_paused"] and room_info["is_looping"]
+    assert room_info["playing_since"] == 1234
+
+
+def test_model_skip_sets_the_current_item(make_room):
+    model = _model(make_room)
+    assert model.apply("TrackSkipped", [_current(2, 1, track_id="b")])
+    assert model.room_info["current_item"] == {
+        "index": 1,
+        "shuffle_index": None,
+        "id": 2,
+        "track_id": "b",
+    }
+
+
+def test_model_shuffle_on_needs_a_resync(make_room):
+    model = _model(make_room)
+    assert not model.apply("ShuffleToggled", [{"is_shuffled": True, **_current(1, 0)}])
+
+
+def test_model_shuffle_off_drops_the_shuffled_order(make_room):
+    model = _model(make_room, shuffled=(2, 0, 1), is_shuffled=True)
+    assert model.apply(
+        "ShuffleToggled", [{"is_shuffled": False, **_current(1, 0, track_id="a")}]
+    )
+    assert _order(model) == [1, 2, 3]
+    assert all(item["shuffled_index"] is None for item in model.queue_items.values())
+
+
+def test_model_move_reorders_the_queue(make_room):
+    model = _model(make_room)
+    assert model.apply("QueueMoved", [{"from": 2, "to": 0, **_current(1, 1)}])
+    assert _order(model) == [3, 1, 2]
+    assert not model.apply("QueueMoved", [{"from": 5, "to": 0, **_current(1, 1)}])
+
+
+def test_model_add_inserts_after_the_current_item(make_room):
+    model = _model(make_room)
+    added = {
+        "id": 4,
+        "track_id": "d",
+        "index": 1,
+        "shuffled_index": None,
+        "is_deleted": False,
+    }
+    assert model.apply("QueueAdded", [{"added_items": [added], **_current(1, 0)}])
+    assert _order(model) == [1, 4, 2, 3]
+
+
+def test_model_clear_keeps_only_the_current_item(make_room):
+    model = _model(make_room, current=1)
+    assert model.apply("QueueCleared", [_current(2, 1)])
+    assert _order(model) == [2]
+    assert model.room_info["current_item"]["index"] == 0
+    assert not _model(make_room).apply("QueueCleared", [_current(99, 0)])
+
+
+def test_model_delete_reindexes_the_queue(make_room):
+    model = _model(make_room)
+    assert model.apply("QueueDeleted", [{"deleted_item_id": 2, **_current(1, 0)}])
+    assert _order(model) == [1, 3]
+    assert model.queue_items[3]["index"] == 1
+    assert not model.apply("QueueDeleted", [{"deleted_item_id": 2, **_current(1, 0)}])
+
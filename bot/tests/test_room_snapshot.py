@@ -0,0 +1,77 @@
+from utils.room_snapshot import RoomSnapshot
+
+
+def test_orders_items_by_index(make_room):
+    room = make_room(track_ids=("a", "b", "c"))
+    room["queue_items"].reverse()
+    snapshot = RoomSnapshot(room)
+
+    assert [snapshot.item(pos)["id"] for _, pos in snapshot.page(0, 3)] == [1, 2, 3]
+    assert [snapshot.track_id(pos) for _, pos in snapshot.page(0, 3)] == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
+def test_uses_shuffled_order_while_shuffled(make_room):
+    snapshot = RoomSnapshot(
+        make_room(shuffled=(2, 0, 1), current=1, is_shuffled=True)
+    )
+
+    assert [snapshot.item(pos)["id"] for _, pos in snapshot.page(0, 3)] == [2, 3, 1]
+    assert snapshot.current_rank == 0
+    assert snapshot.play_index(snapshot.position_by_id(1)) == 2
+
+
+def test_looks_up_items_by_id_and_index(make_room):
+    snapshot = RoomSnapshot(make_room(shuffled=(1, 2, 0)))
+    pos = snapshot.position_by_id(2)
+
+    assert snapshot.position_by_index(1) == pos
+    assert snapshot.position_by_shuffled_index(2) == pos
+    assert snapshot.position_by_id(99) is None
+    assert snapshot.item(pos) == {
+        "id": 2,
+        "track_id": "b",
+        "index": 1,
+        "shuffled_index": 2,
+        "is_deleted": False,
+    }
+
+
+def test_current_item_falls_back_to_its_index(make_room):
+    room = make_room(current=2)
+    # The current item was replaced, but its index is still playing
+    room["room_info"]["current_item"]["id"] = 99
+    snapshot = RoomSnapshot(room)
+
+    assert snapshot.current_item_id == 99
+    assert snapshot.current_rank == 2
+
+
+def test_no_current_item(make_room):
+    snapshot = RoomSnapshot(make_room(track_ids=(), current=None))
+    assert len(snapshot) == 0
+    assert snapshot.current_rank is None
+    assert snapshot.position_at_rank(0) is None
+
+
+def test_rank_of_handles_gaps_in_the_indices(make_room):
+    room = make_room(track_ids=("a", "b", "c"))
+    for item, index in zip(room["queue_items"], (0, 5, 9)):
+        item["index"] = index
+    snapshot = RoomSnapshot(room)
+
+    assert [snapshot.rank_of(snapshot.position_by_id(i)) for i in (1, 2, 3)] == [
+        0,
+        1,
+        2,
+    ]
+    assert snapshot.position_at_rank(2) == snapshot.position_by_id(3)
+
+
+def test_page_is_clamped_to_the_queue(make_room):
+    snapshot = RoomSnapshot(make_room())
+    assert [rank for rank, _ in snapshot.page(-5, 100)] == [0, 1, 2]
+    assert list(snapshot.page(3, 10)) == []
@@ -0,0 +1,73 @@
+import time
+
+from utils.room_state import RoomStateMirror
+
+
+def test_returns_rooms_within_max_age(make_room, monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    mirror = RoomStateMirror(max_age=5, maxsize=8)
+    room = make_room()
+    assert mirror.update(room) is room
+
+    assert mirror.get("AAAAAA") is room
+    monkeypatch.setattr(time, "monotonic", lambda: now + 10)
+    assert mirror.get("AAAAAA") is None
+    assert mirror.get("AAAAAA", max_age=20) is room
+
+
+def test_live_rooms_never_expire(make_room, monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    mirror = RoomStateMirror(max_age=5, maxsize=8)
+    room = make_room()
+    mirror.update(room, live=True)
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 60)
+    assert mirror.get("AAAAAA") is room
+    assert mirror.get("AAAAAA", max_age=0) is room
+
+
+def test_zero_max_age_only_returns_live_rooms(make_room):
+    mirror = RoomStateMirror(max_age=60, maxsize=8)
+    mirror.update(make_room())
+    assert mirror.get("AAAAAA", max_age=0) is None
+
+
+def test_update_keeps_the_room_live(make_room):
+    mirror = RoomStateMirror(max_age=5, maxsize=8)
+    mirror.update(make_room(), live=True)
+    mirror.update(make_room(track_ids=("d",)))
+    assert mirror.is_live("AAAAAA")
+
+
+def test_invalidate_keeps_live_rooms(make_room):
+    mirror = RoomStateMirror(max_age=5, maxsize=8)
+    mirror.update(make_room(room_code="LIVE00"), live=True)
+    mirror.update(make_room(room_code="STALE0"))
+    mirror.invalidate("LIVE00")
+    mirror.invalidate("STALE0")
+
+    assert mirror.get("LIVE00") is not None
+    assert mirror.get("STALE0") is None
+
+
+def test_snapshot_is_reused_until_the_room_changes(make_room):
+    mirror = RoomStateMirror(max_age=5, maxsize=8)
+    mirror.update(make_room())
+    snapshot = mirror.get_snapshot("AAAAAA")
+    assert mirror.get_snapshot("AAAAAA") is snapshot
+
+    mirror.update(make_room(track_ids=("d",)))
+    assert mirror.get_snapshot("AAAAAA") is not snapshot
+    assert len(mirror.get_snapshot("AAAAAA")) == 1
+
+
+def test_listeners_are_told_about_updates(make_room):
+    mirror = RoomStateMirror(max_age=5, maxsize=8)
+    updated = []
+    mirror.add_listener(updated.append)
+    mirror.update(make_room())
+    mirror.remove_listener(updated.append)
+    mirror.update(make_room())
+    assert updated == ["AAAAAA"]
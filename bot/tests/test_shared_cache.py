@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from cluster import assign_shards
+from utils.shared_cache import SharedCache
+
+
+def run(cache, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            cache.close()
+
+    return asyncio.run(main())
+
+
+def test_values_are_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = SharedCache(path)
+    run(writer, writer.set_many("tracks", {"a": {"title": "A"}, "b": [1, 2]}))
+
+    reader = SharedCache(path)
+    found = run(reader, reader.get_many("tracks", ["a", "b", "c"]))
+    assert found == {"a": {"title": "A"}, "b": [1, 2]}
+    assert reader.stats()["hits"] == 2
+    assert reader.stats()["misses"] == 1
+
+
+def test_namespaces_are_separate(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+
+    async def main():
+        await cache.set("room_codes", "1", "AAAAAA")
+        return await cache.get("tracks", "1")
+
+    assert run(cache, main()) is None
+
+
+def test_expired_values_are_misses(tmp_path, monkeypatch):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    now = time.time()
+
+    async def main():
+        await cache.set("room_codes", "1", "AAAAAA", ttl=30)
+        await cache.set("room_codes", "2", "BBBBBB")
+        monkeypatch.setattr(time, "time", lambda: now + 60)
+        return await cache.get_many("room_codes", ["1", "2"])
+
+    assert run(cache, main()) == {"2": "BBBBBB"}
+
+
+def test_delete_removes_the_value(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+
+    async def main():
+        await cache.set("room_codes", "1", "AAAAAA")
+        await cache.delete("room_codes", "1")
+        return await cache.get("room_codes", "1")
+
+    assert run(cache, main()) is None
+
+
+def test_large_batches_are_split(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    items = {str(i): i for i in range(1200)}
+
+    async def main():
+        await cache.set_many("tracks", items)
+        return await cache.get_many("tracks", items)
+
+    assert run(cache, main()) == items
+
+
+def test_disabled_cache_is_always_a_miss():
+    cache = SharedCache(None)
+
+    async def main():
+        await cache.set("tracks", "a", 1)
+        return await cache.get("tracks", "a")
+
+    assert run(cache, main()) is None
+    assert not cache.enabled
+
+
+def test_unusable_file_is_a_miss(tmp_path):
+    # A directory can't be opened as a database
+    cache = SharedCache(str(tmp_path))
+    assert run(cache, cache.get("tracks", "a")) is None
+    assert cache.stats()["errors"] == 1
+
+
+def test_shards_are_spread_evenly():
+    assert assign_shards(5, 2) == [[0, 2, 4], [1, 3]]
+    assert sorted(sum(assign_shards(16, 3), [])) == list(range(16))
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["leaders"] == 1
+    assert flight.stats()["followers"] == 4
+    assert "key" not in flight
+
+
+def test_later_callers_start_a_new_call():
+    calls = []
+
+    async def fetch():
+        calls.append(None)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight()
+        return await flight.do("key", fetch), await flight.do("key", fetch)
+
+    assert asyncio.run(main()) == (1, 2)
+
+
+def test_errors_reach_every_caller():
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            flight.do("key", fetch), flight.do("key", fetch), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "value"
+
+
+def test_one_task_can_resolve_several_keys():
+    async def main():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def fetch_many():
+            await gate.wait()
+            return {"a": 1, "b": 2}
+
+        flight.start(["a", "b"], fetch_many())
+        joined = flight.get("b")
+        assert joined is not None and flight.get("c") is None
+        gate.set()
+        result = await joined
+        await asyncio.sleep(0)
+        return flight, result
+
+    flight, result = asyncio.run(main())
+    assert result == {"a": 1, "b": 2}
+    assert "a" not in flight and "b" not in flight
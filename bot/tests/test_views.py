@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import utils.api
+from utils.api import QueuePage
+from utils.views import QueueView
+
+
+@pytest.fixture
+def api(make_room, monkeypatch):
+    """A room of 500 tracks that is not live, counting the reads of it"""
+    room = make_room(track_ids=[f"track-{i}" for i in range(500)], current=42)
+    reads = {"queue": 0, "room_info": 0}
+
+    async def get_queue_page(token, offset, limit):
+        reads["queue"] += 1
+        items = room["queue_items"]
+        return QueuePage(items[offset : offset + limit], len(items))
+
+    async def get_room_info(token):
+        reads["room_info"] += 1
+        return room["room_info"]
+
+    async def get_tracks(token, track_ids):
+        return [{"id": track_id, "title": track_id} for track_id in track_ids]
+
+    monkeypatch.setattr(utils.api, "get_queue_page", get_queue_page)
+    monkeypatch.setattr(utils.api, "get_room_info", get_room_info)
+    monkeypatch.setattr(utils.api, "get_tracks", get_tracks)
+    monkeypatch.setattr(utils.api, "prefetch_tracks", lambda token, ids: None)
+    monkeypatch.setattr(
+        utils.api, "cached_room_snapshot", lambda token, max_age=None: None
+    )
+    return reads
+
+
+def test_paging_the_whole_queue_reads_it_once(api):
+    async def main():
+        view = QueueView("token", author_id=1, page=0)
+        titles = []
+        for page in range(50):
+            view.page = page
+            embed = await view.render()
+            titles.append(embed.fields[0].value)
+        return view, titles
+
+    view, titles = asyncio.run(main())
+    assert api == {"queue": 1, "room_info": 1}
+    assert view.page_count == 50
+    assert "**#499** - track-499" in titles[-1]
+    assert "▶️ **#42**" in titles[4]
+
+
+def test_refresh_takes_a_new_snapshot(api):
+    async def main():
+        view = QueueView("token", author_id=1, page=3)
+        await view.render()
+        view._windows.clear()
+        view._room_read = False
+        await view.render()
+
+    asyncio.run(main())
+    assert api == {"queue": 2, "room_info": 2}
+
+
+def test_pages_past_the_end_show_the_last_page(api):
+    async def main():
+        view = QueueView("token", author_id=1, page=99)
+        embed = await view.render()
+        return view, embed
+
+    view, embed = asyncio.run(main())
+    assert view.page == 49
+    assert embed.title.endswith("Page 50/50")
+
+
+def test_only_the_invoker_can_page(api):
+    replies = []
+
+    async def send_message(content, ephemeral):
+        replies.append(content)
+
+    def interaction(user_id):
+        return SimpleNamespace(
+            user=SimpleNamespace(id=user_id),
+            response=SimpleNamespace(send_message=send_message),
+        )
+
+    async def main():
+        view = QueueView("token", author_id=1, page=0)
+        return (
+            await view.interaction_check(interaction(1)),
+            await view.interaction_check(interaction(2)),
+        )
+
+    assert asyncio.run(main()) == (True, False)
+    assert len(replies) == 1
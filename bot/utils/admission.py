@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+from discord.ext import commands
+
+import utils.metrics as metrics
+from utils.cache import LRUCache
+from utils.config import (
+    ADMISSION_ENABLED,
+    ADMISSION_GLOBAL_BURST,
+    ADMISSION_GLOBAL_RATE,
+    ADMISSION_MAX_WAIT,
+    ADMISSION_ROOM_BURST,
+    ADMISSION_ROOM_RATE,
+    ADMISSION_TRACKED_KEYS,
+    ADMISSION_USER_BURST,
+    ADMISSION_USER_RATE,
+    API_MAX_IN_FLIGHT,
+)
+from utils.resilience import TokenBucket
+
+from typing import Dict, List, Optional, Tuple
+
+SCOPES = ("user", "room", "global")
+
+
+class AdmissionError(commands.CommandError):
+    """A command was rejected because a rate limit it falls under is exhausted"""
+
+    def __init__(self, scope: str, retry_after: float):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"Rate limited per {scope}, retry in {retry_after:.1f}s")
+
+
+class AdmissionControl:
+    """Token bucket rate limits per user, per room and for the whole bot
+
+    A command is admitted once every bucket it falls under has a token.
+    Commands over a limit wait for one for up to max_wait seconds and are
+    rejected right away if they would have to wait longer, so a noisy room
+    runs out of its own tokens long before it can use up the global ones.
+    API requests are additionally capped at max_in_flight at a time.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ADMISSION_ENABLED,
+        user_limit: Tuple[float, int] = (ADMISSION_USER_RATE, ADMISSION_USER_BURST),
+        room_limit: Tuple[float, int] = (ADMISSION_ROOM_RATE, ADMISSION_ROOM_BURST),
+        global_limit: Tuple[float, int] = (
+            ADMISSION_GLOBAL_RATE,
+            ADMISSION_GLOBAL_BURST,
+        ),
+        max_wait: float = ADMISSION_MAX_WAIT,
+        max_in_flight: int = API_MAX_IN_FLIGHT,
+        tracked_keys: int = ADMISSION_TRACKED_KEYS,
+    ):
+        self.enabled = enabled
+        self.limits = {"user": user_limit, "room": room_limit, "global": global_limit}
+        self.max_wait = max_wait
+        self.max_in_flight = max_in_flight
+        self.admitted = 0
+        self.waited = 0
+        self.waiting = 0
+        self.rejected: Dict[str, int] = {scope: 0 for scope in SCOPES}
+        self.in_flight = 0
+        self.slot_timeouts = 0
+        self._users: LRUCache[str, TokenBucket] = LRUCache(tracked_keys)
+        self._rooms: LRUCache[str, TokenBucket] = LRUCache(tracked_keys)
+        self._global = self._new_bucket("global")
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    def _new_bucket(self, scope: str) -> TokenBucket:
+        rate, burst = self.limits[scope]
+        return TokenBucket(burst, burst / rate)
+
+    def _bucket(
+        self, buckets: LRUCache[str, TokenBucket], scope: str, key: str
+    ) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = self._new_bucket(scope)
+            buckets.set(key, bucket)
+        return bucket
+
+    async def admit(self, user_id: str, room_code: Optional[str]) -> None:
+        """Wait until the command may run, raising AdmissionError if that takes too long
+
+        room_code may be None while the user's room isn't known yet, the
+        user and global limits still apply.
+        """
+        if not self.enabled:
+            return
+        buckets: List[Tuple[str, TokenBucket]] = [
+            ("user", self._bucket(self._users, "user", user_id))
+        ]
+        if room_code:
+            buckets.append(("room", self._bucket(self._rooms, "room", room_code)))
+        buckets.append(("global", self._global))
+
+        started_at = time.monotonic()
+        waiting = False
+        try:
+            while True:
+                scope, delay = max(
+                    ((scope, bucket.delay()) for scope, bucket in buckets),
+                    key=lambda entry: entry[1],
+                )
+                if delay <= 0:
+                    for _, bucket in buckets:
+                        bucket.take()
+                    self.admitted += 1
+                    return
+                if time.monotonic() - started_at + delay > self.max_wait:
+                    self.rejected[scope] += 1
+                    raise AdmissionError(scope, delay)
+                if not waiting:
+                    waiting = True
+                    self.waited += 1
+                    self.waiting += 1
+                # Others may take the token first, so check all buckets again
+                await asyncio.sleep(delay)
+        finally:
+            if waiting:
+                self.waiting -= 1
+
+    async def acquire_slot(self, timeout: float) -> bool:
+        """Take one of the max_in_flight API request slots, False on timeout"""
+        if not self.enabled:
+            return True
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            self.slot_timeouts += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release_slot(self) -> None:
+        if not self.enabled:
+            return
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "waiting": self.waiting,
+            **{f"rejected_{scope}": count for scope, count in self.rejected.items()},
+            "api_in_flight": self.in_flight,
+            "api_slot_timeouts": self.slot_timeouts,
+        }
+
+
+admission = AdmissionControl()
+
+metrics.registry.register_stats(
+    "admission",
+    "Commands admitted, delayed and rejected by the rate limits, and API slots in use",
+    admission.stats,
+)
@@ -1,20 +1,76 @@
+import asyncio
+import contextlib
 import httpx
+import importlib.util
+import re
+import time
 import os
 import jwt
 from datetime import datetime
 from datetime import timedelta
 from discord.ext import commands
-from utils.config import API_BASE_URL, JWT_SECRET
+from utils.admission import admission
+from utils.cache import LRUCache
+import utils.metrics as metrics
+from utils.logger import logger
+from utils.mutations import MutationScheduler
+from utils.queue_plan import Move, plan_order
+from utils.resilience import CircuitBreaker, backoff_delay, remaining
+from utils.room_snapshot import RoomSnapshot
+from utils.room_state import RoomStateMirror
+from utils.shared_cache import SharedCache
+from utils.single_flight import SingleFlight
+from utils.config import (
+    API_BASE_URL,
+    JWT_SECRET,
+    TOKEN_CACHE_SIZE,
+    TOKEN_REFRESH_MARGIN,
+    ROOM_CODE_TTL,
+    TRACK_CACHE_SIZE,
+    ROOM_STATE_MAX_AGE,
+    ROOM_STATE_CACHE_SIZE,
+    QUEUE_CHUNK_SIZE,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+    HTTP_WARMUP_CONNECTIONS,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_ADD_TIMEOUT,
+    API_RETRY_ATTEMPTS,
+    API_RETRY_BASE_DELAY,
+    API_RETRY_MAX_DELAY,
+    API_BREAKER_THRESHOLD,
+    API_BREAKER_RESET_TIMEOUT,
+    MUTATION_DEBOUNCE,
+    ADMISSION_MAX_WAIT,
+    SHARED_CACHE_PATH,
+    SHARED_CACHE_TRACK_TTL,
+)
 
 from urllib.parse import quote
 
-from typing import List, Dict, Optional, TypedDict
+from typing import (
+    Any,
+    AsyncIterator,
+    List,
+    Dict,
+    NamedTuple,
+    NotRequired,
+    Optional,
+    Tuple,
+    TypedDict,
+)
 
 
 # Type definitions for API responses
-class CurrentTrackDto(TypedDict):
-    index: int
-    id: str
+class CurrentItemDto(TypedDict):
+    index: Optional[int]
+    shuffle_index: Optional[int]
+    id: Optional[int]
+    track_id: Optional[str]
 
 
 class RoomInfoDto(TypedDict):
@@ -22,7 +78,7 @@ class RoomInfoDto(TypedDict):
     is_paused: bool
     is_looping: bool
     is_shuffled: bool
-    current_track: CurrentTrackDto
+    current_item: CurrentItemDto
     playing_since: Optional[int]
 
 
@@ -37,6 +93,39 @@ class QueueItemDto(TypedDict):
 class RoomResponse(TypedDict):
     room_info: RoomInfoDto
     queue_items: List[QueueItemDto]
+    # Only in responses to add_track, the items it inserted in queue order
+    added_items: NotRequired[List[QueueItemDto]]
+    # Only in responses to delete_items, the items it could not delete
+    failed_items: NotRequired[List["FailedItemDto"]]
+
+
+class FailedItemDto(TypedDict):
+    item_id: int
+    error: str
+
+
+class QueuePage(NamedTuple):
+    items: List[QueueItemDto]
+    # Number of items in the whole queue
+    total: int
+
+
+class UserDto(TypedDict):
+    user_id: str
+    username: str
+    associated_room_code: Optional[str]
+    connection_id: Optional[str]
+    is_embedded: bool
+    created_at: int
+    updated_at: int
+    banned_until: Optional[int]
+    banned_reason: Optional[str]
+
+
+class UsersPage(NamedTuple):
+    users: List[UserDto]
+    # Number of users matching the filters
+    total: int
 
 
 # Track API response types
@@ -60,10 +149,250 @@ API_KEY = jwt.encode(
     algorithm="HS256",
 )
 
-_client = httpx.AsyncClient(
-    base_url=API_BASE_URL,
+_TIMEOUT = httpx.Timeout(
+    HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT
+)
+# Adding resolves the URL or search query on the server, which can take a while
+_ADD_TIMEOUT = httpx.Timeout(
+    HTTP_ADD_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT
 )
 
+# Created on first use and by start_client, closed by close_client
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _create_client() -> httpx.AsyncClient:
+    http2 = HTTP2_ENABLED
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2_ENABLED is set but h2 is not installed, using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=_TIMEOUT,
+    )
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+# Responses of a proxy or server that is down or overloaded
+_RETRY_STATUSES = {502, 503, 504}
+# Failures that happen before the request is sent, so any request can be retried
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_breaker = CircuitBreaker(API_BREAKER_THRESHOLD, API_BREAKER_RESET_TIMEOUT)
+
+
+def circuit_breaker_stats() -> Dict[str, int | str]:
+    """State and counters of the API circuit breaker"""
+    return _breaker.stats()
+
+
+
+def _api_unavailable() -> "ApiError":
+    return ApiError(
+        503,
+        "API Unavailable",
+        "The jukebox API is not responding, try again in a moment.",
+    )
+
+
+def _api_timeout() -> "ApiError":
+    return ApiError(504, "API Timeout", "The jukebox API did not respond in time.")
+
+
+def _api_busy() -> "ApiError":
+    return ApiError(
+        429,
+        "Too Busy",
+        "The bot has too many requests in flight, try again in a moment.",
+    )
+
+
+@contextlib.asynccontextmanager
+async def _api_slot() -> AsyncIterator[None]:
+    """Hold one of the API_MAX_IN_FLIGHT request slots, waiting briefly for it"""
+    left = remaining()
+    timeout = ADMISSION_MAX_WAIT if left is None else min(left, ADMISSION_MAX_WAIT)
+    if not await admission.acquire_slot(timeout):
+        raise _api_busy()
+    try:
+        yield
+    finally:
+        admission.release_slot()
+
+
+def _deadline_timeout(timeout: httpx.Timeout) -> httpx.Timeout:
+    """Shorten a timeout to what is left of the command's deadline"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise _api_timeout()
+
+    def cap(value: Optional[float]) -> float:
+        return left if value is None else min(value, left)
+
+    return httpx.Timeout(
+        connect=cap(timeout.connect),
+        read=cap(timeout.read),
+        write=cap(timeout.write),
+        pool=cap(timeout.pool),
+    )
+
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_TRACK_HASH = re.compile(r"^/api/track/(?!thumbnail)[^/]+")
+
+
+def _endpoint_label(url: str) -> str:
+    """The route of a request URL, without IDs that would explode the metric labels"""
+    path = url.split("?", 1)[0]
+    path = _TRACK_HASH.sub("/api/track/{hash}", path)
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+async def _send(
+    client: httpx.AsyncClient, method: str, url: str, **kwargs
+) -> httpx.Response:
+    """Send a single request, recording its latency and outcome"""
+    started_at = time.perf_counter()
+    status = "cancelled"
+    metrics.api_requests_in_flight.inc()
+    try:
+        resp = await client.request(method, url, **kwargs)
+        status = str(resp.status_code)
+        return resp
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+        raise
+    finally:
+        metrics.api_requests_in_flight.dec()
+        metrics.api_request_duration.observe(
+            time.perf_counter() - started_at, method, _endpoint_label(url), status
+        )
+
+
+async def _request(
+    method: str,
+    url: str,
+    token: str,
+    *,
+    timeout: httpx.Timeout = _TIMEOUT,
+    idempotent: Optional[bool] = None,
+    **kwargs,
+) -> httpx.Response:
+    """Send an API request, retrying transient failures within the command's deadline
+
+    Idempotent requests (GETs unless told otherwise) are retried after any
+    transient failure, others only if they never reached the API. Mutations
+    build their body once, so a retry carries the same sentAt.
+    """
+    if idempotent is None:
+        idempotent = method == "GET"
+    client = _get_client()
+    attempt = 0
+    while True:
+        if not _breaker.allow():
+            raise _api_unavailable()
+        error: Optional[httpx.TransportError] = None
+        try:
+            async with _api_slot():
+                resp = await _send(
+                    client,
+                    method,
+                    url,
+                    headers={"Authorization": f"Bearer {token}"},
+                    timeout=_deadline_timeout(timeout),
+                    **kwargs,
+                )
+        except httpx.PoolTimeout as e:
+            # The pool is busy with our own requests, the API may be fine
+            error = e
+            retryable = True
+        except httpx.TransportError as e:
+            _breaker.record_failure()
+            error = e
+            retryable = idempotent or isinstance(e, _NOT_SENT_ERRORS)
+        else:
+            if resp.status_code not in _RETRY_STATUSES:
+                _breaker.record_success()
+                return resp
+            _breaker.record_failure()
+            retryable = idempotent
+
+        attempt += 1
+        delay = backoff_delay(attempt, API_RETRY_BASE_DELAY, API_RETRY_MAX_DELAY)
+        left = remaining()
+        if (
+            not retryable
+            or attempt >= API_RETRY_ATTEMPTS
+            or (left is not None and delay >= left)
+        ):
+            if error is None:
+                return resp
+            if isinstance(error, httpx.TimeoutException):
+                raise _api_timeout() from error
+            raise _api_unavailable() from error
+        reason = repr(error) if error is not None else resp.status_code
+        logger.debug(f"Retrying {method} {url} in {delay:.2f}s after {reason}")
+        await asyncio.sleep(delay)
+
+
+async def start_client() -> None:
+    """Open the API client's connections ahead of the first commands"""
+    client = _get_client()
+
+    async def connect():
+        # Any response will do, only the connection is kept
+        try:
+            await client.head("/")
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not connect to the API: {e!r}")
+
+    connections = min(HTTP_WARMUP_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS)
+    await asyncio.gather(*(connect() for _ in range(connections)))
+
+
+async def close_client() -> None:
+    """Close the API client's pooled connections"""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+TOKEN_LIFETIME = timedelta(days=7)
+
+
+class _UserToken(NamedTuple):
+    room_code: str
+    token: str
+
+
+# Discord user ID -> associated room code, looked up again after ROOM_CODE_TTL
+# as the server trusts the room code in the token without checking it
+_room_codes: LRUCache[str, str] = LRUCache(TOKEN_CACHE_SIZE, ttl=ROOM_CODE_TTL)
+# Discord user ID -> a token signed for the user's room code, reused for as
+# long as that is still the user's room
+_token_cache: LRUCache[str, _UserToken] = LRUCache(
+    TOKEN_CACHE_SIZE,
+    ttl=max(TOKEN_LIFETIME.total_seconds() - TOKEN_REFRESH_MARGIN, 0),
+)
+# Room codes and track metadata shared with the other workers of a cluster,
+# disabled unless SHARED_CACHE_PATH is set
+shared_cache = SharedCache(SHARED_CACHE_PATH)
+
 
 class ApiError(Exception):
     def __init__(self, status_code: int, title: str, detail: str = None):
@@ -75,6 +404,7 @@ class ApiError(Exception):
 def _handle_api_response(resp: httpx.Response):
     if resp.status_code >= 200 and resp.status_code < 300:
         return resp
+    _invalidate_from_response(resp)
     try:
         problem = resp.json()
         title = problem.get("title", "Error")
@@ -85,61 +415,292 @@ def _handle_api_response(resp: httpx.Response):
     raise ApiError(resp.status_code, title, detail)
 
 
+# Identical reads in flight at the same time share one request, keyed by
+# endpoint and the user, room or track they are for
+_reads: SingleFlight[tuple, Any] = SingleFlight()
+
+
+def _room_key(token: str) -> str:
+    # Reads only depend on the room, not on which of its users asks
+    return token_room_code(token) or token
+
+
 async def _get_room_code_from_context(ctx: commands.Context) -> str | None:
     user_id = str(ctx.author.id)
-    resp = await _client.get(
-        f"/api/user/{user_id}", headers={"Authorization": f"Bearer {API_KEY}"}
-    )
-    _handle_api_response(resp)
-    return resp.json()["associated_room_code"]
+    room_code = _room_codes.get(user_id)
+    if room_code is not None:
+        return room_code
+
+    async def fetch() -> str | None:
+        room_code = await shared_cache.get("room_code", user_id)
+        if room_code is not None:
+            _room_codes.set(user_id, room_code)
+            return room_code
+        resp = await _request("GET", f"/api/user/{user_id}", API_KEY)
+        _handle_api_response(resp)
+        room_code = resp.json()["associated_room_code"]
+        # Users without a room are likely about to join one, so don't pin that state
+        if room_code:
+            _room_codes.set(user_id, room_code)
+            if shared_cache.enabled:
+                _in_background(
+                    shared_cache.set("room_code", user_id, room_code, ROOM_CODE_TTL)
+                )
+        return room_code
+
+    return await _reads.do(("user", user_id), fetch)
 
 
 async def get_token_from_context(ctx: commands.Context) -> str:
+    user_id = str(ctx.author.id)
     room_code = await _get_room_code_from_context(ctx)
+    cached = _token_cache.get(user_id)
+    if cached is not None and cached.room_code == room_code:
+        return cached.token
 
     payload = {
-        "user_id": str(ctx.author.id),
+        "user_id": user_id,
         "room_code": room_code,
-        "exp": datetime.now() + timedelta(days=7),
+        "exp": datetime.now() + TOKEN_LIFETIME,
         "iss": "bot-KoodaamoJukebox",
     }
     token = jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+    if room_code:
+        _token_cache.set(user_id, _UserToken(room_code, token))
+    else:
+        _token_cache.pop(user_id)
     return token
 
-async def get_all_users():
-    """Get all users in the room"""
-    resp = await _client.get(
-        "/api/user",
-        headers={"Authorization": f"Bearer {API_KEY}"},
-        timeout=60,
+
+def invalidate_token(user_id: int | str) -> None:
+    """Forget the cached room code and token of a user"""
+    _room_codes.pop(str(user_id))
+    _token_cache.pop(str(user_id))
+    if shared_cache.enabled:
+        _in_background(shared_cache.delete("room_code", str(user_id)))
+
+
+def _token_claims(token: str) -> dict:
+    """Read the claims of a token signed by this bot without verifying it"""
+    try:
+        return jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return {}
+
+
+def token_room_code(token: str) -> Optional[str]:
+    """Get the room code a token was signed for"""
+    return _token_claims(token).get("room_code")
+
+
+def token_user_id(token: str) -> Optional[str]:
+    """Get the Discord user ID a token was signed for"""
+    return _token_claims(token).get("user_id")
+
+
+# Reads that only 404 when the user's room or the user is gone, unlike a
+# missing track or queue item
+_USER_ROOM_READS = re.compile(r"/api/(room|room/info|queue/items|user/[^/]+)$")
+
+
+def _rejects_user(resp: httpx.Response) -> bool:
+    """Whether a response means the user's token or room code is no longer valid"""
+    if resp.status_code in (401, 403):
+        return True
+    request = resp.request
+    return (
+        resp.status_code == 404
+        and request.method == "GET"
+        and _USER_ROOM_READS.search(request.url.path) is not None
     )
+
+
+def _invalidate_from_response(resp: httpx.Response) -> None:
+    """Drop cached state tied to the token a request was rejected with"""
+    auth = resp.request.headers.get("Authorization", "")
+    token = auth.removeprefix("Bearer ")
+    claims = _token_claims(token)
+
+    # The room may have changed in a way we did not see
+    room_code = claims.get("room_code")
+    if room_code:
+        room_state.invalidate(room_code)
+
+    user_id = claims.get("user_id")
+    if user_id is not None and _rejects_user(resp):
+        invalidate_token(user_id)
+
+
+def cached_room_code(user_id: int | str) -> Optional[str]:
+    """Room code of the user if it is cached, without counting a lookup"""
+    return _room_codes.peek(str(user_id))
+
+
+def token_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the per-user token cache"""
+    return _token_cache.stats()
+
+
+def room_code_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the per-user room code cache"""
+    return _room_codes.stats()
+
+
+# Shared with the RoomHub subscriptions, which keep their rooms live
+room_state = RoomStateMirror(ROOM_STATE_MAX_AGE, ROOM_STATE_CACHE_SIZE)
+
+
+def room_state_stats() -> Dict[str, int]:
+    """Hit/miss counters of the room state mirror"""
+    return room_state.stats()
+
+
+# Track metadata is addressed by its webpage_url_hash and never changes
+_track_cache: LRUCache[str, TrackDto] = LRUCache(TRACK_CACHE_SIZE)
+# webpage_url_hash -> the in-flight fetch that will resolve it
+_track_requests: SingleFlight[str, Dict[str, TrackDto]] = SingleFlight()
+
+
+def _cache_tracks(tracks: list[TrackDto]) -> Dict[str, TrackDto]:
+    by_hash = {}
+    for track in tracks:
+        _track_cache.set(track["id"], track)
+        by_hash[track["id"]] = track
+    return by_hash
+
+
+# Strong references to fire-and-forget tasks so they aren't garbage collected
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _background_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug(f"Background API task failed: {task.exception()!r}")
+
+
+def _in_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_done)
+
+
+def prefetch_tracks(token: str, webpage_url_hashes: list[str]) -> None:
+    """Warm the track cache in the background with a single batched request"""
+    missing = [
+        h
+        for h in dict.fromkeys(webpage_url_hashes)
+        if h not in _track_cache and h not in _track_requests
+    ]
+    if not missing:
+        return
+    _in_background(get_tracks(token, missing))
+
+
+def track_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters of the track metadata cache"""
+    return _track_cache.stats()
+
+
+def clear_caches() -> None:
+    """Forget all cached room codes, tokens, tracks and room states"""
+    _room_codes.clear()
+    _token_cache.clear()
+    _track_cache.clear()
+    room_state.clear()
+
+
+def coalescing_stats() -> Dict[str, Dict[str, float]]:
+    """How many reads and track lookups joined a request already in flight"""
+    return {"reads": _reads.stats(), "tracks": _track_requests.stats()}
+
+async def get_users_page(
+    offset: int,
+    limit: int,
+    *,
+    embedded: Optional[bool] = None,
+    in_room: Optional[bool] = None,
+    banned: Optional[bool] = None,
+) -> UsersPage:
+    """Get a page of users, optionally only those matching the filters"""
+    params = {"offset": offset, "limit": limit}
+    for name, value in (
+        ("embedded", embedded),
+        ("inRoom", in_room),
+        ("banned", banned),
+    ):
+        if value is not None:
+            params[name] = "true" if value else "false"
+    resp = await _request("GET", "/api/user", API_KEY, params=params)
     _handle_api_response(resp)
-    return resp.json()
+    users = resp.json()
+    return UsersPage(users, int(resp.headers.get("X-Total-Count", len(users))))
+
 
 async def add_to_queue(token: str, url_or_query: str) -> None:
-    resp = await _client.post(
+    resp = await _request(
+        "POST",
         f"/api/queue/items?urlOrQuery={quote(url_or_query)}",
-        headers={"Authorization": f"Bearer {token}"},
-        timeout=60,
+        token,
+        timeout=_ADD_TIMEOUT,
     )
     _handle_api_response(resp)
     return resp.json()
 
 
 async def get_queue(token: str) -> List[dict]:
-    resp = await _client.get(
-        "/api/queue/items", headers={"Authorization": f"Bearer {token}"}, timeout=60
-    )
+    resp = await _request("GET", "/api/queue/items", token)
     _handle_api_response(resp)
     return resp.json()
 
 
-async def get_room_info(token: str) -> dict:
-    resp = await _client.get(
-        "/api/room/info", headers={"Authorization": f"Bearer {token}"}, timeout=60
-    )
-    _handle_api_response(resp)
-    return resp.json()
+async def get_queue_page(token: str, offset: int, limit: int) -> QueuePage:
+    """Get a window of the queue in play order"""
+
+    async def fetch() -> QueuePage:
+        resp = await _request(
+            "GET", "/api/queue/items", token, params={"offset": offset, "limit": limit}
+        )
+        _handle_api_response(resp)
+        items = resp.json()
+        return QueuePage(items, int(resp.headers.get("X-Total-Count", len(items))))
+
+    return await _reads.do(("queue", _room_key(token), offset, limit), fetch)
+
+
+async def iter_queue(
+    token: str, chunk_size: int = QUEUE_CHUNK_SIZE
+) -> AsyncIterator[List[QueueItemDto]]:
+    """Stream the whole queue in play order, chunk_size items at a time
+
+    Chunks are separate requests, so a queue modified meanwhile may yield
+    an item twice or skip one.
+    """
+    offset = 0
+    while True:
+        page = await get_queue_page(token, offset, chunk_size)
+        if page.items:
+            yield page.items
+        offset += len(page.items)
+        if len(page.items) < chunk_size or offset >= page.total:
+            return
+
+
+async def get_room_info(token: str) -> RoomInfoDto:
+    """Get current room information without the queue"""
+
+    async def fetch() -> RoomInfoDto:
+        resp = await _request("GET", "/api/room/info", token)
+        _handle_api_response(resp)
+        return resp.json()
+
+    return await _reads.do(("room_info", _room_key(token)), fetch)
+
+
+def current_rank(room_info: RoomInfoDto) -> Optional[int]:
+    """Position of the current track in play order"""
+    current_item = room_info["current_item"]
+    return current_item["shuffle_index" if room_info["is_shuffled"] else "index"]
 
 
 def _get_current_timestamp() -> int:
@@ -148,28 +709,78 @@ def _get_current_timestamp() -> int:
 
 
 # Track API endpoints
+async def _fetch_track(token: str, webpage_url_hash: str) -> Dict[str, TrackDto]:
+    shared = await shared_cache.get_many("track", [webpage_url_hash])
+    if shared:
+        return _cache_tracks(list(shared.values()))
+    resp = await _request("GET", f"/api/track/{webpage_url_hash}", token)
+    _handle_api_response(resp)
+    return _share_tracks(_cache_tracks([resp.json()]))
+
+
+async def _fetch_tracks(
+    token: str, webpage_url_hashes: list[str]
+) -> Dict[str, TrackDto]:
+    found = _cache_tracks(
+        list((await shared_cache.get_many("track", webpage_url_hashes)).values())
+    )
+    missing = [h for h in webpage_url_hashes if h not in found]
+    if not missing:
+        return found
+    data: TracksRequestDto = {"webpage_url_hashes": missing}
+    resp = await _request(
+        "POST", "/api/track", token, json=data, idempotent=True
+    )
+    if resp.status_code == 404:
+        # None of the requested tracks exist
+        return found
+    _handle_api_response(resp)
+    return {**found, **_share_tracks(_cache_tracks(resp.json()))}
+
+
+def _share_tracks(tracks: Dict[str, TrackDto]) -> Dict[str, TrackDto]:
+    if shared_cache.enabled:
+        _in_background(
+            shared_cache.set_many("track", tracks, SHARED_CACHE_TRACK_TTL)
+        )
+    return tracks
+
+
 async def get_track(token: str, webpage_url_hash: str) -> TrackDto:
     """Get a single track by its webpageUrlHash"""
-    resp = await _client.get(
-        f"/api/track/{webpage_url_hash}",
-        headers={"Authorization": f"Bearer {token}"},
-        timeout=60,
+    track = _track_cache.get(webpage_url_hash)
+    if track is not None:
+        return track
+
+    tracks = await _track_requests.do(
+        webpage_url_hash, lambda: _fetch_track(token, webpage_url_hash)
     )
-    _handle_api_response(resp)
-    return resp.json()
+    if webpage_url_hash not in tracks:
+        raise ApiError(404, "Not Found", "Track not found.")
+    return tracks[webpage_url_hash]
 
 
 async def get_tracks(token: str, webpage_url_hashes: list[str]) -> list[TrackDto]:
-    """Get multiple tracks by their webpageUrlHashes"""
-    data = {"webpage_url_hashes": webpage_url_hashes}
-    resp = await _client.post(
-        "/api/track",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
-    )
-    _handle_api_response(resp)
-    return resp.json()
+    """Get multiple tracks by their webpageUrlHashes, skipping unknown ones"""
+    found: Dict[str, TrackDto] = {}
+    missing: list[str] = []
+    pending: set[asyncio.Task] = set()
+    for webpage_url_hash in dict.fromkeys(webpage_url_hashes):
+        track = _track_cache.get(webpage_url_hash)
+        if track is not None:
+            found[webpage_url_hash] = track
+        elif webpage_url_hash in _track_requests:
+            pending.add(_track_requests.get(webpage_url_hash))
+        else:
+            missing.append(webpage_url_hash)
+
+    if missing:
+        pending.add(_track_requests.start(missing, _fetch_tracks(token, missing)))
+
+    for task in pending:
+        found.update(await asyncio.shield(task))
+
+    return [found[h] for h in webpage_url_hashes if h in found]
 
 
 async def get_track_thumbnail_high(webpage_url_hash: str) -> str:
@@ -186,128 +797,258 @@ async def get_track_thumbnail_low(webpage_url_hash: str) -> str:
 # Room API endpoints
 async def get_room(token: str) -> RoomResponse:
     """Get current room information and queue"""
-    resp = await _client.get(
-        "/api/room", headers={"Authorization": f"Bearer {token}"}, timeout=60
-    )
-    _handle_api_response(resp)
-    return resp.json()
+
+    async def fetch() -> RoomResponse:
+        resp = await _request("GET", "/api/room", token)
+        _handle_api_response(resp)
+        return room_state.update(resp.json())
+
+    return await _reads.do(("room", _room_key(token)), fetch)
+
+
+async def get_room_state(token: str, max_age: Optional[float] = None) -> RoomResponse:
+    """Get the room from the local mirror if it is fresh enough, otherwise from the API"""
+    room_code = token_room_code(token)
+    if room_code:
+        room = room_state.get(room_code, max_age)
+        if room is not None:
+            return room
+    return await get_room(token)
+
+
+def cached_room_snapshot(
+    token: str, max_age: Optional[float] = 0
+) -> Optional[RoomSnapshot]:
+    """Get the room from the local mirror without making any request"""
+    room_code = token_room_code(token)
+    if not room_code:
+        return None
+    return room_state.get_snapshot(room_code, max_age)
+
+
+async def get_room_snapshot(
+    token: str, max_age: Optional[float] = None
+) -> RoomSnapshot:
+    """Like get_room_state, but as an indexed RoomSnapshot"""
+    snapshot = cached_room_snapshot(token, max_age)
+    if snapshot is not None:
+        return snapshot
+    room = await get_room(token)
+    return room_state.get_snapshot(room["room_info"]["room_code"], float("inf"))
 
 
 async def pause_toggle(token: str, paused: bool) -> RoomResponse:
     """Toggle pause state"""
     data = {"sentAt": _get_current_timestamp(), "value": paused}
-    resp = await _client.post(
-        "/api/room/pause",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
+    resp = await _request(
+        "POST", "/api/room/pause", token, json=data, idempotent=True
     )
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
 
 
 async def loop_toggle(token: str, loop: bool) -> RoomResponse:
     """Toggle loop state"""
     data = {"sentAt": _get_current_timestamp(), "value": loop}
-    resp = await _client.post(
-        "/api/room/loop",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
+    resp = await _request(
+        "POST", "/api/room/loop", token, json=data, idempotent=True
     )
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
 
 
 async def shuffle_toggle(token: str, shuffled: bool) -> RoomResponse:
     """Toggle shuffle state"""
     data = {"sentAt": _get_current_timestamp(), "value": shuffled}
-    resp = await _client.post(
-        "/api/room/shuffle",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
+    resp = await _request(
+        "POST", "/api/room/shuffle", token, json=data, idempotent=True
     )
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
 
 
 async def seek(token: str, seek_time: int) -> RoomResponse:
     """Seek to a specific time in the current track (in seconds)"""
     data = {"sentAt": _get_current_timestamp(), "value": seek_time}
-    resp = await _client.post(
-        "/api/room/seek",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
+    resp = await _request(
+        "POST", "/api/room/seek", token, json=data, idempotent=True
     )
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
 
 
 async def skip(token: str, index: int) -> RoomResponse:
     """Skip to a specific track by index"""
     data = {"sentAt": _get_current_timestamp(), "value": index}
-    resp = await _client.post(
-        "/api/room/skip",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
+    resp = await _request(
+        "POST", "/api/room/skip", token, json=data, idempotent=True
     )
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
+
+
+class SkipResult(NamedTuple):
+    # Tracks skipped by the merged skips, and the rank skipped to
+    amount: int
+    # None if the current track was not found in the queue
+    target: Optional[int]
+
+
+# Bursts of the same mutation in a room become one API call
+_mutations = MutationScheduler(MUTATION_DEBOUNCE)
+
+
+def _last_value(_, value):
+    return value
+
+
+def _merge_skip(
+    amounts: Optional[Dict[str, int]], skip: Tuple[str, int]
+) -> Dict[str, int]:
+    user_id, amount = skip
+    amounts = {} if amounts is None else amounts
+    # Re-inserted so the dict stays ordered by the latest skip
+    amounts[user_id] = amounts.pop(user_id, 0) + amount
+    return amounts
+
+
+async def skip_by(token: str, amount: int) -> SkipResult:
+    """Skip relative to the current track, merging a burst of skips in the room
+
+    Users skipping at the same time are reacting to the same track, so their
+    skips overlap rather than add up and the largest one wins. A user's own
+    repeated skips do add up.
+    """
+
+    async def apply(amounts: Dict[str, int]) -> SkipResult:
+        # max keeps the first of equals, which is the latest after reversing
+        amount = max(reversed(amounts.values()), key=abs)
+        room = await get_room_snapshot(token)
+        if room.current_rank is None:
+            return SkipResult(amount, None)
+        target = room.current_rank + amount
+        if amount != 0 and target >= 0:
+            await skip(token, target)
+        return SkipResult(amount, target)
+
+    user_id = _token_claims(token).get("user_id")
+    return await _mutations.submit(
+        ("skip", _room_key(token)), (user_id, amount), _merge_skip, apply
+    )
+
+
+async def seek_to(token: str, seek_time: int) -> int:
+    """Seek, sending only the last of a burst of seeks in the room
+
+    Returns the time that was actually seeked to.
+    """
+
+    async def apply(seek_time: int) -> int:
+        await seek(token, seek_time)
+        return seek_time
+
+    return await _mutations.submit(
+        ("seek", _room_key(token)), seek_time, _last_value, apply
+    )
+
+
+async def set_paused(token: str, paused: bool) -> bool:
+    """Pause or resume, sending a burst of the same request in the room once
+
+    A pause and a resume are not merged but sent in the order they were
+    made, so each caller's request is the one that was applied. Returns the
+    state that was applied.
+    """
+
+    async def apply(paused: bool) -> bool:
+        await pause_toggle(token, paused)
+        return paused
+
+    return await _mutations.submit(
+        ("pause", _room_key(token)),
+        paused,
+        _last_value,
+        apply,
+        joins=lambda batch, paused: batch == paused,
+    )
+
+
+def mutation_stats() -> Dict[str, int]:
+    """Mutations submitted by commands and API calls they were merged into"""
+    return _mutations.stats()
 
 
 async def move_track(token: str, from_index: int, to_index: int) -> RoomResponse:
     """Move a track from one position to another"""
     data = {"sentAt": _get_current_timestamp(), "from": from_index, "to": to_index}
-    resp = await _client.post(
-        "/api/room/move",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
-    )
+    resp = await _request("POST", "/api/room/move", token, json=data)
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
 
 
 async def add_track(token: str, url_or_query: str) -> RoomResponse:
     """Add a track to the queue"""
     data = {"sentAt": _get_current_timestamp(), "value": url_or_query}
-    resp = await _client.post(
-        "/api/room/add",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
+    resp = await _request(
+        "POST", "/api/room/add", token, json=data, timeout=_ADD_TIMEOUT
     )
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
+
+
+async def arrange_items(token: str, item_ids: List[int]) -> int:
+    """Move queue items so that they play in the given order
+
+    Items already in the right order relative to each other stay put.
+    Returns the number of moves made.
+    """
+    room = await get_room_snapshot(token, max_age=0)
+    moves = plan_order(room.item_ids(), item_ids)
+    await apply_moves(token, moves)
+    return len(moves)
+
+
+async def apply_moves(token: str, moves: List[Move]) -> None:
+    """Make planned moves in one request, each relative to the queue the previous left"""
+    if not moves:
+        return
+    data = {
+        "sentAt": _get_current_timestamp(),
+        "moves": [{"from": from_index, "to": to_index} for from_index, to_index in moves],
+    }
+    resp = await _request("POST", "/api/room/move/batch", token, json=data)
+    _handle_api_response(resp)
+    room_state.update(resp.json())
+
+
+async def delete_items(token: str, item_ids: List[int]) -> Dict[int, ApiError]:
+    """Delete queue items by ID in one request, returning the errors of those that could not be"""
+    if not item_ids:
+        return {}
+    data = {"sentAt": _get_current_timestamp(), "values": item_ids}
+    resp = await _request("POST", "/api/room/delete/batch", token, json=data)
+    _handle_api_response(resp)
+    room = room_state.update(resp.json())
+    return {
+        failed["item_id"]: ApiError(400, "Bad Request", failed["error"])
+        for failed in room.get("failed_items") or []
+    }
 
 
 async def remove_track(token: str, track_id: int) -> RoomResponse:
     """Remove a track from the queue by ID"""
     data = {"sentAt": _get_current_timestamp(), "value": track_id}
-    resp = await _client.post(
-        "/api/room/remove",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
-    )
+    resp = await _request("POST", "/api/room/remove", token, json=data)
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
 
 
 async def delete_track(token: str, item_id: int) -> RoomResponse:
     """Delete a track from the queue by ID"""
     data = {"sentAt": _get_current_timestamp(), "value": item_id}
-    resp = await _client.post(
-        "/api/room/delete",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
-    )
+    resp = await _request("POST", "/api/room/delete", token, json=data)
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
 
 
 async def clear_queue(token: str) -> RoomResponse:
@@ -316,34 +1057,64 @@ async def clear_queue(token: str) -> RoomResponse:
         "sentAt": _get_current_timestamp(),
         "value": 0,  # Value is not used, but TimestampedIntRequest requires it
     }
-    resp = await _client.post(
-        "/api/room/clear",
-        headers={"Authorization": f"Bearer {token}"},
-        json=data,
-        timeout=60,
+    resp = await _request(
+        "POST", "/api/room/clear", token, json=data, idempotent=True
     )
     _handle_api_response(resp)
-    return resp.json()
+    return room_state.update(resp.json())
 
 async def ban_user(user_id: int, until: int, reason: str) -> None:
     """Ban a user from the room"""
-    resp = await _client.post(
+    resp = await _request(
+        "POST",
         f"/api/user/{user_id}/ban",
-        headers={"Authorization": f"Bearer {API_KEY}"},
+        API_KEY,
         json={
-        "until": until,
-        "reason": reason or "No reason provided",
-    },
-        timeout=60,
+            "until": until,
+            "reason": reason or "No reason provided",
+        },
+        idempotent=True,
     )
     _handle_api_response(resp)
 
 async def unban_user(user_id: int) -> None:
     """Unban a user from the room"""
-    resp = await _client.post(
-        f"/api/user/{user_id}/unban",
-        headers={"Authorization": f"Bearer {API_KEY}"},
-        timeout=60,
+    resp = await _request(
+        "POST", f"/api/user/{user_id}/unban", API_KEY, idempotent=True
     )
     _handle_api_response(resp)
 
+
+metrics.registry.register_stats(
+    "token_cache", "Per-user token cache counters", token_cache_stats
+)
+metrics.registry.register_stats(
+    "room_code_cache", "Per-user room code cache counters", room_code_cache_stats
+)
+metrics.registry.register_stats(
+    "track_cache", "Track metadata cache counters", track_cache_stats
+)
+metrics.registry.register_stats(
+    "room_state", "Room state mirror counters", room_state_stats
+)
+metrics.registry.register_stats(
+    "read_coalescing",
+    "Identical reads that joined a request in flight",
+    _reads.stats,
+)
+metrics.registry.register_stats(
+    "track_coalescing",
+    "Track lookups that joined a request in flight",
+    _track_requests.stats,
+)
+metrics.registry.register_stats(
+    "mutations", "Mutations merged by the per-room scheduler", mutation_stats
+)
+metrics.registry.register_stats(
+    "shared_cache",
+    "Lookups and writes of the cache shared by the workers of a cluster",
+    shared_cache.stats,
+)
+metrics.registry.register_stats(
+    "circuit_breaker", "API circuit breaker state and counters", circuit_breaker_stats
+)
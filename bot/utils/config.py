@@ -18,3 +18,137 @@ if not JWT_SECRET:
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 if not DISCORD_BOT_TOKEN:
     raise RuntimeError("DISCORD_BOT_TOKEN environment variable is not set")
+
+# Per-user room code and token cache
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+# Seconds before a cached token's expiry at which a new one is signed
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "3600"))
+# Seconds a user's room code is trusted before it is looked up again, here and in
+# the shared cache of a cluster, users can move to another room at any time
+ROOM_CODE_TTL = float(os.getenv("ROOM_CODE_TTL", "30"))
+
+# Maximum number of track metadata entries kept in memory
+TRACK_CACHE_SIZE = int(os.getenv("TRACK_CACHE_SIZE", "4096"))
+
+# Seconds a room state received from the API is trusted for read-before-write commands
+ROOM_STATE_MAX_AGE = float(os.getenv("ROOM_STATE_MAX_AGE", "3"))
+# Maximum number of rooms whose last known state is kept in memory
+ROOM_STATE_CACHE_SIZE = int(os.getenv("ROOM_STATE_CACHE_SIZE", "128"))
+
+# Keep rooms live through the RoomHub so read commands need no REST calls, opt-in
+ROOM_HUB_ENABLED = os.getenv("ROOM_HUB_ENABLED", "false").lower() == "true"
+# Seconds without commands after which a room's hub subscription is closed
+ROOM_HUB_IDLE_TIMEOUT = float(os.getenv("ROOM_HUB_IDLE_TIMEOUT", "900"))
+# Upper bound in seconds for the reconnect backoff of a hub subscription
+ROOM_HUB_MAX_BACKOFF = float(os.getenv("ROOM_HUB_MAX_BACKOFF", "60"))
+
+# Number of queue items fetched per request when streaming a whole queue
+QUEUE_CHUNK_SIZE = int(os.getenv("QUEUE_CHUNK_SIZE", "500"))
+
+# Connection pool of the API client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+# Idle connections kept open for reuse, and for how many seconds
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+# Multiplex requests over HTTP/2 when the h2 package is installed
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+# Connections opened ahead of the first commands once the bot is ready
+HTTP_WARMUP_CONNECTIONS = int(os.getenv("HTTP_WARMUP_CONNECTIONS", "4"))
+# Seconds to wait for a connection, for a free slot in the pool and for a response
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+# Read timeout of endpoints that resolve new tracks, which can take a while
+HTTP_ADD_TIMEOUT = float(os.getenv("HTTP_ADD_TIMEOUT", "60"))
+
+# Attempts per API request when it fails transiently (connection errors, 502-504)
+API_RETRY_ATTEMPTS = int(os.getenv("API_RETRY_ATTEMPTS", "3"))
+# Base and maximum delay in seconds of the jittered exponential backoff between attempts
+API_RETRY_BASE_DELAY = float(os.getenv("API_RETRY_BASE_DELAY", "0.25"))
+API_RETRY_MAX_DELAY = float(os.getenv("API_RETRY_MAX_DELAY", "2"))
+# Seconds all API calls of a command may take together, including retries
+API_COMMAND_DEADLINE = float(os.getenv("API_COMMAND_DEADLINE", "20"))
+# Same, for commands that add tracks
+API_ADD_DEADLINE = float(os.getenv("API_ADD_DEADLINE", "90"))
+# Consecutive failures after which API calls fail fast, and for how many seconds
+API_BREAKER_THRESHOLD = int(os.getenv("API_BREAKER_THRESHOLD", "5"))
+API_BREAKER_RESET_TIMEOUT = float(os.getenv("API_BREAKER_RESET_TIMEOUT", "15"))
+
+# Rate limits of the commands that call the API: a burst, then this many per second,
+# per user, per room and for the whole bot. ADMISSION_ENABLED=false turns them off.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "1"))
+ADMISSION_USER_BURST = int(os.getenv("ADMISSION_USER_BURST", "5"))
+ADMISSION_ROOM_RATE = float(os.getenv("ADMISSION_ROOM_RATE", "4"))
+ADMISSION_ROOM_BURST = int(os.getenv("ADMISSION_ROOM_BURST", "15"))
+ADMISSION_GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", "50"))
+ADMISSION_GLOBAL_BURST = int(os.getenv("ADMISSION_GLOBAL_BURST", "100"))
+# Seconds a command over a limit, or an API call over API_MAX_IN_FLIGHT, waits before it is rejected
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "2"))
+# API requests the bot has in flight at once
+API_MAX_IN_FLIGHT = int(os.getenv("API_MAX_IN_FLIGHT", "64"))
+# Users and rooms whose rate limits are tracked, the least recently active are forgotten
+ADMISSION_TRACKED_KEYS = int(os.getenv("ADMISSION_TRACKED_KEYS", "4096"))
+
+# Seconds skip, seek and pause requests in a room are collected before one API call is made
+MUTATION_DEBOUNCE = float(os.getenv("MUTATION_DEBOUNCE", "0.3"))
+
+# Maximum number of URLs or queries a single play command may add
+PLAY_BULK_MAX = int(os.getenv("PLAY_BULK_MAX", "50"))
+# Number of them resolved by the API at the same time
+PLAY_BULK_CONCURRENCY = int(os.getenv("PLAY_BULK_CONCURRENCY", "4"))
+# Minimum seconds between edits of a progress message
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "2"))
+
+# Serve Prometheus metrics on this port, 0 disables the endpoint
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Interface the metrics endpoint listens on, local only by default
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Messages sent, and separately edited, per channel in a burst, refilled over the period
+# in seconds, matching Discord's per-channel limits
+OUTBOX_CHANNEL_BURST = int(os.getenv("OUTBOX_CHANNEL_BURST", "5"))
+OUTBOX_CHANNEL_PERIOD = float(os.getenv("OUTBOX_CHANNEL_PERIOD", "5"))
+# Replies up to this many characters that queue up in a channel are sent as one message
+OUTBOX_MERGE_MAX_LENGTH = int(os.getenv("OUTBOX_MERGE_MAX_LENGTH", "200"))
+
+# Minimum seconds between edits of a now-playing message, changes in between are merged
+NOW_PLAYING_EDIT_INTERVAL = float(os.getenv("NOW_PLAYING_EDIT_INTERVAL", "5"))
+# Seconds after which a now-playing message re-reads its room even without changes
+NOW_PLAYING_REFRESH = float(os.getenv("NOW_PLAYING_REFRESH", "60"))
+# Maximum number of channels with a now-playing message
+NOW_PLAYING_MAX_BOARDS = int(os.getenv("NOW_PLAYING_MAX_BOARDS", "100"))
+
+# Users shown per page by userinfo, at most 25
+USERINFO_PAGE_SIZE = int(os.getenv("USERINFO_PAGE_SIZE", "10"))
+
+# Directory the profile and memory snapshot commands write their results to
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Longest CPU profile the profile command captures, in seconds
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "300"))
+
+# Log file, rotated once it grows past LOG_MAX_BYTES or, if LOG_ROTATE_WHEN
+# is set (e.g. "midnight"), on that schedule instead
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+# Rotated log files kept
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# "text" or "json", one object per line with any command, user, room and duration fields
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Set by cluster.py for its workers: the total number of shards and the
+# comma-separated shards this process runs. Unset runs a single unsharded bot.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_IDS = [int(i) for i in os.getenv("SHARD_IDS", "").split(",") if i.strip()]
+# SQLite file the workers of a cluster share track metadata and room codes
+# through, unset keeps the caches in process only
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+# Seconds track metadata is kept in the shared cache, bounding its size
+SHARED_CACHE_TRACK_TTL = float(os.getenv("SHARED_CACHE_TRACK_TTL", str(7 * 24 * 3600)))
+
+# Connect with only the intents the commands need, without member caching or
+# chunking, instead of every intent. Opt-in, as it changes what the bot caches.
+LEAN_GATEWAY = os.getenv("LEAN_GATEWAY", "false").lower() == "true"
+# Messages kept in memory in lean mode, 0 disables the message cache
+MESSAGE_CACHE_SIZE = int(os.getenv("MESSAGE_CACHE_SIZE", "100"))
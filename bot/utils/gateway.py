@@ -0,0 +1,22 @@
+import discord
+
+from typing import Any, Dict
+
+
+def gateway_options(lean: bool, max_messages: int) -> Dict[str, Any]:
+    """Keyword arguments of the bot that decide what it receives and caches"""
+    if not lean:
+        return {"intents": discord.Intents.all()}
+    # Prefix commands only need to see messages and who sent them, members
+    # and presences would otherwise be cached for every guild
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+    return {
+        "intents": intents,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+        "max_messages": max_messages or None,
+    }
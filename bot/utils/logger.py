@@ -1,17 +1,83 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+
+from utils.config import (
+    LOG_BACKUP_COUNT,
+    LOG_FILE,
+    LOG_FORMAT,
+    LOG_MAX_BYTES,
+    LOG_ROTATE_WHEN,
+)
+
+# Optional fields passed through extra=, included in JSON output
+STRUCTURED_FIELDS = ("command", "user", "room", "duration")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener is in this process, so unlike the stock handler the
+        # record keeps its exception info for the formatters, only the
+        # arguments are merged now as they may change before it is written
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _file_handler() -> logging.Handler:
+    if LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, delay=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True
+    )
+
 
 logger = logging.getLogger("bot")
 
 logger.setLevel(logging.INFO if os.getenv("ENV") == "production" else logging.DEBUG)
 
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+if LOG_FORMAT == "json":
+    formatter = JsonFormatter()
+else:
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
 stream_handler = logging.StreamHandler()
 stream_handler.setFormatter(formatter)
 
-file_handler = logging.FileHandler("bot.log")
+file_handler = _file_handler()
 file_handler.setFormatter(formatter)
 
-logger.addHandler(stream_handler)
-logger.addHandler(file_handler)
+# Records are only queued on the event loop, a thread does the formatting
+# and the writing so a slow disk or terminal can't stall the bot
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener = logging.handlers.QueueListener(_log_queue, stream_handler, file_handler)
+_listener.start()
+atexit.register(_listener.stop)
+
+logger.addHandler(_QueueHandler(_log_queue))
@@ -0,0 +1,317 @@
+import contextvars
+import math
+import os
+import resource
+import sys
+import time
+
+from aiohttp import web
+
+from utils.logger import logger
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+# Upper bounds in seconds, API calls are mostly tens of milliseconds while
+# commands that add tracks can take most of a minute
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf
+)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _HistogramSeries:
+    __slots__ = ("bucket_counts", "sum", "count")
+
+    def __init__(self, buckets: int):
+        # Not cumulative, summed up on exposition
+        self.bucket_counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Distribution of observed values, in Prometheus' cumulative bucket format"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, _HistogramSeries] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series.bucket_counts[i] += 1
+                break
+        series.sum += value
+        series.count += 1
+
+    def summary(self) -> Dict[Labels, Tuple[int, float, Optional[float]]]:
+        """(count, mean, 95th percentile bucket bound) of every label combination"""
+        result = {}
+        for labels, series in self._series.items():
+            result[labels] = (
+                series.count,
+                series.sum / series.count,
+                self._quantile_bound(series, 0.95),
+            )
+        return result
+
+    def _quantile_bound(self, series: _HistogramSeries, q: float) -> Optional[float]:
+        rank = q * series.count
+        seen = 0
+        for bound, count in zip(self.buckets, series.bucket_counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def expose(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        names = self.labelnames + ("le",)
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.bucket_counts):
+                cumulative += count
+                le = _format_value(bound)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {series.sum}")
+            lines.append(f"{self.name}_count{label_text} {series.count}")
+        return lines
+
+
+class Counter:
+    """A count that only goes up, such as rejected commands"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self) -> Dict[Labels, float]:
+        return dict(self._values)
+
+    def expose(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        for labels, value in self._values.items():
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            )
+        return lines
+
+
+class Gauge:
+    """A value that goes up and down, such as requests in flight"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def expose(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.value}",
+        ]
+
+
+StatsSource = Callable[[], Dict[str, Union[int, float, str]]]
+
+
+class Registry:
+    """The bot's metrics, plus the stats of its caches read on every scrape"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._metrics: List[Union[Histogram, Counter, Gauge]] = []
+        self._stats: Dict[str, Tuple[str, StatsSource]] = {}
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Histogram:
+        metric = Histogram(f"{self.prefix}_{name}", documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        metric = Counter(f"{self.prefix}_{name}_total", documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        metric = Gauge(f"{self.prefix}_{name}", documentation)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, name: str, documentation: str, source: StatsSource):
+        """Export a stats() dict as a gauge labelled by stat"""
+        self._stats[name] = (documentation, source)
+
+    def stats(self) -> Dict[str, Dict[str, Union[int, float, str]]]:
+        return {name: source() for name, (_, source) in self._stats.items()}
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for name, (documentation, source) in self._stats.items():
+            metric_name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric_name} {documentation}")
+            lines.append(f"# TYPE {metric_name} gauge")
+            for stat, value in source().items():
+                # Non-numeric stats such as the breaker state are only shown by !stats
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(
+                        f"{metric_name}{_format_labels(('stat',), (stat,))} {value}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def _rss_bytes() -> Optional[int]:
+    # Current resident set size, only available from procfs
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_stats() -> Dict[str, int]:
+    """Resident memory of the bot process, in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes everywhere but on macOS
+    stats = {"peak_rss_bytes": peak if sys.platform == "darwin" else peak * 1024}
+    rss = _rss_bytes()
+    if rss is not None:
+        stats["rss_bytes"] = rss
+    return stats
+
+
+registry = Registry("jukebox")
+
+api_request_duration = registry.histogram(
+    "api_request_duration_seconds",
+    "Duration of API requests, per attempt",
+    ("method", "endpoint", "status"),
+)
+api_requests_in_flight = registry.gauge(
+    "api_requests_in_flight", "API requests waiting for a response"
+)
+command_duration = registry.histogram(
+    "command_duration_seconds",
+    "Time from a command being invoked until it finished, replies included",
+    ("command", "status"),
+)
+
+admission_wait = registry.histogram(
+    "admission_wait_seconds",
+    "Time commands waited for the rate limits before running or being rejected",
+    ("outcome",),
+)
+admission_rejected = registry.counter(
+    "admission_rejected",
+    "Commands rejected by the rate limits, which never start running",
+    ("command", "scope"),
+)
+
+registry.register_stats(
+    "process", "Resident memory of the bot process", process_stats
+)
+
+_command_started_at: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "command_started_at", default=None
+)
+
+
+def command_started() -> None:
+    _command_started_at.set(time.perf_counter())
+
+
+def admission_finished(
+    command: str, waited: float, rejected_scope: Optional[str] = None
+) -> None:
+    """Record how long a command waited for the rate limits and if it was let in"""
+    if rejected_scope is None:
+        admission_wait.observe(waited, "admitted")
+        return
+    admission_wait.observe(waited, "rejected")
+    admission_rejected.inc(command, rejected_scope)
+
+
+def command_finished(command: str, failed: bool) -> Optional[float]:
+    """Record the duration of the command, which is returned in seconds"""
+    started_at = _command_started_at.get()
+    if started_at is None:
+        return None
+    duration = time.perf_counter() - started_at
+    command_duration.observe(duration, command, "error" if failed else "ok")
+    return duration
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        text=registry.expose(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def start_server(host: str, port: int) -> web.AppRunner:
+    """Serve the metrics in Prometheus' text format on /metrics"""
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
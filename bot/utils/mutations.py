@@ -0,0 +1,109 @@
+import asyncio
+
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Optional,
+    TypeVar,
+)
+
+A = TypeVar("A")
+V = TypeVar("V")
+R = TypeVar("R")
+
+
+class _Batch(Generic[A]):
+    __slots__ = ("value", "task")
+
+    def __init__(self, value: A):
+        self.value = value
+        self.task: Optional[asyncio.Task] = None
+
+
+class MutationScheduler:
+    """Debounces mutations so that a burst of them becomes a single API call
+
+    Mutations submitted under the same key within the debounce window are
+    merged into one value, which is applied once the window has passed, and
+    every submitter gets the result of that call. Batches of the same key are
+    applied one after another, so each one sees the state the previous left.
+    """
+
+    def __init__(self, debounce: float):
+        self.debounce = debounce
+        self.submitted = 0
+        self.applied = 0
+        self._batches: Dict[Hashable, _Batch] = {}
+        self._applying: Dict[Hashable, asyncio.Task] = {}
+
+    async def submit(
+        self,
+        key: Hashable,
+        value: V,
+        merge: Callable[[Optional[A], V], A],
+        apply: Callable[[A], Awaitable[R]],
+        joins: Optional[Callable[[A, V], bool]] = None,
+    ) -> R:
+        """Add a mutation to the key's open batch and wait for the batch to be applied
+
+        merge folds the value into the batch's value, which is None for the
+        first mutation of a batch. Only the first mutation's apply is used.
+        If joins says the value can't join the open batch, that batch is
+        closed and the value starts the next one, applied after it.
+        """
+        self.submitted += 1
+        batch = self._batches.get(key)
+        after = None
+        if batch is not None and joins is not None and not joins(batch.value, value):
+            after = batch.task
+            batch = None
+        if batch is None:
+            batch = _Batch(merge(None, value))
+            self._batches[key] = batch
+            batch.task = asyncio.create_task(self._apply(key, batch, apply, after))
+            batch.task.add_done_callback(_retrieve_exception)
+        else:
+            batch.value = merge(batch.value, value)
+        return await asyncio.shield(batch.task)
+
+    async def _apply(
+        self,
+        key: Hashable,
+        batch: _Batch,
+        apply: Callable,
+        after: Optional[asyncio.Task] = None,
+    ) -> R:
+        await asyncio.sleep(self.debounce)
+        if after is not None:
+            # Closed early for this batch, which must not overtake it
+            await asyncio.wait([after])
+        task = asyncio.current_task()
+        previous = self._applying.get(key)
+        self._applying[key] = task
+        try:
+            if previous is not None:
+                # Mutations arriving meanwhile still join this batch
+                await asyncio.wait([previous])
+            if self._batches.get(key) is batch:
+                del self._batches[key]
+            self.applied += 1
+            return await apply(batch.value)
+        finally:
+            if self._applying.get(key) is task:
+                del self._applying[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._batches),
+            "submitted": self.submitted,
+            "applied": self.applied,
+        }
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Submitters may all have been cancelled, don't leave the error unretrieved
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,270 @@
+import asyncio
+import time
+
+import discord
+
+import utils.api
+import utils.metrics as metrics
+from utils.api import ApiError
+from utils.config import (
+    API_BASE_URL_PROD,
+    NOW_PLAYING_EDIT_INTERVAL,
+    NOW_PLAYING_MAX_BOARDS,
+    NOW_PLAYING_REFRESH,
+)
+from utils.logger import logger
+from utils.outbox import Priority, outbox
+from utils.room_hub import hub
+from utils.room_snapshot import RoomSnapshot
+
+from typing import Dict, List, Optional
+
+# Boards rendered at the same time, their edits are then paced by the outbox
+EDIT_CONCURRENCY = 4
+
+
+class _Board:
+    __slots__ = (
+        "channel_id",
+        "message",
+        "token",
+        "room_code",
+        "rendered",
+        "edited_at",
+        "checked_at",
+        "due",
+        "task",
+        "playing_since",
+        "paused_position",
+    )
+
+    def __init__(self, channel_id: int, message: discord.Message, token: str):
+        self.channel_id = channel_id
+        self.message = message
+        self.token = token
+        self.room_code = utils.api.token_room_code(token)
+        # The embed last shown, edits that would not change it are skipped
+        self.rendered: Optional[dict] = None
+        self.edited_at = time.monotonic()
+        self.checked_at = time.monotonic()
+        # When the board is to be edited next, None if nothing has changed
+        self.due: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        # The room's playing_since when last shown playing, to freeze the
+        # position once it is paused
+        self.playing_since: Optional[int] = None
+        self.paused_position: Optional[int] = None
+
+
+class NowPlayingBoard:
+    """Keeps one self-updating now-playing message per channel
+
+    Room changes seen by the state mirror mark the boards of the room dirty.
+    A single task edits dirty boards, each at most once per edit interval,
+    rendering the room's latest state when the edit is made, so a burst of
+    changes costs one edit.
+    """
+
+    def __init__(
+        self,
+        interval: float = NOW_PLAYING_EDIT_INTERVAL,
+        refresh: float = NOW_PLAYING_REFRESH,
+        max_boards: int = NOW_PLAYING_MAX_BOARDS,
+    ):
+        self.interval = interval
+        self.refresh = refresh
+        self.max_boards = max_boards
+        self.changes = 0
+        self.edits = 0
+        self.unchanged = 0
+        self._boards: Dict[int, _Board] = {}
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(EDIT_CONCURRENCY)
+        self._task: Optional[asyncio.Task] = None
+        utils.api.room_state.add_listener(self._room_changed)
+
+    def __len__(self) -> int:
+        return len(self._boards)
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self._boards
+
+    def start(
+        self, channel_id: int, message: discord.Message, token: str
+    ) -> Optional[discord.Message]:
+        """Keep message updated with the token's room, returning the message it replaces"""
+        previous = self._remove(channel_id)
+        board = _Board(channel_id, message, token)
+        board.due = time.monotonic()
+        self._boards[channel_id] = board
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return previous.message if previous is not None else None
+
+    def stop(self, channel_id: int) -> Optional[discord.Message]:
+        """Stop updating the channel's message, which is returned"""
+        board = self._remove(channel_id)
+        return board.message if board is not None else None
+
+    def _remove(self, channel_id: int) -> Optional[_Board]:
+        board = self._boards.pop(channel_id, None)
+        if board is not None and board.task not in (None, asyncio.current_task()):
+            board.task.cancel()
+        return board
+
+    def _room_changed(self, room_code: str) -> None:
+        now = time.monotonic()
+        for board in self._boards.values():
+            if board.room_code != room_code:
+                continue
+            self.changes += 1
+            if board.due is None:
+                board.due = max(now, board.edited_at + self.interval)
+                self._wakeup.set()
+
+    async def _run(self) -> None:
+        while self._boards:
+            now = time.monotonic()
+            next_at = now + self.refresh
+            for board in list(self._boards.values()):
+                if board.due is None and now - board.checked_at >= self.refresh:
+                    board.due = now
+                if board.task is not None:
+                    # Picked up again once the edit in progress is done
+                    continue
+                if board.due is not None and board.due <= now:
+                    board.due = None
+                    board.task = asyncio.create_task(self._update(board))
+                    board.task.add_done_callback(self._updated)
+                elif board.due is not None:
+                    next_at = min(next_at, board.due)
+                else:
+                    next_at = min(next_at, board.checked_at + self.refresh)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=max(next_at - now, 0)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def _updated(self, task: asyncio.Task) -> None:
+        for board in self._boards.values():
+            if board.task is task:
+                board.task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Now playing update failed: {task.exception()!r}")
+        self._wakeup.set()
+
+    async def _update(self, board: _Board) -> None:
+        async with self._semaphore:
+            # Keeps the room's hub subscription from going idle
+            hub.watch(board.token)
+            try:
+                room = await utils.api.get_room_snapshot(
+                    board.token, max_age=self.refresh
+                )
+                embed = await self.render(board, room)
+            except ApiError as e:
+                board.checked_at = time.monotonic()
+                if e.status_code in (401, 403, 404):
+                    logger.info(
+                        f"Stopping now playing in {board.channel_id}: {e.title}"
+                    )
+                    self._remove(board.channel_id)
+                else:
+                    logger.debug(f"Now playing in {board.channel_id} not updated: {e}")
+                return
+        board.checked_at = time.monotonic()
+
+        rendered = embed.to_dict()
+        if rendered == board.rendered:
+            self.unchanged += 1
+            return
+        try:
+            # Paced by the outbox, after replies to commands in the channel
+            await outbox.edit(
+                board.message, Priority.BACKGROUND, content=None, embed=embed
+            )
+        except (discord.NotFound, discord.Forbidden):
+            # The message was deleted or the channel is no longer visible
+            self._remove(board.channel_id)
+            return
+        board.rendered = rendered
+        board.edited_at = time.monotonic()
+        self.edits += 1
+
+    async def render(self, board: _Board, room: RoomSnapshot) -> discord.Embed:
+        if room.is_paused:
+            if board.playing_since is not None and board.paused_position is None:
+                board.paused_position = int(time.time() * 1000) - board.playing_since
+        else:
+            board.playing_since = room.playing_since
+            board.paused_position = None
+
+        flags: List[str] = ["⏸️ Paused" if room.is_paused else "▶️ Playing"]
+        if room.is_looping:
+            flags.append("🔁 Looping")
+        if room.is_shuffled:
+            flags.append("🔀 Shuffled")
+
+        embed = discord.Embed(title="🎵 Nothing playing", color=discord.Color.blue())
+        if room.current_track_id is not None:
+            track = await utils.api.get_track(board.token, room.current_track_id)
+            if track and "title" in track:
+                embed.title = f"🎵 {track['title'][:250]}"
+                embed.url = track.get("webpage_url")
+                embed.description = track.get("uploader")
+            embed.set_thumbnail(
+                url=f"{API_BASE_URL_PROD}/api/track/{room.current_track_id}/thumbnail-high"
+            )
+
+        embed.add_field(name="Status", value=" · ".join(flags), inline=False)
+        if not room.is_paused and room.playing_since is not None:
+            # Discord counts the relative time up by itself, no edits needed
+            embed.add_field(
+                name="Position",
+                value=f"Started <t:{room.playing_since // 1000}:R>",
+                inline=True,
+            )
+        elif room.is_paused and board.paused_position is not None:
+            minutes, seconds = divmod(max(board.paused_position, 0) // 1000, 60)
+            embed.add_field(
+                name="Position", value=f"Paused at {minutes}:{seconds:02d}", inline=True
+            )
+        if room.current_rank is not None:
+            embed.add_field(
+                name="Queue", value=f"#{room.current_rank} of {len(room)}", inline=True
+            )
+        code = room.room_code if len(room.room_code) == 6 else "Embedded"
+        embed.set_footer(text=f"Room: {code} · Updates automatically")
+        return embed
+
+    async def close(self) -> None:
+        tasks = [board.task for board in self._boards.values() if board.task]
+        self._boards.clear()
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "boards": len(self._boards),
+            "changes": self.changes,
+            "edits": self.edits,
+            "unchanged": self.unchanged,
+        }
+
+
+now_playing = NowPlayingBoard()
+
+metrics.registry.register_stats(
+    "now_playing",
+    "Now playing messages, the room changes they saw and the edits made",
+    now_playing.stats,
+)
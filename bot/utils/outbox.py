@@ -0,0 +1,355 @@
+import asyncio
+import time
+from collections import deque
+from enum import IntEnum
+
+import discord
+
+import utils.metrics as metrics
+from utils.config import (
+    OUTBOX_CHANNEL_BURST,
+    OUTBOX_CHANNEL_PERIOD,
+    OUTBOX_MERGE_MAX_LENGTH,
+)
+from utils.logger import logger
+from utils.resilience import TokenBucket
+
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+# Longest message Discord accepts
+MAX_CONTENT_LENGTH = 2000
+# Send options that don't stop a message from being merged with the next one,
+# as long as both have the same reference, mention_author and allowed_mentions
+_MERGEABLE_OPTIONS = {"content", "reference", "mention_author", "allowed_mentions"}
+
+
+class Priority(IntEnum):
+    """Lower values are sent first"""
+
+    # Replies to commands, someone is waiting for them
+    INTERACTIVE = 0
+    # Progress and now-playing edits, only the latest state matters
+    BACKGROUND = 1
+
+
+class _Job:
+    __slots__ = (
+        "route",
+        "action",
+        "kwargs",
+        "priority",
+        "queued_at",
+        "futures",
+        "mergeable",
+        "message_id",
+    )
+
+    def __init__(
+        self,
+        route: str,
+        action: Callable[..., Awaitable[Any]],
+        kwargs: Dict[str, Any],
+        priority: Priority,
+        merge: bool = False,
+        message_id: Optional[int] = None,
+    ):
+        self.route = route
+        self.action = action
+        self.kwargs = kwargs
+        self.priority = priority
+        self.queued_at = time.monotonic()
+        # Jobs merged into this one share its result
+        self.futures: List[asyncio.Future] = [
+            asyncio.get_running_loop().create_future()
+        ]
+        # Short replies with nothing but text, judged before anything is merged in
+        content = kwargs.get("content")
+        self.mergeable = (
+            merge
+            and route == "send"
+            and bool(content)
+            and len(content) <= OUTBOX_MERGE_MAX_LENGTH
+            and all(
+                not value
+                for name, value in kwargs.items()
+                if name not in _MERGEABLE_OPTIONS
+            )
+        )
+        # The message an edit is for, a later edit of it replaces this one
+        self.message_id = message_id
+
+    def merge(self, other: "_Job") -> bool:
+        """Append a later reply's content to this one if it fits in one message"""
+        if self.action != other.action or not (self.mergeable and other.mergeable):
+            return False
+        # Each reply has to stay a reply to its own message
+        if _reference_key(self.kwargs.get("reference")) != _reference_key(
+            other.kwargs.get("reference")
+        ):
+            return False
+        if any(
+            self.kwargs.get(name) != other.kwargs.get(name)
+            for name in ("mention_author", "allowed_mentions")
+        ):
+            return False
+        content = f"{self.kwargs['content']}\n{other.kwargs['content']}"
+        if len(content) > MAX_CONTENT_LENGTH:
+            return False
+        self.kwargs["content"] = content
+        self.futures.extend(other.futures)
+        return True
+
+    def supersede(self, other: "_Job") -> None:
+        """Take over an earlier queued edit of the same message, whose changes it overrides"""
+        self.kwargs = {**other.kwargs, **self.kwargs}
+        self.futures.extend(other.futures)
+        self.queued_at = other.queued_at
+
+
+class _ChannelQueue:
+    __slots__ = ("jobs", "buckets", "worker", "wakeup")
+
+    def __init__(self):
+        self.jobs: Dict[Priority, Deque[_Job]] = {
+            priority: deque() for priority in Priority
+        }
+        # Discord limits sending and editing messages separately per channel
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.worker: Optional[asyncio.Task] = None
+        # Set when a job is queued while the worker waits
+        self.wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return sum(len(jobs) for jobs in self.jobs.values())
+
+    def peek(self) -> Optional[_Job]:
+        for priority in Priority:
+            if self.jobs[priority]:
+                return self.jobs[priority][0]
+        return None
+
+    def bucket(self, route: str) -> TokenBucket:
+        bucket = self.buckets.get(route)
+        if bucket is None:
+            bucket = self.buckets[route] = TokenBucket(
+                OUTBOX_CHANNEL_BURST, OUTBOX_CHANNEL_PERIOD
+            )
+        return bucket
+
+    def pop_edit(self, message_id: int) -> Optional[_Job]:
+        """Remove and return the queued edit of a message, if there is one"""
+        for jobs in self.jobs.values():
+            for job in jobs:
+                if job.message_id == message_id:
+                    jobs.remove(job)
+                    return job
+        return None
+
+    def refill_delay(self) -> float:
+        """Seconds until every bucket is full again, and can be forgotten"""
+        return max((bucket.until_full() for bucket in self.buckets.values()), default=0)
+
+    async def wait(self, timeout: float) -> None:
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class Outbox:
+    """Sends and edits every message of the bot through per-channel queues
+
+    Each channel's queue is drained by one task that paces requests to stay
+    within the channel's rate limits, takes interactive replies before
+    background edits, merges short replies that queued up behind each
+    other into one message and lets a later edit of a message replace the one
+    still queued for it.
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.merged = 0
+        self.superseded = 0
+        self.rate_limited = 0
+        self._channels: Dict[int, _ChannelQueue] = {}
+
+    async def send(
+        self,
+        channel: discord.abc.Messageable,
+        priority: Priority = Priority.INTERACTIVE,
+        *,
+        merge: bool = True,
+        **kwargs: Any,
+    ) -> discord.Message:
+        """Send a message to the channel, with the options of Messageable.send
+
+        A short text-only message may be merged with other replies to the same
+        message, so pass merge=False for messages that are edited later.
+        """
+        return await self._submit(
+            _channel_id(channel), _Job("send", channel.send, kwargs, priority, merge)
+        )
+
+    async def edit(
+        self,
+        message: discord.Message,
+        priority: Priority = Priority.BACKGROUND,
+        **kwargs: Any,
+    ) -> discord.Message:
+        """Edit a message the bot sent, with the options of Message.edit
+
+        An edit still queued for the message is replaced by this one, so the
+        last edit submitted is the one that shows, whatever the priorities.
+        """
+        return await self._submit(
+            _channel_id(message.channel),
+            _Job("edit", message.edit, kwargs, priority, message_id=message.id),
+        )
+
+    async def _submit(self, channel_id: int, job: _Job) -> Any:
+        future = job.futures[0]
+        queue = self._channels.get(channel_id)
+        if queue is None:
+            queue = self._channels[channel_id] = _ChannelQueue()
+        if job.message_id is not None:
+            previous = queue.pop_edit(job.message_id)
+            if previous is not None:
+                job.supersede(previous)
+                queue_depth.dec()
+                self.superseded += 1
+        jobs = queue.jobs[job.priority]
+        if not (jobs and jobs[-1].merge(job)):
+            jobs.append(job)
+            queue_depth.inc()
+        else:
+            self.merged += 1
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.create_task(self._drain(channel_id, queue))
+        else:
+            queue.wakeup.set()
+        return await future
+
+    async def _drain(self, channel_id: int, queue: _ChannelQueue) -> None:
+        try:
+            while True:
+                job = queue.peek()
+                if job is None:
+                    # The buckets have to outlive the burst that emptied them
+                    refill = queue.refill_delay()
+                    if refill <= 0:
+                        return
+                    await queue.wait(refill)
+                    continue
+                bucket = queue.bucket(job.route)
+                delay = bucket.delay()
+                if delay > 0:
+                    # A more urgent job may arrive meanwhile, so look again after
+                    await queue.wait(delay)
+                    continue
+                queue.jobs[job.priority].popleft()
+                queue_depth.dec()
+                if all(future.done() for future in job.futures):
+                    # Everyone waiting for it was cancelled
+                    continue
+                bucket.take()
+                await self._run(queue, job)
+        finally:
+            if self._channels.get(channel_id) is queue and not len(queue):
+                del self._channels[channel_id]
+
+    async def _run(self, queue: _ChannelQueue, job: _Job) -> None:
+        delay_seconds.observe(
+            time.monotonic() - job.queued_at, job.priority.name.lower()
+        )
+        try:
+            result = await job.action(**job.kwargs)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self.rate_limited += 1
+                retry_after = getattr(e, "retry_after", None) or OUTBOX_CHANNEL_PERIOD
+                logger.debug(
+                    f"Outbox rate limited on {job.route}, retrying in {retry_after}s"
+                )
+                queue.bucket(job.route).block(retry_after)
+                if job.message_id is not None:
+                    # The message may have been edited again meanwhile
+                    newer = queue.pop_edit(job.message_id)
+                    if newer is not None:
+                        newer.supersede(job)
+                        job = newer
+                        queue_depth.dec()
+                queue.jobs[job.priority].appendleft(job)
+                queue_depth.inc()
+                return
+            _settle(job, exception=e)
+            return
+        except Exception as e:
+            _settle(job, exception=e)
+            return
+        self.sent += 1
+        _settle(job, result=result)
+
+    async def close(self) -> None:
+        queues = list(self._channels.values())
+        self._channels.clear()
+        workers = [queue.worker for queue in queues if queue.worker is not None]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for queue in queues:
+            for jobs in queue.jobs.values():
+                for job in jobs:
+                    for future in job.futures:
+                        future.cancel()
+        queue_depth.value = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._channels),
+            "queued": sum(len(queue) for queue in self._channels.values()),
+            "sent": self.sent,
+            "merged": self.merged,
+            "superseded": self.superseded,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def _channel_id(channel: Any) -> int:
+    # Contexts and other messageables without an ID of their own share a queue by object
+    return getattr(channel, "id", None) or id(channel)
+
+
+def _reference_key(reference: Any) -> Optional[tuple]:
+    # References are created per reply, so they are compared by what they point to
+    if reference is None:
+        return None
+    return (getattr(reference, "channel_id", None), getattr(reference, "message_id", None))
+
+
+def _settle(job: _Job, result: Any = None, exception: Optional[BaseException] = None):
+    for future in job.futures:
+        if future.done():
+            continue
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+
+queue_depth = metrics.registry.gauge(
+    "outbox_queue_depth", "Messages waiting in the per-channel outbox queues"
+)
+delay_seconds = metrics.registry.histogram(
+    "outbox_delay_seconds",
+    "Time messages waited in the outbox before being sent or edited",
+    ("priority",),
+)
+
+outbox = Outbox()
+
+metrics.registry.register_stats(
+    "outbox",
+    "Messages sent, merged, superseded and rate limited by the outbox",
+    outbox.stats,
+)
@@ -0,0 +1,114 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+
+from utils.config import PROFILE_DIR
+
+from typing import List, Optional, Tuple
+
+# Only one CPU capture may run at a time, the profiler hooks the whole thread
+_profile_lock = asyncio.Lock()
+# Previous tracemalloc snapshot, diffed against by the next one
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+# Snapshots are taken one at a time so each is diffed against the one before
+_memory_lock = asyncio.Lock()
+
+
+class ProfilingError(Exception):
+    pass
+
+
+def _output_path(kind: str, extension: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(PROFILE_DIR, f"{kind}-{timestamp}.{extension}")
+
+
+async def profile_cpu(seconds: float, top: int = 15) -> Tuple[str, str]:
+    """Profile everything the event loop runs for a while
+
+    Returns the path of the pstats dump and a summary of the functions that
+    took the most time themselves.
+    """
+    if _profile_lock.locked():
+        raise ProfilingError("A CPU profile is already being captured.")
+    async with _profile_lock:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiler or debugger is attached to the thread
+            raise ProfilingError(str(e)) from e
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+
+    # Writing and sorting the stats of a busy loop takes a while, keep the
+    # gateway heartbeat going meanwhile
+    return await asyncio.to_thread(_save_profile, profiler, top)
+
+
+def _save_profile(profiler: cProfile.Profile, top: int) -> Tuple[str, str]:
+    path = _output_path("cpu", "prof")
+    profiler.dump_stats(path)
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats(pstats.SortKey.TIME).print_stats(top)
+    return path, _stats_table(output.getvalue())
+
+
+def _stats_table(report: str) -> str:
+    # Drop pstats' preamble, keep the header line and the rows
+    lines = report.splitlines()
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith("ncalls"):
+            return "\n".join(line for line in lines[i:] if line.strip())
+    return report.strip()
+
+
+async def memory_snapshot(top: int = 10) -> Tuple[str, List[str], bool]:
+    """Snapshot the allocations traced since tracing was started
+
+    Tracing starts on the first call, so the first snapshot is the baseline.
+    Returns the path of the snapshot dump, the top allocation sites (grown
+    the most since the previous snapshot, if there was one) and whether the
+    list is a diff. The snapshot is processed off the event loop, which a
+    large heap would otherwise block for seconds.
+    """
+    async with _memory_lock:
+        return await asyncio.to_thread(_memory_snapshot, top)
+
+
+def _memory_snapshot(top: int) -> Tuple[str, List[str], bool]:
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _last_snapshot = None
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+    path = _output_path("memory", "snapshot")
+    snapshot.dump(path)
+
+    previous, _last_snapshot = _last_snapshot, snapshot
+    if previous is None:
+        sites = [str(stat) for stat in snapshot.statistics("lineno")[:top]]
+        return path, sites, False
+    diff = snapshot.compare_to(previous, "lineno")
+    return path, [str(stat) for stat in diff[:top]], True
+
+
+def stop_memory_tracing() -> bool:
+    """Stop tracing allocations, returning whether it was running"""
+    global _last_snapshot
+    _last_snapshot = None
+    if not tracemalloc.is_tracing():
+        return False
+    tracemalloc.stop()
+    return True
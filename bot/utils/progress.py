@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import discord
+
+from utils.config import PROGRESS_EDIT_INTERVAL
+from utils.logger import logger
+from utils.outbox import Priority, outbox
+
+from typing import Optional
+
+
+class ProgressMessage:
+    """A message edited in place as work progresses, at most once per interval
+
+    Updates arriving faster than that are coalesced, only the latest content
+    is shown.
+    """
+
+    def __init__(
+        self, message: discord.Message, interval: float = PROGRESS_EDIT_INTERVAL
+    ):
+        self.message = message
+        self.interval = interval
+        self._content: Optional[str] = None
+        self._edited_at = time.monotonic()
+        self._pending: Optional[asyncio.Task] = None
+
+    def update(self, content: str) -> None:
+        """Show new content, now or once the interval since the last edit has passed"""
+        self._content = content
+        if self._pending is None:
+            self._pending = asyncio.create_task(self._edit_later())
+
+    async def _edit_later(self) -> None:
+        await asyncio.sleep(
+            max(self.interval - (time.monotonic() - self._edited_at), 0)
+        )
+        self._pending = None
+        await self._edit(self._content)
+
+    async def _edit(self, content: str) -> None:
+        self._edited_at = time.monotonic()
+        try:
+            await outbox.edit(self.message, Priority.BACKGROUND, content=content)
+        except discord.HTTPException as e:
+            # Progress is best effort, the final content is what matters
+            logger.debug(f"Could not edit progress message: {e!r}")
+
+    async def finish(self, content: str) -> None:
+        """Replace the progress with the final content right away"""
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        try:
+            await outbox.edit(self.message, Priority.INTERACTIVE, content=content)
+        except discord.NotFound:
+            # The progress message was deleted, the result still has to be seen
+            await outbox.send(self.message.channel, content=content)
@@ -0,0 +1,72 @@
+from bisect import bisect_left
+
+from typing import Dict, List, Sequence, Set, Tuple
+
+# (from, to) positions in play order, as taken by the move endpoint
+Move = Tuple[int, int]
+
+
+def _longest_increasing(values: Sequence[int]) -> Set[int]:
+    """Indices into values of one longest strictly increasing subsequence"""
+    tails: List[int] = []  # smallest tail value of each subsequence length
+    tail_indices: List[int] = []
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        length = bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_indices.append(i)
+        else:
+            tails[length] = value
+            tail_indices[length] = i
+        previous[i] = tail_indices[length - 1] if length > 0 else -1
+
+    kept = set()
+    i = tail_indices[-1] if tail_indices else -1
+    while i != -1:
+        kept.add(i)
+        i = previous[i]
+    return kept
+
+
+def plan_order(order: List[int], wanted: List[int]) -> List[Move]:
+    """Moves that put the wanted items in the given relative order
+
+    order is the play order of the whole queue by item ID and wanted a subset
+    of it. Items already in the right relative order stay put, the rest are
+    moved next to their neighbour in wanted, one move each.
+    """
+    order = list(order)
+    positions: Dict[int, int] = {item_id: pos for pos, item_id in enumerate(order)}
+    wanted = [item_id for item_id in wanted if item_id in positions]
+    if len(wanted) < 2:
+        return []
+
+    kept = _longest_increasing([positions[item_id] for item_id in wanted])
+    first_kept = wanted[min(kept)]
+    moves: List[Move] = []
+    for i, item_id in enumerate(wanted):
+        if i in kept:
+            continue
+        source = order.index(item_id)
+        order.pop(source)
+        if i == 0:
+            # Nothing placed before it yet, go right before the first kept item
+            target = order.index(first_kept)
+        else:
+            target = order.index(wanted[i - 1]) + 1
+        order.insert(target, item_id)
+        if source != target:
+            moves.append((source, target))
+    return moves
+
+
+def plan_block_move(order: List[int], item_ids: List[int], to: int) -> List[Move]:
+    """Moves that place the given items as a block starting at position to
+
+    The items keep the given order, the rest of the queue keeps its order.
+    """
+    selected = set(item_ids)
+    rest = [item_id for item_id in order if item_id not in selected]
+    to = min(to, len(rest))
+    return plan_order(order, rest[:to] + list(item_ids) + rest[to:])
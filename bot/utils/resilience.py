@@ -0,0 +1,137 @@
+import contextvars
+import random
+import time
+
+from typing import Dict, Optional, Union
+
+# Monotonic time by which the current command's API calls must be done
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "api_deadline", default=None
+)
+
+
+def set_deadline(seconds: float) -> None:
+    """Give the API calls of the current task, and tasks it starts, a time budget"""
+    _deadline.set(time.monotonic() + seconds)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current deadline, or None if there is none"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff before the given retry attempt (1-based)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Fails fast after consecutive failures until the backend has had time to recover
+
+    Once open, a single probe request is let through every reset_timeout
+    seconds, and the first success closes the breaker again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now"""
+        state = self.state
+        if state == "closed":
+            return True
+        now = time.monotonic()
+        # A probe that never reported back (e.g. cancelled) doesn't block forever
+        if state == "half-open" and (
+            self._probe_started is None
+            or now - self._probe_started >= self.reset_timeout
+        ):
+            self._probe_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        probing = self._probe_started is not None
+        self._probe_started = None
+        if probing or (
+            self._opened_at is None and self.failures >= self.failure_threshold
+        ):
+            if not probing:
+                self.trips += 1
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Union[int, str]]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class TokenBucket:
+    """Allows capacity requests in a burst, refilled evenly over period seconds"""
+
+    __slots__ = ("capacity", "period", "tokens", "updated_at", "blocked_until")
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        rate = self.capacity / self.period
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """Seconds until a request may be made"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) * self.period / self.capacity)
+        return wait
+
+    def until_full(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        return max(
+            (self.capacity - self.tokens) * self.period / self.capacity,
+            self.blocked_until - now,
+        )
+
+    def take(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        """Allow no requests for a while, e.g. when the other side rate limited us anyway"""
+        self.blocked_until = time.monotonic() + seconds
+        self.tokens = 0
@@ -0,0 +1,369 @@
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+import utils.api
+from utils.api import QueueItemDto, RoomInfoDto, RoomResponse
+from utils.config import (
+    API_BASE_URL,
+    ROOM_HUB_ENABLED,
+    ROOM_HUB_IDLE_TIMEOUT,
+    ROOM_HUB_MAX_BACKOFF,
+)
+from utils.logger import logger
+
+from typing import Any, Dict, List, Optional
+
+# SignalR JSON hub protocol, see
+# https://github.com/dotnet/aspnetcore/blob/main/src/SignalR/docs/specs/HubProtocol.md
+RECORD_SEPARATOR = "\x1e"
+MESSAGE_INVOCATION = 1
+MESSAGE_COMPLETION = 3
+MESSAGE_PING = 6
+MESSAGE_CLOSE = 7
+
+# The server pings every 15 seconds and drops clients silent for 30 seconds
+PING_INTERVAL = 15
+SERVER_TIMEOUT = 30
+
+
+class HubAuthError(Exception):
+    """The hub rejected the token, retrying with it is pointless"""
+
+
+class RoomModel:
+    """In-memory room and queue of one room, updated from hub events"""
+
+    def __init__(self):
+        self.room_info: Optional[RoomInfoDto] = None
+        self.queue_items: Dict[int, QueueItemDto] = {}
+
+    @property
+    def synced(self) -> bool:
+        return self.room_info is not None
+
+    def to_room(self) -> RoomResponse:
+        return {
+            "room_info": dict(self.room_info),
+            "queue_items": list(self.queue_items.values()),
+        }
+
+    def apply(self, target: str, arguments: List[Any]) -> bool:
+        """Apply a hub event, returning False if the model needs a resync"""
+        if target == "RoomInfo":
+            room_info, queue_items = arguments
+            self.room_info = room_info
+            self.queue_items = {item["id"]: item for item in queue_items}
+            return True
+
+        handler = getattr(self, f"_on_{target}", None)
+        if handler is None or not self.synced:
+            return True
+        return handler(arguments[0])
+
+    def _play_order(self) -> List[QueueItemDto]:
+        if self.room_info["is_shuffled"]:
+            return sorted(
+                self.queue_items.values(),
+                key=lambda item: (
+                    item["shuffled_index"]
+                    if item["shuffled_index"] is not None
+                    else item["index"]
+                ),
+            )
+        return sorted(self.queue_items.values(), key=lambda item: item["index"])
+
+    def _reindex(self, items: List[QueueItemDto]) -> None:
+        shuffled = self.room_info["is_shuffled"]
+        for i, item in enumerate(items):
+            if shuffled:
+                self.queue_items[item["id"]] = {**item, "shuffled_index": i}
+            else:
+                self.queue_items[item["id"]] = {
+                    **item,
+                    "index": i,
+                    "shuffled_index": None,
+                }
+
+    def _set_current_item(self, event: dict) -> None:
+        self.room_info["current_item"] = {
+            "index": event.get("current_item_index"),
+            "shuffle_index": event.get("current_item_shuffle_index"),
+            "id": event.get("current_item_id"),
+            "track_id": event.get("current_item_track_id"),
+        }
+
+    def _on_PauseToggled(self, event: dict) -> bool:
+        self.room_info["is_paused"] = event["is_paused"]
+        self.room_info["playing_since"] = event.get("playing_since")
+        return True
+
+    def _on_LoopToggled(self, event: dict) -> bool:
+        self.room_info["is_looping"] = event["is_looping"]
+        return True
+
+    def _on_ShuffleToggled(self, event: dict) -> bool:
+        # The shuffled order is derived from a seed on the server, fetch it instead
+        if event["is_shuffled"]:
+            return False
+        self.room_info["is_shuffled"] = False
+        self._set_current_item(event)
+        for item_id, item in self.queue_items.items():
+            self.queue_items[item_id] = {**item, "shuffled_index": None}
+        return True
+
+    def _on_TrackSeeked(self, event: dict) -> bool:
+        self.room_info["playing_since"] = event.get("playing_since")
+        return True
+
+    def _on_TrackSkipped(self, event: dict) -> bool:
+        self._set_current_item(event)
+        self.room_info["playing_since"] = None
+        return True
+
+    def _on_QueueMoved(self, event: dict) -> bool:
+        items = self._play_order()
+        if event["from"] >= len(items) or event["to"] >= len(items):
+            return False
+        items.insert(event["to"], items.pop(event["from"]))
+        self._reindex(items)
+        self._set_current_item(event)
+        return True
+
+    def _on_QueueAdded(self, event: dict) -> bool:
+        self._set_current_item(event)
+        added_items = event["added_items"]
+        shuffled = self.room_info["is_shuffled"]
+        insert_index = self.room_info["current_item"][
+            "shuffle_index" if shuffled else "index"
+        ]
+        if insert_index is not None:
+            for item_id, item in self.queue_items.items():
+                if shuffled:
+                    if (
+                        item["shuffled_index"] is not None
+                        and item["shuffled_index"] > insert_index
+                    ):
+                        item = {
+                            **item,
+                            "shuffled_index": item["shuffled_index"]
+                            + len(added_items),
+                        }
+                elif item["index"] > insert_index:
+                    item = {**item, "index": item["index"] + len(added_items)}
+                self.queue_items[item_id] = item
+        for item in added_items:
+            self.queue_items[item["id"]] = item
+        return True
+
+    def _on_QueueCleared(self, event: dict) -> bool:
+        current_item = self.queue_items.get(event["current_item_id"])
+        if current_item is None:
+            return False
+        shuffled = self.room_info["is_shuffled"]
+        self.queue_items = {
+            current_item["id"]: {
+                **current_item,
+                "index": 0,
+                "shuffled_index": 0 if shuffled else None,
+            }
+        }
+        self.room_info["current_item"] = {
+            **self.room_info["current_item"],
+            "index": 0,
+            "shuffle_index": 0 if shuffled else None,
+        }
+        return True
+
+    def _on_QueueDeleted(self, event: dict) -> bool:
+        if self.queue_items.pop(event["deleted_item_id"], None) is None:
+            return False
+        self._reindex(self._play_order())
+        self._set_current_item(event)
+        return True
+
+
+class RoomSubscription:
+    """A single hub connection that keeps one room live in the state mirror"""
+
+    def __init__(self, session: aiohttp.ClientSession, base_url: str, token: str):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.room_code = utils.api.token_room_code(token)
+        self.last_used = time.monotonic()
+        self.model = RoomModel()
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def live(self) -> bool:
+        return self._ws is not None and not self._ws.closed and self.model.synced
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def done(self) -> bool:
+        return self._task is not None and self._task.done()
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                await self._connect()
+                backoff = 1.0
+                await self._receive()
+            except HubAuthError as e:
+                logger.info(f"Room hub rejected token for room {self.room_code}: {e}")
+                # The user has likely left the room, look their room up again
+                user_id = utils.api.token_user_id(self.token)
+                if user_id is not None:
+                    utils.api.invalidate_token(user_id)
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.debug(f"Room hub connection for {self.room_code} lost: {e!r}")
+            finally:
+                await self._disconnected()
+
+            if time.monotonic() - self.last_used > ROOM_HUB_IDLE_TIMEOUT:
+                logger.debug(f"Room hub subscription for {self.room_code} idle")
+                return
+            # Full jitter so that rooms don't reconnect in lockstep after an outage
+            await asyncio.sleep(random.uniform(0, backoff))
+            backoff = min(backoff * 2, ROOM_HUB_MAX_BACKOFF)
+
+    async def _connect(self) -> None:
+        headers = {"Authorization": f"Bearer {self.token}"}
+        async with self.session.post(
+            f"{self.base_url}/api/hubs/room/negotiate?negotiateVersion=1",
+            headers=headers,
+        ) as resp:
+            if resp.status in (401, 403):
+                raise HubAuthError(f"negotiate returned {resp.status}")
+            resp.raise_for_status()
+            negotiation = await resp.json()
+
+        ws_url = self.base_url.replace("http", "ws", 1) + "/api/hubs/room"
+        self._ws = await self.session.ws_connect(
+            ws_url,
+            params={"id": negotiation["connectionToken"]},
+            headers=headers,
+            heartbeat=None,
+        )
+        await self._send({"protocol": "json", "version": 1})
+        handshake = await self._ws.receive_str(timeout=SERVER_TIMEOUT)
+        error = json.loads(handshake.rstrip(RECORD_SEPARATOR)).get("error")
+        if error:
+            raise ValueError(f"Hub handshake failed: {error}")
+
+    async def _send(self, message: dict) -> None:
+        await self._ws.send_str(json.dumps(message) + RECORD_SEPARATOR)
+
+    async def _invoke(self, target: str, *arguments: Any) -> None:
+        await self._send(
+            {"type": MESSAGE_INVOCATION, "target": target, "arguments": list(arguments)}
+        )
+
+    async def _receive(self) -> None:
+        last_ping = time.monotonic()
+        while True:
+            msg = await self._ws.receive(timeout=SERVER_TIMEOUT)
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                return
+
+            for frame in msg.data.split(RECORD_SEPARATOR):
+                if not frame:
+                    continue
+                message = json.loads(frame)
+                if message["type"] == MESSAGE_CLOSE:
+                    error = message.get("error")
+                    if error and "Unauthorized" in error:
+                        raise HubAuthError(error)
+                    return
+                if message["type"] == MESSAGE_INVOCATION:
+                    await self._dispatch(message["target"], message["arguments"])
+
+            if time.monotonic() - last_ping > PING_INTERVAL:
+                await self._send({"type": MESSAGE_PING})
+                last_ping = time.monotonic()
+            if time.monotonic() - self.last_used > ROOM_HUB_IDLE_TIMEOUT:
+                return
+
+    async def _dispatch(self, target: str, arguments: List[Any]) -> None:
+        if target == "Connected":
+            # (Re)sync after connecting, events may have been missed in between
+            await self._invoke("RoomInfo")
+            return
+
+        if not self.model.apply(target, arguments):
+            logger.debug(f"Resyncing room {self.room_code} after {target}")
+            # Events are ignored until the fresh RoomInfo arrives
+            self.model = RoomModel()
+            utils.api.room_state.set_live(self.room_code, False)
+            await self._invoke("RoomInfo")
+            return
+
+        if self.model.synced:
+            utils.api.room_state.update(self.model.to_room(), live=True)
+
+    async def _disconnected(self) -> None:
+        utils.api.room_state.set_live(self.room_code, False)
+        self.model = RoomModel()
+        ws, self._ws = self._ws, None
+        if ws is not None and not ws.closed:
+            await ws.close()
+
+
+class RoomHub:
+    """Keeps hub subscriptions for the rooms the bot's users are associated with"""
+
+    def __init__(self, base_url: str = API_BASE_URL):
+        self.base_url = base_url
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._subscriptions: Dict[str, RoomSubscription] = {}
+
+    def watch(self, token: str) -> None:
+        """Subscribe to the room a token belongs to, or keep its subscription alive"""
+        if not ROOM_HUB_ENABLED:
+            return
+        room_code = utils.api.token_room_code(token)
+        if not room_code:
+            return
+
+        subscription = self._subscriptions.get(room_code)
+        if subscription is not None and not subscription.done():
+            subscription.token = token
+            subscription.last_used = time.monotonic()
+            return
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        subscription = RoomSubscription(self._session, self.base_url, token)
+        self._subscriptions[room_code] = subscription
+        subscription.start()
+
+    def is_live(self, room_code: str) -> bool:
+        subscription = self._subscriptions.get(room_code)
+        return subscription is not None and subscription.live
+
+    async def close(self) -> None:
+        subscriptions = list(self._subscriptions.values())
+        self._subscriptions.clear()
+        await asyncio.gather(*(s.stop() for s in subscriptions))
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+hub = RoomHub()
@@ -0,0 +1,141 @@
+from array import array
+
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from utils.api import QueueItemDto, RoomResponse
+
+# Stand-in for a missing shuffled_index in the integer arrays
+_NONE = -1
+
+
+class RoomSnapshot:
+    """Immutable view of a RoomResponse with O(1) queue lookups
+
+    Queue items are stored column-wise in arrays and addressed by position.
+    The play order (shuffled order while shuffle is on) is precomputed.
+    """
+
+    __slots__ = (
+        "room_code",
+        "is_paused",
+        "is_looping",
+        "is_shuffled",
+        "playing_since",
+        "current_item_id",
+        "current_track_id",
+        "current_rank",
+        "_ids",
+        "_track_ids",
+        "_indices",
+        "_shuffled_indices",
+        "_by_id",
+        "_by_index",
+        "_by_shuffled_index",
+        "_order",
+    )
+
+    def __init__(self, room: "RoomResponse"):
+        room_info = room["room_info"]
+        queue_items = room["queue_items"]
+
+        self.room_code: str = room_info["room_code"]
+        self.is_paused: bool = room_info["is_paused"]
+        self.is_looping: bool = room_info["is_looping"]
+        self.is_shuffled: bool = room_info["is_shuffled"]
+        self.playing_since: Optional[int] = room_info.get("playing_since")
+
+        self._ids = array("q", (item["id"] for item in queue_items))
+        self._track_ids: List[str] = [item["track_id"] for item in queue_items]
+        self._indices = array("q", (item["index"] for item in queue_items))
+        self._shuffled_indices = array(
+            "q",
+            (
+                _NONE if item["shuffled_index"] is None else item["shuffled_index"]
+                for item in queue_items
+            ),
+        )
+        self._by_id: Dict[int, int] = {
+            item_id: pos for pos, item_id in enumerate(self._ids)
+        }
+        self._by_index: Dict[int, int] = {
+            index: pos for pos, index in enumerate(self._indices)
+        }
+        self._by_shuffled_index: Dict[int, int] = {
+            index: pos
+            for pos, index in enumerate(self._shuffled_indices)
+            if index != _NONE
+        }
+        self._order = array(
+            "q", sorted(range(len(self._ids)), key=self.play_index)
+        )
+
+        current_item = room_info["current_item"]
+        self.current_item_id: Optional[int] = current_item["id"]
+        self.current_track_id: Optional[str] = current_item["track_id"]
+        self.current_rank: Optional[int] = self._find_current_rank(current_item)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _find_current_rank(self, current_item: dict) -> Optional[int]:
+        pos = self._by_id.get(current_item["id"])
+        if pos is None:
+            if self.is_shuffled:
+                pos = self._by_shuffled_index.get(current_item["shuffle_index"])
+            else:
+                pos = self._by_index.get(current_item["index"])
+        if pos is None:
+            return None
+        return self.rank_of(pos)
+
+    def play_index(self, pos: int) -> int:
+        """The index the server uses for the item at pos in the current mode"""
+        if self.is_shuffled and self._shuffled_indices[pos] != _NONE:
+            return self._shuffled_indices[pos]
+        return self._indices[pos]
+
+    def item(self, pos: int) -> "QueueItemDto":
+        shuffled_index = self._shuffled_indices[pos]
+        return {
+            "id": self._ids[pos],
+            "track_id": self._track_ids[pos],
+            "index": self._indices[pos],
+            "shuffled_index": None if shuffled_index == _NONE else shuffled_index,
+            "is_deleted": False,
+        }
+
+    def track_id(self, pos: int) -> str:
+        return self._track_ids[pos]
+
+    def position_by_id(self, item_id: int) -> Optional[int]:
+        return self._by_id.get(item_id)
+
+    def position_by_index(self, index: int) -> Optional[int]:
+        return self._by_index.get(index)
+
+    def position_by_shuffled_index(self, shuffled_index: int) -> Optional[int]:
+        return self._by_shuffled_index.get(shuffled_index)
+
+    def position_at_rank(self, rank: int) -> Optional[int]:
+        """Position of the item that plays rank-th, or None if out of range"""
+        if 0 <= rank < len(self._order):
+            return self._order[rank]
+        return None
+
+    def rank_of(self, pos: int) -> int:
+        """Rank of an item in play order"""
+        # Indices are kept contiguous by the server, so they are normally the rank
+        rank = self.play_index(pos)
+        if 0 <= rank < len(self._order) and self._order[rank] == pos:
+            return rank
+        return self._order.index(pos)
+
+    def item_ids(self) -> List[int]:
+        """IDs of all items in play order"""
+        return [self._ids[pos] for pos in self._order]
+
+    def page(self, start: int, stop: int) -> Iterator[Tuple[int, int]]:
+        """(rank, position) pairs of the items ranked in [start, stop)"""
+        for rank in range(max(start, 0), min(stop, len(self._order))):
+            yield rank, self._order[rank]
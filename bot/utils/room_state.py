@@ -0,0 +1,100 @@
+import time
+
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from utils.cache import LRUCache
+from utils.room_snapshot import RoomSnapshot
+
+if TYPE_CHECKING:
+    from utils.api import RoomResponse
+
+
+class _Entry:
+    __slots__ = ("room", "received_at", "live", "snapshot")
+
+    def __init__(self, room: "RoomResponse", received_at: float, live: bool):
+        self.room = room
+        self.received_at = received_at
+        # Kept up to date by a live hub subscription
+        self.live = live
+        # Built on first use, most rooms are only ever read as a whole
+        self.snapshot: Optional[RoomSnapshot] = None
+
+
+class RoomStateMirror:
+    """Last known state of each room, kept up to date from API responses and hub events"""
+
+    def __init__(self, max_age: float, maxsize: int):
+        self.max_age = max_age
+        self._rooms: LRUCache[str, _Entry] = LRUCache(maxsize)
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener with the room code whenever a room's state is updated"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def update(
+        self, room: "RoomResponse", live: Optional[bool] = None
+    ) -> "RoomResponse":
+        """Record a room received from the API and return it unchanged"""
+        room_code = room["room_info"]["room_code"]
+        if live is None:
+            previous = self._rooms.peek(room_code)
+            live = previous.live if previous is not None else False
+        self._rooms.set(room_code, _Entry(room, time.monotonic(), live))
+        for listener in self._listeners:
+            listener(room_code)
+        return room
+
+    def _fresh_entry(
+        self, room_code: str, max_age: Optional[float]
+    ) -> Optional[_Entry]:
+        entry = self._rooms.get(room_code)
+        if entry is None or entry.live:
+            return entry
+        max_age = self.max_age if max_age is None else max_age
+        if time.monotonic() - entry.received_at > max_age:
+            return None
+        return entry
+
+    def get(
+        self, room_code: str, max_age: Optional[float] = None
+    ) -> Optional["RoomResponse"]:
+        """Get the room if it is live or was received within max_age seconds"""
+        entry = self._fresh_entry(room_code, max_age)
+        return entry.room if entry is not None else None
+
+    def get_snapshot(
+        self, room_code: str, max_age: Optional[float] = None
+    ) -> Optional[RoomSnapshot]:
+        """Like get, but as an indexed snapshot that is reused until the room changes"""
+        entry = self._fresh_entry(room_code, max_age)
+        if entry is None:
+            return None
+        if entry.snapshot is None:
+            entry.snapshot = RoomSnapshot(entry.room)
+        return entry.snapshot
+
+    def is_live(self, room_code: str) -> bool:
+        entry = self._rooms.peek(room_code)
+        return entry is not None and entry.live
+
+    def set_live(self, room_code: str, live: bool) -> None:
+        entry = self._rooms.peek(room_code)
+        if entry is not None:
+            entry.live = live
+
+    def invalidate(self, room_code: str) -> None:
+        # A live room is corrected by its hub subscription
+        if not self.is_live(room_code):
+            self._rooms.pop(room_code)
+
+    def clear(self) -> None:
+        self._rooms.clear()
+
+    def stats(self) -> dict[str, int]:
+        return self._rooms.stats()
@@ -6,6 +6,8 @@ from discord.embeds import Embed
 from discord.file import File
 from discord.ui import View
 
+from utils.outbox import Priority, outbox
+
 
 async def safe_reply(
     ctx: commands.Context,
@@ -19,33 +21,32 @@ async def safe_reply(
     mention_author: bool = False,
     view: Optional[View] = None,
     suppress_embeds: bool = False,
-) -> None:
+    priority: Priority = Priority.INTERACTIVE,
+    merge: bool = True,
+) -> discord.Message:
     """
-    Try to reply to the message. If it fails (e.g., message deleted), send to the channel instead.
+    Reply to the message through the outbox in a single request. If the message was deleted, Discord sends it to the channel without the reference instead.
+    Pass merge=False for replies that are edited later, so they are never shared with another reply.
     """
-    try:
-        await ctx.reply(
-            content=content,
-            embeds=embeds,
-            files=files,
-            stickers=stickers,
-            delete_after=delete_after,
-            poll=poll,
-            view=view,
-            mention_author=mention_author,
-            suppress=suppress_embeds,
-            allowed_mentions=None,
-        )
-    except (discord.NotFound, AttributeError):
-        await ctx.send(
-            content=content,
-            embeds=embeds,
-            files=files,
-            stickers=stickers,
-            delete_after=delete_after,
-            poll=poll,
-            view=view,
-            mention_author=mention_author,
-            suppress=suppress_embeds,
-            allowed_mentions=None,
-        )
+    message = getattr(ctx, "message", None)
+    reference = (
+        message.to_reference(fail_if_not_exists=False)
+        if message is not None
+        else None
+    )
+    return await outbox.send(
+        ctx.channel,
+        priority,
+        merge=merge,
+        content=content,
+        embeds=embeds,
+        files=files,
+        stickers=stickers,
+        delete_after=delete_after,
+        poll=poll,
+        view=view,
+        reference=reference,
+        mention_author=mention_author,
+        suppress=suppress_embeds,
+        allowed_mentions=None,
+    )
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger import logger
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# SQLite caps the number of parameters of a statement
+_BATCH_SIZE = 500
+# Writes between sweeps of expired entries
+_PURGE_EVERY = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID
+"""
+
+
+class SharedCache:
+    """Key-value store in a SQLite file, shared by the worker processes of a cluster
+
+    Sits behind the in-process caches so that a track or room code fetched
+    by one worker is not fetched again by the others. Values are stored as
+    JSON with an optional expiry. Every access runs on one background
+    thread, so the event loop never waits on the disk, and any error is
+    logged and treated as a miss: the API is always the fallback.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            # Readers in one process don't block the writer in another
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, function: Callable[[sqlite3.Connection], T]) -> Optional[T]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="shared-cache"
+            )
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor, lambda: function(self._connect())
+            )
+        except (sqlite3.Error, ValueError) as e:
+            self.errors += 1
+            logger.warning(f"Shared cache at {self.path} failed: {e!r}")
+            return None
+
+    async def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """The values of the keys that are stored and not expired"""
+        keys = list(keys)
+        if not self.enabled or not keys:
+            return {}
+
+        def select(connection: sqlite3.Connection) -> Dict[str, Any]:
+            found = {}
+            now = time.time()
+            for i in range(0, len(keys), _BATCH_SIZE):
+                batch = keys[i : i + _BATCH_SIZE]
+                rows = connection.execute(
+                    f"SELECT key, value FROM entries WHERE namespace = ? "
+                    f"AND key IN ({','.join('?' * len(batch))}) "
+                    f"AND (expires_at IS NULL OR expires_at > ?)",
+                    (namespace, *batch, now),
+                )
+                found.update((key, json.loads(value)) for key, value in rows)
+            return found
+
+        found = await self._run(select) or {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        return (await self.get_many(namespace, [key])).get(key)
+
+    async def set_many(
+        self, namespace: str, items: Dict[str, Any], ttl: Optional[float] = None
+    ) -> None:
+        if not self.enabled or not items:
+            return
+        expires_at = time.time() + ttl if ttl is not None else None
+        rows: List[tuple] = [
+            (namespace, key, json.dumps(value), expires_at)
+            for key, value in items.items()
+        ]
+        previous_writes, self.writes = self.writes, self.writes + len(rows)
+        purge = previous_writes // _PURGE_EVERY != self.writes // _PURGE_EVERY
+
+        def upsert(connection: sqlite3.Connection) -> None:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", rows
+                )
+                if purge:
+                    connection.execute(
+                        "DELETE FROM entries WHERE expires_at <= ?", (time.time(),)
+                    )
+
+        await self._run(upsert)
+
+    async def set(
+        self, namespace: str, key: str, value: Any, ttl: Optional[float] = None
+    ) -> None:
+        await self.set_many(namespace, {key: value}, ttl)
+
+    async def delete(self, namespace: str, key: str) -> None:
+        if not self.enabled:
+            return
+
+        def remove(connection: sqlite3.Connection) -> None:
+            with connection:
+                connection.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                )
+
+        await self._run(remove)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+        }
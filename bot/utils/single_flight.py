@@ -0,0 +1,75 @@
+import asyncio
+
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    Optional,
+    TypeVar,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class SingleFlight(Generic[K, V]):
+    """Shares one in-flight task between concurrent callers asking for the same key
+
+    The task runs on its own, so a caller being cancelled doesn't cancel it
+    for the others waiting on it.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[K, "asyncio.Task[V]"] = {}
+        # Tasks started, and calls that joined one instead of starting their own
+        self.leaders = 0
+        self.followers = 0
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._tasks
+
+    def get(self, key: K) -> Optional["asyncio.Task[V]"]:
+        """Join the task in flight for a key, if any"""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.followers += 1
+        return task
+
+    def start(self, keys: Iterable[K], coro: Awaitable[V]) -> "asyncio.Task[V]":
+        """Run a coroutine that resolves all the given keys at once"""
+        task = asyncio.ensure_future(coro)
+        keys = list(keys)
+        for key in keys:
+            self._tasks[key] = task
+        self.leaders += 1
+
+        def done(task: asyncio.Task):
+            for key in keys:
+                if self._tasks.get(key) is task:
+                    del self._tasks[key]
+            # Waiters may all have been cancelled, don't leave the error unretrieved
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(done)
+        return task
+
+    async def do(self, key: K, factory: Callable[[], Awaitable[V]]) -> V:
+        """Await the task in flight for a key, starting it if there is none"""
+        task = self.get(key)
+        if task is None:
+            task = self.start([key], factory())
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, float]:
+        calls = self.leaders + self.followers
+        return {
+            "in_flight": len(set(self._tasks.values())),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            # Share of calls that didn't need a request of their own
+            "coalescing_ratio": self.followers / calls if calls else 0.0,
+        }
@@ -0,0 +1,398 @@
+import asyncio
+
+import discord
+
+import utils.api
+from utils.api import ApiError, UsersPage
+from utils.cache import LRUCache
+from utils.config import QUEUE_CHUNK_SIZE
+from utils.outbox import outbox
+from utils.room_snapshot import RoomSnapshot
+
+from typing import Dict, List, Optional
+
+# Pages kept per view, and for how long, so paging back and forth is instant
+PAGE_CACHE_SIZE = 8
+PAGE_CACHE_TTL = 60
+
+USER_FILTERS = {
+    "embedded": "Embedded",
+    "in_room": "In a room",
+    "banned": "Banned",
+}
+
+
+class UserPagesView(discord.ui.View):
+    """Pages through the users, fetching each page when it is first shown"""
+
+    def __init__(
+        self,
+        author_id: int,
+        filters: Dict[str, bool],
+        page_size: int,
+        timeout: float = 180,
+    ):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.filters = filters
+        # Embeds hold at most 25 fields
+        self.page_size = max(1, min(page_size, 25))
+        self.page = 0
+        self.total = 0
+        self.message: Optional[discord.Message] = None
+        self._pages: LRUCache[int, UsersPage] = LRUCache(
+            PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL
+        )
+        for option in self.filter_select.options:
+            option.default = self.filters.get(option.value, False)
+
+    @property
+    def page_count(self) -> int:
+        return max(1, (self.total + self.page_size - 1) // self.page_size)
+
+    async def fetch(self, page: int) -> UsersPage:
+        cached = self._pages.get(page)
+        if cached is not None:
+            return cached
+        users_page = await utils.api.get_users_page(
+            page * self.page_size,
+            self.page_size,
+            **{name: True for name, enabled in self.filters.items() if enabled},
+        )
+        self._pages.set(page, users_page)
+        return users_page
+
+    async def render(self) -> discord.Embed:
+        users_page = await self.fetch(self.page)
+        self.total = users_page.total
+        # The users may have changed since the page count was last known
+        if self.page >= self.page_count and self.page > 0:
+            self.page = self.page_count - 1
+            users_page = await self.fetch(self.page)
+
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+        filters = ", ".join(
+            USER_FILTERS[name] for name, enabled in self.filters.items() if enabled
+        )
+        embed = discord.Embed(
+            title=f"Users - Page {self.page + 1}/{self.page_count}",
+            description=f"Filters: {filters}" if filters else None,
+            color=discord.Color.orange(),
+        )
+        for user in users_page.users:
+            embed.add_field(
+                name=user["username"], value=_format_user(user), inline=False
+            )
+        if not users_page.users:
+            embed.add_field(name="No users", value="No users match the filters")
+        embed.set_footer(text=f"Total users: {self.total}")
+        return embed
+
+    async def show(self, interaction: discord.Interaction) -> None:
+        try:
+            embed = await self.render()
+        except ApiError as e:
+            await interaction.response.send_message(
+                f"❌ {e.title}: {e.detail or 'Could not fetch the users.'}",
+                ephemeral=True,
+            )
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user is not None and interaction.user.id == self.author_id:
+            return True
+        await interaction.response.send_message(
+            "❌ Only the user who invoked the command can use this.", ephemeral=True
+        )
+        return False
+
+    async def on_timeout(self) -> None:
+        for item in self.children:
+            item.disabled = True
+        if self.message is not None:
+            try:
+                await outbox.edit(self.message, view=self)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(label="Previous", emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(
+        self, button: discord.ui.Button, interaction: discord.Interaction
+    ):
+        self.page = max(self.page - 1, 0)
+        await self.show(interaction)
+
+    @discord.ui.button(label="Next", emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.page += 1
+        await self.show(interaction)
+
+    @discord.ui.button(label="Refresh", emoji="🔄", style=discord.ButtonStyle.secondary)
+    async def refresh(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self._pages.clear()
+        await self.show(interaction)
+
+    @discord.ui.select(
+        placeholder="Filter users",
+        min_values=0,
+        max_values=len(USER_FILTERS),
+        options=[
+            discord.SelectOption(label=label, value=name)
+            for name, label in USER_FILTERS.items()
+        ],
+    )
+    async def filter_select(
+        self, select: discord.ui.Select, interaction: discord.Interaction
+    ):
+        self.filters = {name: name in select.values for name in USER_FILTERS}
+        for option in select.options:
+            option.default = self.filters[option.value]
+        self.page = 0
+        self._pages.clear()
+        await self.show(interaction)
+
+
+class _JumpModal(discord.ui.Modal):
+    def __init__(self, view: "QueueView"):
+        super().__init__(title="Jump to page")
+        self.view = view
+        self.page_input = discord.ui.InputText(
+            label=f"Page (1-{view.page_count})", placeholder="1", max_length=6
+        )
+        self.add_item(self.page_input)
+
+    async def callback(self, interaction: discord.Interaction):
+        try:
+            page = int(self.page_input.value)
+        except (TypeError, ValueError):
+            await interaction.response.send_message(
+                "❌ Page must be a number!", ephemeral=True
+            )
+            return
+        self.view.page = min(max(page, 1), self.view.page_count) - 1
+        await self.view.show(interaction)
+
+
+class QueueView(discord.ui.View):
+    """Pages through the queue in one message
+
+    A room kept live by the RoomHub is paged from the state mirror. For
+    other rooms the view takes a snapshot when it opens: the room info once,
+    and the queue in windows of QUEUE_CHUNK_SIZE items, each read when a
+    page in it is first shown. Paging a queue of up to that many tracks costs
+    those two requests plus resolving the titles not yet cached, until the
+    refresh button takes a new snapshot.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        author_id: int,
+        page: int,
+        page_size: int = 10,
+        timeout: float = 300,
+    ):
+        super().__init__(timeout=timeout)
+        self.token = token
+        self.author_id = author_id
+        self.page = page
+        self.page_size = page_size
+        self.total = 0
+        self.current_rank: Optional[int] = None
+        self.message: Optional[discord.Message] = None
+        # Window -> track IDs in it, in play order
+        self._windows: Dict[int, List[str]] = {}
+        self._room_read = False
+
+    @property
+    def page_count(self) -> int:
+        return max(1, (self.total + self.page_size - 1) // self.page_size)
+
+    def _live_room(self) -> Optional[RoomSnapshot]:
+        # Only a live room is current, an older state would hide changes
+        room = utils.api.cached_room_snapshot(self.token, max_age=0)
+        if room is not None:
+            self.total = len(room)
+            self.current_rank = room.current_rank
+        return room
+
+    async def _read_room_info(self) -> None:
+        room_info = await utils.api.get_room_info(self.token)
+        self.current_rank = utils.api.current_rank(room_info)
+        self._room_read = True
+
+    async def _read_window(self, window: int) -> None:
+        queue_page = await utils.api.get_queue_page(
+            self.token, window * QUEUE_CHUNK_SIZE, QUEUE_CHUNK_SIZE
+        )
+        self.total = queue_page.total
+        self._windows[window] = [item["track_id"] for item in queue_page.items]
+
+    def _snapshot_ids(self, start: int, stop: int) -> List[str]:
+        """Track IDs ranked in [start, stop) from the windows read so far"""
+        track_ids = []
+        for rank in range(max(start, 0), stop):
+            window = self._windows.get(rank // QUEUE_CHUNK_SIZE)
+            offset = rank % QUEUE_CHUNK_SIZE
+            if window is not None and offset < len(window):
+                track_ids.append(window[offset])
+        return track_ids
+
+    async def fetch(self, page: int) -> List[str]:
+        """Track IDs on the page, reading its part of the queue if not read yet"""
+        start = page * self.page_size
+        stop = start + self.page_size
+        room = self._live_room()
+        if room is not None:
+            return [room.track_id(pos) for _, pos in room.page(start, stop)]
+
+        windows = range(start // QUEUE_CHUNK_SIZE, (stop - 1) // QUEUE_CHUNK_SIZE + 1)
+        reads = [
+            self._read_window(window)
+            for window in windows
+            if window not in self._windows
+        ]
+        if not self._room_read:
+            reads.append(self._read_room_info())
+        await asyncio.gather(*reads)
+        return self._snapshot_ids(start, stop)
+
+    def _neighbour_ids(self) -> List[str]:
+        start = (self.page - 1) * self.page_size
+        stop = start + 3 * self.page_size
+        room = self._live_room()
+        if room is not None:
+            return [room.track_id(pos) for _, pos in room.page(start, stop)]
+        return self._snapshot_ids(start, stop)
+
+    async def render(self) -> Optional[discord.Embed]:
+        """The embed of the current page, None if the queue is empty"""
+        self.page = max(self.page, 0)
+        track_ids = await self.fetch(self.page)
+        if not self.total:
+            return None
+        # The queue may have shrunk since the page count was last known
+        if self.page >= self.page_count:
+            self.page = self.page_count - 1
+            track_ids = await self.fetch(self.page)
+        start = self.page * self.page_size
+
+        # Resolve every title on the page in one batch and warm the neighbours
+        tracks = {
+            track["id"]: track
+            for track in await utils.api.get_tracks(self.token, track_ids)
+        }
+        utils.api.prefetch_tracks(self.token, self._neighbour_ids())
+
+        lines: List[str] = []
+        for rank, track_id in enumerate(track_ids, start):
+            marker = "▶️" if rank == self.current_rank else "🎵"
+            track = tracks.get(track_id)
+            title = track["title"] if track else f"ID: {track_id[:15]}..."
+            if len(title) > 50:
+                title = title[:47] + "..."
+            lines.append(f"{marker} **#{rank}** - {title}")
+
+        self.first_page.disabled = self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.last_page.disabled = (
+            self.page >= self.page_count - 1
+        )
+        self.jump.disabled = self.page_count == 1
+
+        embed = discord.Embed(
+            title=f"🎵 Queue - Page {self.page + 1}/{self.page_count}",
+            description=f"Total tracks: {self.total}",
+            color=discord.Color.green(),
+        )
+        embed.add_field(
+            name="Tracks", value="\n".join(lines) or "No tracks on this page", inline=False
+        )
+        return embed
+
+    async def show(self, interaction: discord.Interaction) -> None:
+        try:
+            embed = await self.render()
+        except ApiError as e:
+            await interaction.response.send_message(
+                f"❌ {e.title}: {e.detail or 'Could not fetch the queue.'}",
+                ephemeral=True,
+            )
+            return
+        if embed is None:
+            self.stop()
+            await interaction.response.edit_message(
+                content="📭 Queue is empty!", embed=None, view=None
+            )
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user is not None and interaction.user.id == self.author_id:
+            return True
+        await interaction.response.send_message(
+            "❌ Only the user who invoked the command can use this.", ephemeral=True
+        )
+        return False
+
+    async def on_timeout(self) -> None:
+        for item in self.children:
+            item.disabled = True
+        if self.message is not None:
+            try:
+                await outbox.edit(self.message, view=self)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def first_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.page = 0
+        await self.show(interaction)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(
+        self, button: discord.ui.Button, interaction: discord.Interaction
+    ):
+        self.page -= 1
+        await self.show(interaction)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.page += 1
+        await self.show(interaction)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def last_page(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self.page = self.page_count - 1
+        await self.show(interaction)
+
+    @discord.ui.button(label="Jump", style=discord.ButtonStyle.secondary)
+    async def jump(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await interaction.response.send_modal(_JumpModal(self))
+
+    @discord.ui.button(emoji="🔄", style=discord.ButtonStyle.secondary)
+    async def refresh(self, button: discord.ui.Button, interaction: discord.Interaction):
+        self._windows.clear()
+        self._room_read = False
+        await self.show(interaction)
+
+
+def _format_user(user: utils.api.UserDto) -> str:
+    created_at = int(user["created_at"] // 1000)
+    updated_at = int(user["updated_at"] // 1000)
+    text = (
+        f"User ID: {user['user_id']}\n"
+        f"Connection ID: {user['connection_id'] or 'None'}\n"
+        f"Is Embedded: {'Yes' if user['is_embedded'] else 'No'}\n"
+        f"Associated Room Code: {user['associated_room_code'] or 'None'}\n"
+        f"Created At: <t:{created_at}:F>\n"
+        f"Updated At: <t:{updated_at}:F>"
+    )
+    if user.get("banned_until"):
+        text += (
+            f"\nBanned Until: <t:{int(user['banned_until'] // 1000)}:F>"
+            f" ({user.get('banned_reason') or 'No reason'})"
+        )
+    return text
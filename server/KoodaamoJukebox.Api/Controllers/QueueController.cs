@@ -41,7 +41,11 @@ namespace KoodaamoJukebox.Api.Controllers
         }
 
         [HttpGet("items")]
-        public async Task<ActionResult<QueueItemDto[]>> GetQueueItems([FromQuery] long? start = null, [FromQuery] long? end = null)
+        public async Task<ActionResult<QueueItemDto[]>> GetQueueItems(
+            [FromQuery] long? start = null,
+            [FromQuery] long? end = null,
+            [FromQuery] int? offset = null,
+            [FromQuery] int? limit = null)
         {
             var roomCode = User.FindFirstValue("room_code");
             if (string.IsNullOrEmpty(roomCode))
@@ -51,6 +55,16 @@ namespace KoodaamoJukebox.Api.Controllers
 
             var currentTime = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds();
 
+            if (offset < 0)
+            {
+                return BadRequest("Invalid offset.");
+            }
+
+            if (limit <= 0)
+            {
+                return BadRequest("Invalid limit.");
+            }
+
             if (start.HasValue)
             {
                 if (start < 0 || start > currentTime)
@@ -87,12 +101,32 @@ namespace KoodaamoJukebox.Api.Controllers
             long startDateTime = DateTimeOffset.UnixEpoch.AddMilliseconds(start.Value).ToUnixTimeMilliseconds();
             long endDateTime = DateTimeOffset.UnixEpoch.AddMilliseconds(end.Value).ToUnixTimeMilliseconds();
 
-            var queueItems = await _dbContext.QueueItems
+            var query = _dbContext.QueueItems
             .Where(qi => qi.RoomCode == roomCode
                 && qi.UpdatedAt >= startDateTime
                 && qi.UpdatedAt <= endDateTime
-                && !qi.IsDeleted)
-            .OrderBy(qi => qi.Index)
+                && !qi.IsDeleted);
+
+            // Total number of matching items so that callers can page through them
+            var totalCount = await query.CountAsync();
+            Response.Headers["X-Total-Count"] = totalCount.ToString();
+
+            // Items are returned in play order, so offset and limit address a window of the queue
+            query = queue.IsShuffled
+                ? query.OrderBy(qi => qi.ShuffleIndex ?? qi.Index)
+                : query.OrderBy(qi => qi.Index);
+
+            if (offset.HasValue)
+            {
+                query = query.Skip(offset.Value);
+            }
+
+            if (limit.HasValue)
+            {
+                query = query.Take(limit.Value);
+            }
+
+            var queueItems = await query
             .Select(qi => new QueueItemDto(qi))
             .ToListAsync();
 
@@ -63,6 +63,26 @@ namespace KoodaamoJukebox.Api.Controllers
             });
         }
 
+        /// <summary>
+        /// Get current room information without the queue
+        /// </summary>
+        [HttpGet("info")]
+        public async Task<ActionResult<RoomInfoDto>> GetRoomInfo()
+        {
+            var roomCode = GetRoomCodeFromClaims();
+
+            var roomInfo = await _dbContext.RoomInfos
+                .Where(q => q.RoomCode == roomCode)
+                .FirstOrDefaultAsync();
+
+            if (roomInfo == null)
+            {
+                return NotFound("Room not found.");
+            }
+
+            return Ok(new RoomInfoDto(roomInfo));
+        }
+
         /// <summary>
         /// Toggle pause state
         /// </summary>
@@ -159,6 +179,27 @@ namespace KoodaamoJukebox.Api.Controllers
             return await GetRoom();
         }
 
+        /// <summary>
+        /// Make several moves in order, each relative to the queue the previous one left
+        /// </summary>
+        [HttpPost("move/batch")]
+        public async Task<ActionResult<RoomResponse>> MoveBatch([FromBody] TimestampedMoveBatchRequest request)
+        {
+            var roomCode = GetRoomCodeFromClaims();
+
+            if (request.Moves.Any(m => m.From < 0 || m.To < 0))
+            {
+                return BadRequest("Indices must be non-negative.");
+            }
+
+            foreach (var move in request.Moves)
+            {
+                await _queueService.Move(roomCode, move.From, move.To);
+            }
+
+            return await GetRoom();
+        }
+
         /// <summary>
         /// Add a track to the queue
         /// </summary>
@@ -172,9 +213,14 @@ namespace KoodaamoJukebox.Api.Controllers
                 return BadRequest("URL/Query cannot be empty.");
             }
 
-            await _queueService.Add(roomCode, request.Value);
+            var addedItems = await _queueService.Add(roomCode, request.Value);
 
-            return await GetRoom();
+            var response = await GetRoom();
+            if (response.Result is OkObjectResult { Value: RoomResponse room })
+            {
+                room.AddedItems = addedItems;
+            }
+            return response;
         }
 
         /// <summary>
@@ -190,6 +236,35 @@ namespace KoodaamoJukebox.Api.Controllers
             return await GetRoom();
         }
 
+        /// <summary>
+        /// Delete several tracks from the queue by ID, reporting the ones that could not be deleted
+        /// </summary>
+        [HttpPost("delete/batch")]
+        public async Task<ActionResult<RoomResponse>> DeleteBatch([FromBody] TimestampedIntListRequest request)
+        {
+            var roomCode = GetRoomCodeFromClaims();
+
+            var failedItems = new List<FailedItemDto>();
+            foreach (var itemId in request.Values.Distinct())
+            {
+                try
+                {
+                    await _queueService.Delete(roomCode, itemId);
+                }
+                catch (Exception ex) when (ex is ArgumentException || ex is InvalidOperationException)
+                {
+                    failedItems.Add(new FailedItemDto { ItemId = itemId, Error = ex.Message });
+                }
+            }
+
+            var response = await GetRoom();
+            if (response.Result is OkObjectResult { Value: RoomResponse room })
+            {
+                room.FailedItems = failedItems;
+            }
+            return response;
+        }
+
         /// <summary>
         /// Clear the queue
         /// </summary>
@@ -231,10 +306,38 @@ namespace KoodaamoJukebox.Api.Controllers
         public int To { get; set; }
     }
 
+    public class MoveDto
+    {
+        public int From { get; set; }
+        public int To { get; set; }
+    }
+
+    public class TimestampedMoveBatchRequest
+    {
+        public long SentAt { get; set; }
+        public List<MoveDto> Moves { get; set; } = new();
+    }
+
+    public class TimestampedIntListRequest
+    {
+        public long SentAt { get; set; }
+        public List<int> Values { get; set; } = new();
+    }
+
+    public class FailedItemDto
+    {
+        public int ItemId { get; set; }
+        public string Error { get; set; } = string.Empty;
+    }
+
     // Response DTO
     public class RoomResponse
     {
         public RoomInfoDto RoomInfo { get; set; } = null!;
         public List<QueueItemDto> QueueItems { get; set; } = new();
+        // Only set by add, the items it inserted
+        public List<QueueItemDto>? AddedItems { get; set; }
+        // Only set by delete/batch, the items it could not delete
+        public List<FailedItemDto>? FailedItems { get; set; }
     }
 }
@@ -30,9 +30,63 @@ namespace KoodaamoJukebox.Api.Controllers
         }
 
         [HttpGet]
-        public async Task<ActionResult<IEnumerable<UserDto>>> GetAllUsers()
+        public async Task<ActionResult<IEnumerable<UserDto>>> GetAllUsers(
+            [FromQuery] int? offset = null,
+            [FromQuery] int? limit = null,
+            [FromQuery] bool? embedded = null,
+            [FromQuery] bool? inRoom = null,
+            [FromQuery] bool? banned = null)
         {
-            var users = await _dbContext.Users
+            if (offset < 0)
+            {
+                return BadRequest("Invalid offset.");
+            }
+
+            if (limit <= 0)
+            {
+                return BadRequest("Invalid limit.");
+            }
+
+            var query = _dbContext.Users.AsQueryable();
+
+            if (embedded.HasValue)
+            {
+                query = query.Where(u => u.IsEmbedded == embedded.Value);
+            }
+
+            if (inRoom.HasValue)
+            {
+                query = inRoom.Value
+                    ? query.Where(u => u.AssociatedRoomCode != null)
+                    : query.Where(u => u.AssociatedRoomCode == null);
+            }
+
+            if (banned.HasValue)
+            {
+                var currentTime = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds();
+                query = banned.Value
+                    ? query.Where(u => u.BannedUntil != null && u.BannedUntil > currentTime)
+                    : query.Where(u => u.BannedUntil == null || u.BannedUntil <= currentTime);
+            }
+
+            // Total number of matching users so that callers can page through them
+            var totalCount = await query.CountAsync();
+            Response.Headers["X-Total-Count"] = totalCount.ToString();
+
+            // A stable order so that offset and limit address consistent pages
+            query = query.OrderBy(u => u.Id);
+
+            if (offset.HasValue)
+            {
+                query = query.Skip(offset.Value);
+            }
+
+            if (limit.HasValue)
+            {
+                query = query.Take(limit.Value);
+            }
+
+            var users = await query
                 .Select(u => new UserDto(u))
                 .ToListAsync();
             return Ok(users);
@@ -8,7 +8,7 @@ using System.Security.Claims;
 
 namespace KoodaamoJukebox.Api.Hubs
 {
-    [Authorize(Policy = "ClientOnly")]
+    [Authorize(Policy = "ClientOrBot")]
     [Authorize(Policy = "ConnectedUserData")]
     public class RoomHub : Hub
     {
@@ -59,8 +59,28 @@ namespace KoodaamoJukebox.Api.Hubs
             return await next(context);
         }
 
+        private bool IsBotConnection()
+        {
+            return Context.User?.FindFirstValue("iss") == "bot-KoodaamoJukebox";
+        }
+
         public override async Task OnConnectedAsync()
         {
+            if (IsBotConnection())
+            {
+                // The bot only observes rooms on behalf of its users, so it must not
+                // take over the ConnectionId of the user's own client
+                var botRoomCode = Context.User?.FindFirstValue("room_code");
+                if (string.IsNullOrEmpty(botRoomCode))
+                {
+                    throw new UnauthorizedAccessException("RoomCode not found in user claims.");
+                }
+                await base.OnConnectedAsync();
+                await Groups.AddToGroupAsync(Context.ConnectionId, botRoomCode);
+                await Clients.Caller.SendAsync("Connected");
+                return;
+            }
+
             if (!long.TryParse(Context.User?.FindFirstValue("user_id"), out long userId))
             {
                 throw new UnauthorizedAccessException("UserId not found in user claims.");
@@ -86,6 +106,12 @@ namespace KoodaamoJukebox.Api.Hubs
 
         public override async Task OnDisconnectedAsync(Exception? exception)
         {
+            if (IsBotConnection())
+            {
+                await base.OnDisconnectedAsync(exception);
+                return;
+            }
+
             // Try to find user by user_id or by connectionId
             var user = await _dbContext.Users.Where(u => u.ConnectionId == Context.ConnectionId).FirstOrDefaultAsync();
             if (user == null)
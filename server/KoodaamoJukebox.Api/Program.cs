@@ -146,6 +146,10 @@ namespace KoodaamoJukebox.Api
                 {
                     policy.RequireClaim("iss", "server-KoodaamoJukebox");
                 });
+                options.AddPolicy("ClientOrBot", policy =>
+                {
+                    policy.RequireClaim("iss", "server-KoodaamoJukebox", "bot-KoodaamoJukebox");
+                });
             });
 
             builder.Services.AddTransient<Middlewares.GlobalExceptionHandlerMiddleware>();
@@ -286,7 +286,7 @@ namespace KoodaamoJukebox.Api.Services
             });
         }
 
-        public async Task Add(string roomCode, string urlOrQuery)
+        public virtual async Task<List<QueueItemDto>> Add(string roomCode, string urlOrQuery)
         {
 
             if (string.IsNullOrWhiteSpace(urlOrQuery))
@@ -459,6 +459,8 @@ namespace KoodaamoJukebox.Api.Services
                 CurrentItemId = roomInfo.CurrentItemId,
                 CurrentItemTrackId = roomInfo.CurrentItemTrackId
             });
+
+            return addedItems;
         }
 
         public async Task Shuffle(string roomCode, bool shuffled)
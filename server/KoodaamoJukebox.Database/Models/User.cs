@@ -45,6 +45,8 @@ namespace KoodaamoJukebox.Database.Models
             UpdatedAt = user.UpdatedAt;
             IsEmbedded = user.IsEmbedded;
             ConnectionId = user.ConnectionId;
+            BannedUntil = user.BannedUntil;
+            BannedReason = user.BannedReason;
         }
 
         public long UserId { get; set; }
@@ -54,5 +56,7 @@ namespace KoodaamoJukebox.Database.Models
         public bool IsEmbedded { get; set; }
         public long CreatedAt { get; set; }
         public long UpdatedAt { get; set; }
+        public long? BannedUntil { get; set; }
+        public string? BannedReason { get; set; }
     }
 }
@@ -0,0 +1,163 @@
+using KoodaamoJukebox.Api.Controllers;
+using KoodaamoJukebox.Api.Hubs;
+using KoodaamoJukebox.Api.Services;
+using KoodaamoJukebox.Database;
+using KoodaamoJukebox.Database.Models;
+using Microsoft.AspNetCore.Http;
+using Microsoft.AspNetCore.Mvc;
+using Microsoft.AspNetCore.SignalR;
+using Microsoft.EntityFrameworkCore;
+using Microsoft.Extensions.Configuration;
+using Moq;
+using Xunit;
+using System.Collections.Generic;
+using System.Linq;
+using System.Security.Claims;
+using System.Threading.Tasks;
+
+namespace KoodaamoJukebox.Api.Tests
+{
+    public class QueueControllerTests : IDisposable
+    {
+        private readonly KoodaamoJukeboxDbContext _dbContext;
+        private readonly QueueController _controller;
+        private readonly string _roomCode = "test-room";
+
+        public QueueControllerTests()
+        {
+            var options = new DbContextOptionsBuilder<KoodaamoJukeboxDbContext>()
+                .UseInMemoryDatabase(databaseName: Guid.NewGuid().ToString())
+                .Options;
+            _dbContext = new KoodaamoJukeboxDbContext(options);
+
+            var hubContextMock = new Mock<IHubContext<RoomHub>>();
+            var clientsMock = new Mock<IHubClients>();
+            clientsMock.Setup(c => c.Group(It.IsAny<string>())).Returns(new Mock<IClientProxy>().Object);
+            hubContextMock.Setup(h => h.Clients).Returns(clientsMock.Object);
+
+            var configurationMock = new Mock<IConfiguration>();
+            configurationMock.Setup(c => c["YtDlp:Path"]).Returns("yt-dlp");
+            configurationMock.Setup(c => c["YouTube:ApiKey"]).Returns("test-api-key");
+
+            var queueService = new QueueService(_dbContext, hubContextMock.Object, configurationMock.Object);
+            _controller = new QueueController(_dbContext, queueService)
+            {
+                ControllerContext = new ControllerContext
+                {
+                    HttpContext = new DefaultHttpContext
+                    {
+                        User = new ClaimsPrincipal(new ClaimsIdentity(new[] { new Claim("room_code", _roomCode) }, "Test"))
+                    }
+                }
+            };
+
+            SetupInitialData().Wait();
+        }
+
+        private async Task SetupInitialData()
+        {
+            await _dbContext.RoomInfos.AddAsync(new RoomInfo
+            {
+                RoomCode = _roomCode,
+                IsEmbedded = false,
+                IsPaused = true,
+                IsLooping = false,
+                IsShuffled = false,
+                CurrentItemIndex = 0,
+                CurrentItemShuffleIndex = null,
+                CurrentItemId = 1,
+                CurrentItemTrackId = "track1-hash",
+                PlayingSince = null,
+                PausedAt = null
+            });
+
+            // Stored out of order, with shuffle indices that reverse the queue
+            var queueItems = new List<QueueItem>
+            {
+                new QueueItem { Id = 3, RoomCode = _roomCode, WebpageUrlHash = "track3-hash", Index = 2, ShuffleIndex = 2, IsDeleted = false },
+                new QueueItem { Id = 1, RoomCode = _roomCode, WebpageUrlHash = "track1-hash", Index = 0, ShuffleIndex = 4, IsDeleted = false },
+                new QueueItem { Id = 5, RoomCode = _roomCode, WebpageUrlHash = "track5-hash", Index = 4, ShuffleIndex = 0, IsDeleted = false },
+                new QueueItem { Id = 2, RoomCode = _roomCode, WebpageUrlHash = "track2-hash", Index = 1, ShuffleIndex = 3, IsDeleted = false },
+                new QueueItem { Id = 4, RoomCode = _roomCode, WebpageUrlHash = "track4-hash", Index = 3, ShuffleIndex = 1, IsDeleted = false },
+                new QueueItem { Id = 6, RoomCode = _roomCode, WebpageUrlHash = "track6-hash", Index = 5, ShuffleIndex = null, IsDeleted = true }
+            };
+            await _dbContext.QueueItems.AddRangeAsync(queueItems);
+
+            await _dbContext.SaveChangesAsync();
+        }
+
+        public void Dispose()
+        {
+            _dbContext.Dispose();
+        }
+
+        private static List<int> ItemIds(ActionResult<QueueItemDto[]> result)
+        {
+            var ok = Assert.IsType<OkObjectResult>(result.Result);
+            var items = Assert.IsAssignableFrom<IEnumerable<QueueItemDto>>(ok.Value);
+            return items.Select(i => i.Id).ToList();
+        }
+
+        [Fact]
+        public async Task GetQueueItems_ShouldReturnAllItemsInPlayOrder()
+        {
+            // Act
+            var result = await _controller.GetQueueItems();
+
+            // Assert
+            Assert.Equal(new List<int> { 1, 2, 3, 4, 5 }, ItemIds(result));
+            Assert.Equal("5", _controller.Response.Headers["X-Total-Count"].ToString());
+        }
+
+        [Fact]
+        public async Task GetQueueItems_WithOffsetAndLimit_ShouldReturnWindow()
+        {
+            // Act
+            var result = await _controller.GetQueueItems(offset: 1, limit: 2);
+
+            // Assert
+            Assert.Equal(new List<int> { 2, 3 }, ItemIds(result));
+            // The total counts the whole queue, not the window
+            Assert.Equal("5", _controller.Response.Headers["X-Total-Count"].ToString());
+        }
+
+        [Fact]
+        public async Task GetQueueItems_WhenShuffled_ShouldPageInShuffledOrder()
+        {
+            // Arrange
+            var roomInfo = await _dbContext.RoomInfos.FirstAsync(r => r.RoomCode == _roomCode);
+            roomInfo.IsShuffled = true;
+            await _dbContext.SaveChangesAsync();
+
+            // Act
+            var result = await _controller.GetQueueItems(offset: 0, limit: 3);
+
+            // Assert
+            Assert.Equal(new List<int> { 5, 4, 3 }, ItemIds(result));
+        }
+
+        [Fact]
+        public async Task GetQueueItems_WithOffsetPastEnd_ShouldReturnEmptyWindow()
+        {
+            // Act
+            var result = await _controller.GetQueueItems(offset: 10, limit: 5);
+
+            // Assert
+            Assert.Empty(ItemIds(result));
+            Assert.Equal("5", _controller.Response.Headers["X-Total-Count"].ToString());
+        }
+
+        [Theory]
+        [InlineData(-1, null)]
+        [InlineData(null, 0)]
+        [InlineData(0, -5)]
+        public async Task GetQueueItems_WithInvalidWindow_ShouldReturnBadRequest(int? offset, int? limit)
+        {
+            // Act
+            var result = await _controller.GetQueueItems(offset: offset, limit: limit);
+
+            // Assert
+            Assert.IsType<BadRequestObjectResult>(result.Result);
+        }
+    }
+}
@@ -0,0 +1,242 @@
+using KoodaamoJukebox.Api.Controllers;
+using KoodaamoJukebox.Api.Hubs;
+using KoodaamoJukebox.Api.Services;
+using KoodaamoJukebox.Database;
+using KoodaamoJukebox.Database.Models;
+using Microsoft.AspNetCore.Http;
+using Microsoft.AspNetCore.Mvc;
+using Microsoft.AspNetCore.SignalR;
+using Microsoft.EntityFrameworkCore;
+using Microsoft.Extensions.Configuration;
+using Microsoft.Extensions.Logging.Abstractions;
+using Moq;
+using Xunit;
+using System.Collections.Generic;
+using System.Linq;
+using System.Security.Claims;
+using System.Threading.Tasks;
+
+namespace KoodaamoJukebox.Api.Tests
+{
+    public class RoomControllerTests : IDisposable
+    {
+        private readonly KoodaamoJukeboxDbContext _dbContext;
+        private readonly Mock<QueueService> _queueServiceMock;
+        private readonly string _roomCode = "test-room";
+
+        public RoomControllerTests()
+        {
+            var options = new DbContextOptionsBuilder<KoodaamoJukeboxDbContext>()
+                .UseInMemoryDatabase(databaseName: Guid.NewGuid().ToString())
+                .Options;
+            _dbContext = new KoodaamoJukeboxDbContext(options);
+
+            var hubContextMock = new Mock<IHubContext<RoomHub>>();
+            var clientsMock = new Mock<IHubClients>();
+            clientsMock.Setup(c => c.Group(It.IsAny<string>())).Returns(new Mock<IClientProxy>().Object);
+            hubContextMock.Setup(h => h.Clients).Returns(clientsMock.Object);
+
+            var configurationMock = new Mock<IConfiguration>();
+            configurationMock.Setup(c => c["YtDlp:Path"]).Returns("yt-dlp");
+            configurationMock.Setup(c => c["YouTube:ApiKey"]).Returns("test-api-key");
+
+            // The real service, with only what a test sets up replaced
+            _queueServiceMock = new Mock<QueueService>(_dbContext, hubContextMock.Object, configurationMock.Object)
+            {
+                CallBase = true
+            };
+
+            SetupInitialData().Wait();
+        }
+
+        private async Task SetupInitialData()
+        {
+            await _dbContext.RoomInfos.AddAsync(new RoomInfo
+            {
+                RoomCode = _roomCode,
+                IsEmbedded = false,
+                IsPaused = true,
+                IsLooping = false,
+                IsShuffled = false,
+                CurrentItemIndex = 0,
+                CurrentItemShuffleIndex = null,
+                CurrentItemId = 1,
+                CurrentItemTrackId = "track1-hash",
+                PlayingSince = null,
+                PausedAt = null
+            });
+
+            var queueItems = new List<QueueItem>
+            {
+                new QueueItem { Id = 1, RoomCode = _roomCode, WebpageUrlHash = "track1-hash", Index = 0, ShuffleIndex = null, IsDeleted = false },
+                new QueueItem { Id = 2, RoomCode = _roomCode, WebpageUrlHash = "track2-hash", Index = 1, ShuffleIndex = null, IsDeleted = false },
+                new QueueItem { Id = 3, RoomCode = _roomCode, WebpageUrlHash = "track3-hash", Index = 2, ShuffleIndex = null, IsDeleted = false }
+            };
+            await _dbContext.QueueItems.AddRangeAsync(queueItems);
+
+            await _dbContext.SaveChangesAsync();
+        }
+
+        public void Dispose()
+        {
+            _dbContext.Dispose();
+        }
+
+        private RoomController CreateController(string roomCode)
+        {
+            return new RoomController(_dbContext, _queueServiceMock.Object, NullLogger<RoomController>.Instance)
+            {
+                ControllerContext = new ControllerContext
+                {
+                    HttpContext = new DefaultHttpContext
+                    {
+                        User = new ClaimsPrincipal(new ClaimsIdentity(new[] { new Claim("room_code", roomCode) }, "Test"))
+                    }
+                }
+            };
+        }
+
+        [Fact]
+        public async Task GetRoomInfo_ShouldReturnRoomWithoutQueue()
+        {
+            // Act
+            var result = await CreateController(_roomCode).GetRoomInfo();
+
+            // Assert
+            var ok = Assert.IsType<OkObjectResult>(result.Result);
+            var roomInfo = Assert.IsType<RoomInfoDto>(ok.Value);
+            Assert.Equal(_roomCode, roomInfo.RoomCode);
+            Assert.True(roomInfo.IsPaused);
+            Assert.Equal(1, roomInfo.CurrentItem.Id);
+            Assert.Equal("track1-hash", roomInfo.CurrentItem.TrackId);
+        }
+
+        [Fact]
+        public async Task GetRoomInfo_WithUnknownRoom_ShouldReturnNotFound()
+        {
+            // Act
+            var result = await CreateController("missing-room").GetRoomInfo();
+
+            // Assert
+            Assert.IsType<NotFoundObjectResult>(result.Result);
+        }
+
+        [Fact]
+        public async Task Add_ShouldReturnAddedItemsWithRoom()
+        {
+            // Arrange
+            var added = new QueueItem { Id = 4, RoomCode = _roomCode, WebpageUrlHash = "track4-hash", Index = 1, ShuffleIndex = null, IsDeleted = false };
+            _queueServiceMock
+                .Setup(s => s.Add(_roomCode, "query"))
+                .ReturnsAsync(new List<QueueItemDto> { new QueueItemDto(added) });
+
+            // Act
+            var result = await CreateController(_roomCode).Add(new TimestampedStringRequest { Value = "query" });
+
+            // Assert
+            var ok = Assert.IsType<OkObjectResult>(result.Result);
+            var room = Assert.IsType<RoomResponse>(ok.Value);
+            var addedItem = Assert.Single(room.AddedItems!);
+            Assert.Equal(4, addedItem.Id);
+            Assert.Equal("track4-hash", addedItem.TrackId);
+            Assert.Equal(3, room.QueueItems.Count);
+        }
+
+        [Fact]
+        public async Task GetRoom_ShouldNotSetAddedItems()
+        {
+            // Act
+            var result = await CreateController(_roomCode).GetRoom();
+
+            // Assert
+            var ok = Assert.IsType<OkObjectResult>(result.Result);
+            var room = Assert.IsType<RoomResponse>(ok.Value);
+            Assert.Null(room.AddedItems);
+        }
+
+        [Fact]
+        public async Task Add_WithEmptyQuery_ShouldReturnBadRequest()
+        {
+            // Act
+            var result = await CreateController(_roomCode).Add(new TimestampedStringRequest { Value = " " });
+
+            // Assert
+            Assert.IsType<BadRequestObjectResult>(result.Result);
+            _queueServiceMock.Verify(s => s.Add(It.IsAny<string>(), It.IsAny<string>()), Times.Never);
+        }
+
+        [Fact]
+        public async Task MoveBatch_ShouldApplyMovesInOrder()
+        {
+            // Arrange
+            var request = new TimestampedMoveBatchRequest
+            {
+                // Each move is relative to the queue the previous one left
+                Moves = new List<MoveDto>
+                {
+                    new MoveDto { From = 2, To = 0 },
+                    new MoveDto { From = 2, To = 1 }
+                }
+            };
+
+            // Act
+            var result = await CreateController(_roomCode).MoveBatch(request);
+
+            // Assert
+            Assert.IsType<OkObjectResult>(result.Result);
+            var order = await _dbContext.QueueItems
+                .Where(qi => qi.RoomCode == _roomCode && !qi.IsDeleted)
+                .OrderBy(qi => qi.Index)
+                .Select(qi => qi.Id)
+                .ToListAsync();
+            Assert.Equal(new List<int> { 3, 2, 1 }, order);
+        }
+
+        [Fact]
+        public async Task MoveBatch_WithNegativeIndex_ShouldRejectWholeBatch()
+        {
+            // Arrange
+            var request = new TimestampedMoveBatchRequest
+            {
+                Moves = new List<MoveDto>
+                {
+                    new MoveDto { From = 2, To = 0 },
+                    new MoveDto { From = -1, To = 1 }
+                }
+            };
+
+            // Act
+            var result = await CreateController(_roomCode).MoveBatch(request);
+
+            // Assert
+            Assert.IsType<BadRequestObjectResult>(result.Result);
+            var order = await _dbContext.QueueItems
+                .Where(qi => qi.RoomCode == _roomCode && !qi.IsDeleted)
+                .OrderBy(qi => qi.Index)
+                .Select(qi => qi.Id)
+                .ToListAsync();
+            Assert.Equal(new List<int> { 1, 2, 3 }, order);
+        }
+
+        [Fact]
+        public async Task DeleteBatch_ShouldDeleteItemsAndReportFailures()
+        {
+            // Arrange
+            var request = new TimestampedIntListRequest { Values = new List<int> { 2, 1, 99, 2 } };
+
+            // Act
+            var result = await CreateController(_roomCode).DeleteBatch(request);
+
+            // Assert
+            var ok = Assert.IsType<OkObjectResult>(result.Result);
+            var room = Assert.IsType<RoomResponse>(ok.Value);
+            Assert.Equal(new List<int> { 1, 3 }, room.QueueItems.Select(qi => qi.Id).OrderBy(id => id).ToList());
+
+            // The current track can't be deleted and item 99 doesn't exist, the duplicate is ignored
+            Assert.NotNull(room.FailedItems);
+            Assert.Equal(new List<int> { 1, 99 }, room.FailedItems!.Select(f => f.ItemId).ToList());
+            Assert.Contains("current track", room.FailedItems[0].Error);
+            Assert.Contains("Item not found.", room.FailedItems[1].Error);
+        }
+    }
+}
@@ -0,0 +1,131 @@
+using KoodaamoJukebox.Api.Controllers;
+using KoodaamoJukebox.Database;
+using KoodaamoJukebox.Database.Models;
+using Microsoft.AspNetCore.Http;
+using Microsoft.AspNetCore.Mvc;
+using Microsoft.EntityFrameworkCore;
+using Xunit;
+using System.Collections.Generic;
+using System.Linq;
+using System.Threading.Tasks;
+
+namespace KoodaamoJukebox.Api.Tests
+{
+    public class UserControllerTests : IDisposable
+    {
+        private readonly KoodaamoJukeboxDbContext _dbContext;
+        private readonly UserController _controller;
+
+        public UserControllerTests()
+        {
+            var options = new DbContextOptionsBuilder<KoodaamoJukeboxDbContext>()
+                .UseInMemoryDatabase(databaseName: Guid.NewGuid().ToString())
+                .Options;
+            _dbContext = new KoodaamoJukeboxDbContext(options);
+
+            _controller = new UserController(_dbContext)
+            {
+                ControllerContext = new ControllerContext { HttpContext = new DefaultHttpContext() }
+            };
+
+            SetupInitialData().Wait();
+        }
+
+        private async Task SetupInitialData()
+        {
+            var now = DateTimeOffset.UtcNow.ToUnixTimeMilliseconds();
+            var users = new List<User>
+            {
+                new User { Id = 1, UserId = 1001, Username = "user1", IsEmbedded = false, AssociatedRoomCode = "room-a" },
+                new User { Id = 2, UserId = 1002, Username = "user2", IsEmbedded = true, AssociatedRoomCode = null },
+                new User { Id = 3, UserId = 1003, Username = "user3", IsEmbedded = false, AssociatedRoomCode = null, BannedUntil = now + 3600_000, BannedReason = "spam" },
+                // A ban that has already run out
+                new User { Id = 4, UserId = 1004, Username = "user4", IsEmbedded = false, AssociatedRoomCode = "room-a", BannedUntil = now - 3600_000, BannedReason = "spam" },
+                new User { Id = 5, UserId = 1005, Username = "user5", IsEmbedded = true, AssociatedRoomCode = "room-b" }
+            };
+            await _dbContext.Users.AddRangeAsync(users);
+
+            await _dbContext.SaveChangesAsync();
+        }
+
+        public void Dispose()
+        {
+            _dbContext.Dispose();
+        }
+
+        private static List<long> UserIds(ActionResult<IEnumerable<UserDto>> result)
+        {
+            var ok = Assert.IsType<OkObjectResult>(result.Result);
+            var users = Assert.IsAssignableFrom<IEnumerable<UserDto>>(ok.Value);
+            return users.Select(u => u.UserId).ToList();
+        }
+
+        private string TotalCount()
+        {
+            return _controller.Response.Headers["X-Total-Count"].ToString();
+        }
+
+        [Fact]
+        public async Task GetAllUsers_ShouldReturnAllUsers()
+        {
+            // Act
+            var result = await _controller.GetAllUsers();
+
+            // Assert
+            Assert.Equal(new List<long> { 1001, 1002, 1003, 1004, 1005 }, UserIds(result));
+            Assert.Equal("5", TotalCount());
+        }
+
+        [Fact]
+        public async Task GetAllUsers_WithOffsetAndLimit_ShouldReturnPage()
+        {
+            // Act
+            var result = await _controller.GetAllUsers(offset: 1, limit: 2);
+
+            // Assert
+            Assert.Equal(new List<long> { 1002, 1003 }, UserIds(result));
+            Assert.Equal("5", TotalCount());
+        }
+
+        [Theory]
+        [InlineData(true, null, null, new long[] { 1002, 1005 })]
+        [InlineData(false, null, null, new long[] { 1001, 1003, 1004 })]
+        [InlineData(null, true, null, new long[] { 1001, 1004, 1005 })]
+        [InlineData(null, false, null, new long[] { 1002, 1003 })]
+        [InlineData(null, null, true, new long[] { 1003 })]
+        [InlineData(null, null, false, new long[] { 1001, 1002, 1004, 1005 })]
+        [InlineData(false, true, false, new long[] { 1001, 1004 })]
+        public async Task GetAllUsers_WithFilters_ShouldReturnMatchingUsers(bool? embedded, bool? inRoom, bool? banned, long[] expected)
+        {
+            // Act
+            var result = await _controller.GetAllUsers(embedded: embedded, inRoom: inRoom, banned: banned);
+
+            // Assert
+            Assert.Equal(expected.ToList(), UserIds(result));
+            Assert.Equal(expected.Length.ToString(), TotalCount());
+        }
+
+        [Fact]
+        public async Task GetAllUsers_WithFilterAndPage_ShouldCountAllMatches()
+        {
+            // Act
+            var result = await _controller.GetAllUsers(offset: 0, limit: 1, inRoom: true);
+
+            // Assert
+            Assert.Equal(new List<long> { 1001 }, UserIds(result));
+            Assert.Equal("3", TotalCount());
+        }
+
+        [Theory]
+        [InlineData(-1, null)]
+        [InlineData(null, 0)]
+        public async Task GetAllUsers_WithInvalidPage_ShouldReturnBadRequest(int? offset, int? limit)
+        {
+            // Act
+            var result = await _controller.GetAllUsers(offset: offset, limit: limit);
+
+            // Assert
+            Assert.IsType<BadRequestObjectResult>(result.Result);
+        }
+    }
+}